@@ -0,0 +1,250 @@
+"""
+Benchmark of the subsolvers on synthetic, separable subproblems.
+
+Every case builds an MMA (or ConLin) approximation of a random problem with
+``n`` variables and ``m`` constraints, of which the constraint Jacobian has
+the given ``density``, and solves it with one subsolver. The wall time (best
+of ``repeat`` runs), the peak memory of the NumPy and Python allocations
+(``tracemalloc``) and the iteration count (Newton iterations for ``pdip``,
+evaluations of the subproblem otherwise) are written to a JSON file. With a
+baseline file, cases that became slower than ``tolerance`` times their
+baseline time are reported and the benchmark exits with status 1.
+
+Usage::
+
+    python -m benchmarks.subsolvers --sizes quick --output results.json
+    python -m benchmarks.subsolvers --sizes quick --baseline benchmarks/baselines/subsolvers-quick.json
+
+Solvers that are not applicable to a case (e.g. a sparse Jacobian, or a size
+beyond their ``max_size``) are skipped; failures are recorded with their error.
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+from types import SimpleNamespace
+
+import numpy as np
+import scipy.sparse
+
+from sao.approximations import Taylor1
+from sao.intervening_variables import ConLin
+from sao.intervening_variables.mma import MMA02
+from sao.move_limits import Bounds, MoveLimit
+from sao.problems import Subproblem
+from sao.solvers.dual.conlin import sub_con
+from sao.solvers.dual.mma import sub_mma
+from sao.solvers.pdip_svanberg import ipsolver
+from sao.solvers.primal_dual_interior_point import Pdipx, Pdipxy, Pdipxyz, pdip
+from sao.solvers.t2dual import t2dual
+from sao.solvers.wrappers.cvxopt import cvxopt_solver
+from sao.solvers.wrappers.scipy import scipy_solver
+
+SIZES = {
+    'quick': {'n': [100, 1000, 10000], 'm': [1, 10], 'density': [1.0, 0.01]},
+    'full': {'n': [100, 1000, 10000, 100000, 1000000], 'm': [1, 10, 100, 1000], 'density': [1.0, 0.01]},
+}
+
+# Cases with more Jacobian entries are skipped, as the dense solvers would run out of memory
+MAX_ENTRIES = 2e8
+
+
+class CountingSubproblem:
+    """Counts the evaluations of a subproblem, all other attributes are those of the subproblem."""
+
+    def __init__(self, subproblem):
+        self.subproblem = subproblem
+        self.evaluations = 0
+
+    def __getattr__(self, name):
+        if name == 'subproblem':
+            raise AttributeError(name)
+        return getattr(self.subproblem, name)
+
+    def g(self, x):
+        self.evaluations += 1
+        return self.subproblem.g(x)
+
+    def dg(self, x):
+        return self.subproblem.dg(x)
+
+    def evaluate(self, x, order=1):
+        self.evaluations += 1
+        return self.subproblem.evaluate(x, order)
+
+    def ddg(self, x):
+        return self.subproblem.ddg(x)
+
+
+def separable_case(n, m, density=1.0, sparse=False, intervening=MMA02, seed=0):
+    """
+    Subproblem of a random problem at ``x = 0.5`` with active constraints.
+
+    The objective decreases with all variables, every constraint increases
+    with a random subset (of relative size ``density``) of the variables.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.full(n, 0.5)
+    df = np.empty((m + 1, n))
+    df[0] = -rng.uniform(0.1, 1.0, n)
+    df[1:] = rng.uniform(0.1, 1.0, (m, n)) * (rng.random((m, n)) < density)
+    f = np.concatenate(([1.0], np.zeros(m)))
+    if sparse:
+        df = scipy.sparse.csr_matrix(df)
+
+    subproblem = Subproblem(Taylor1(intervening()), limits=[Bounds(0, 1), MoveLimit(0.2)])
+    subproblem.build(x, f, df)
+
+    # State used by the dual and QP solvers
+    subproblem.x_k, subproblem.x_d_k = x, np.ones(m)
+    subproblem.functions = [SimpleNamespace(x_k=x)]
+    return subproblem
+
+
+def run_pdip(subproblem, variables=Pdipxyz):
+    return pdip(subproblem, variables=variables)
+
+
+def run_ipsolver(subproblem):
+    return ipsolver(subproblem), None
+
+
+def run_dual_mma(subproblem):
+    return sub_mma(subproblem, subproblem.x_k.copy(), np.ones(subproblem.m))[0], None
+
+
+def run_dual_conlin(subproblem):
+    return sub_con(subproblem, subproblem.x_k.copy(), np.ones(subproblem.m))[0], None
+
+
+def run_t2dual(subproblem):
+    return t2dual(subproblem)[0], None
+
+
+def run_osqp(subproblem):
+    # Optional dependency
+    from sao.solvers.osqp import osqp
+    return osqp(subproblem)[0], None
+
+
+def run_cvxopt(subproblem):
+    return cvxopt_solver(subproblem), None
+
+
+def run_scipy(subproblem):
+    return scipy_solver(subproblem), None
+
+
+# Solver name: (runner, intervening variable, maximum n * (m + 1), supports sparse Jacobians)
+SOLVERS = {
+    'pdip_x': (partial(run_pdip, variables=Pdipx), MMA02, 1e8, True),
+    'pdip_xy': (partial(run_pdip, variables=Pdipxy), MMA02, 1e8, True),
+    'pdip_xyz': (partial(run_pdip, variables=Pdipxyz), MMA02, 1e8, True),
+    'ipsolver': (run_ipsolver, MMA02, 1e8, False),
+    'dual_mma': (run_dual_mma, MMA02, 2e4, False),
+    'dual_conlin': (run_dual_conlin, ConLin, 2e4, False),
+    't2dual': (run_t2dual, MMA02, 1e6, False),
+    'osqp': (run_osqp, MMA02, 1e4, False),
+    'cvxopt': (run_cvxopt, MMA02, 2e3, False),
+    'scipy': (run_scipy, MMA02, 1.2e3, False),
+}
+
+
+def measure(solver, n, m, density, sparse, repeat=3):
+    """Times one case, returns its record."""
+    runner, intervening, max_size, supports_sparse = SOLVERS[solver]
+    record = {'solver': solver, 'n': n, 'm': m, 'density': density, 'sparse': sparse}
+    if n * (m + 1) > max_size or (sparse and not supports_sparse):
+        return dict(record, status='skipped')
+
+    try:
+        times = []
+        for _ in range(repeat):
+            subproblem = CountingSubproblem(separable_case(n, m, density, sparse, intervening))
+            start = time.perf_counter()
+            x, iterations = runner(subproblem)
+            times.append(time.perf_counter() - start)
+
+        subproblem = CountingSubproblem(separable_case(n, m, density, sparse, intervening))
+        tracemalloc.start()
+        runner(subproblem)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except Exception as error:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return dict(record, status='error', error=repr(error))
+
+    g = subproblem.subproblem.g(x)
+    return dict(record, status='ok', time=min(times), peak_memory=peak, iterations=iterations,
+                evaluations=subproblem.evaluations, objective=float(g[0]),
+                infeasibility=float(np.maximum(g[1:], 0).max(initial=0.0)))
+
+
+def run(sizes='quick', solvers=None, repeat=3, log=print):
+    grid = SIZES[sizes]
+    records = []
+    for solver in SOLVERS if solvers is None else solvers:
+        for n, m, density in itertools.product(grid['n'], grid['m'], grid['density']):
+            if (m + 1) * n > MAX_ENTRIES:
+                continue
+            for sparse in ([False, True] if density < 1 else [False]):
+                record = measure(solver, n, m, density, sparse, repeat)
+                records.append(record)
+                if log is not None and record['status'] != 'skipped':
+                    log(f"{solver:12s} n={n:<8d} m={m:<5d} density={density:<5g} sparse={sparse!s:5s} "
+                        f"{record['status']:6s} {record.get('time', float('nan')):10.4f} s "
+                        f"{record.get('peak_memory', 0) / 2 ** 20:10.1f} MiB")
+    return records
+
+
+def key(record):
+    return record['solver'], record['n'], record['m'], record['density'], record['sparse']
+
+
+def compare(records, baseline, tolerance=1.5):
+    """Returns the cases that are more than ``tolerance`` times slower than the baseline, or fail now."""
+    reference = {key(r): r for r in baseline if r['status'] == 'ok'}
+    regressions = []
+    for record in records:
+        base = reference.get(key(record))
+        if base is None:
+            continue
+        if record['status'] != 'ok':
+            regressions.append((record, base, float('inf')))
+        elif record['time'] > tolerance * base['time']:
+            regressions.append((record, base, record['time'] / base['time']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', choices=list(SIZES), default='quick')
+    parser.add_argument('--solvers', nargs='*', choices=list(SOLVERS), default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='subsolvers.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    records = run(args.sizes, args.solvers, args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump({'machine': platform.node(), 'python': platform.python_version(), 'numpy': np.__version__,
+                   'sizes': args.sizes, 'records': records}, file, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(records, json.load(file)['records'], args.tolerance)
+        for record, base, ratio in regressions:
+            print(f"REGRESSION {key(record)}: {record.get('time', record['status'])} s, "
+                  f"baseline {base['time']:.4f} s ({ratio:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+End-to-end benchmark of topology optimization problems.
+
+Every scenario runs a fixed number of MMA iterations (``Taylor1(MMA02)``
+with bounds and a move limit, solved by ``pdip``) on one of the problems
+at a given mesh size, with the global profiler enabled. The wall time is
+split into the phases below, which are the exclusive times of the spans
+recorded by ``sao.util.profiling`` and the finite element utilities, such
+that the phases add up to the total time. Time outside any span is
+reported as ``other``.
+
+Usage::
+
+    python -m benchmarks.topology --sizes quick --output results.json
+    python -m benchmarks.topology --scenarios compliance stress --sizes full --iterations 20 --trace traces
+    python -m benchmarks.topology --sizes quick --baseline old.json
+
+With a ``--trace`` directory a Chrome trace is written for every case.
+With a baseline file the total and phase times are compared to the
+baseline, cases slower than ``tolerance`` times their baseline exit with
+status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from functools import partial
+
+import numpy as np
+
+from problems.topology_optimization.compliance import ComplianceMBB
+from problems.topology_optimization.eigenfrequency import EigenfrequencyClampedBeam
+from problems.topology_optimization.mechanism import MechanismClampedBeam
+from problems.topology_optimization.stress import StressCantilever
+from sao.approximations import Taylor1
+from sao.intervening_variables.mma import MMA02
+from sao.move_limits import Bounds, MoveLimit
+from sao.problems import ProfiledProblem, Subproblem
+from sao.solvers.primal_dual_interior_point import pdip
+from sao.util.profiling import profiler, span
+
+SCENARIOS = {
+    'compliance': ComplianceMBB,
+    'mechanism': MechanismClampedBeam,
+    'stress': StressCantilever,
+    # At lower volume fractions the first MMA steps void the beam, of which the localized modes break eigsh
+    'eigenfrequency': partial(EigenfrequencyClampedBeam, volfrac=0.4),
+}
+
+SIZES = {
+    'quick': [(60, 20), (120, 40)],
+    'medium': [(60, 20), (120, 40), (300, 100), (600, 200)],
+    'full': [(60, 20), (120, 40), (300, 100), (600, 200), (1200, 400)],
+}
+
+# Phase: span name prefixes
+PHASES = {
+    'setup': ('setup.',),
+    'assembly': ('fem.assembly',),
+    'linear solve': ('linear_solver.',),
+    'filter': ('filter.',),
+    'response': ('problem.g',),
+    'sensitivity': ('problem.dg',),
+    'subproblem build': ('subproblem.', 'approximation.', 'intervening.', 'move_limit.'),
+    'subsolve': ('solver.',),
+}
+
+
+def phases(summary, total):
+    """Splits the exclusive span times of a profiler summary into the ``PHASES``, and ``other``."""
+    out = dict.fromkeys(PHASES, 0.0)
+    for name, (_, seconds) in summary.items():
+        for phase, prefixes in PHASES.items():
+            if name.startswith(prefixes):
+                out[phase] += seconds
+                break
+    out['other'] = total - sum(out.values())
+    return out
+
+
+def run_case(scenario, nelx, nely, iterations=10, solver=None, trace=None):
+    """Runs one scenario, returns its record."""
+    profiler.reset().enable()
+    try:
+        start = time.perf_counter()
+        with span('setup.problem'):
+            problem = ProfiledProblem(SCENARIOS[scenario](nelx, nely, solver=solver))
+        subproblem = Subproblem(Taylor1(MMA02()), limits=[Bounds(0, 1), MoveLimit(0.2)])
+
+        x = problem.x0.copy()
+        for _ in range(iterations):
+            g = problem.g(x)
+            dg = problem.dg(x)
+            subproblem.build(x, g, dg)
+            x[:] = pdip(subproblem)[0]
+        total = time.perf_counter() - start
+    finally:
+        profiler.disable()
+
+    if trace is not None:
+        os.makedirs(trace, exist_ok=True)
+        profiler.export_chrome(os.path.join(trace, f'{scenario}-{nelx}x{nely}.json'))
+    record = {'scenario': scenario, 'nelx': nelx, 'nely': nely, 'n': problem.n, 'iterations': iterations,
+              'time': total, 'phases': phases(profiler.summary(exclusive=True), total),
+              'calls': {name: calls for name, (calls, _) in profiler.summary().items()},
+              'objective': float(g[0])}
+    profiler.reset()
+    return record
+
+
+def run(scenarios=None, sizes='quick', iterations=10, solver=None, trace=None, log=print):
+    records = []
+    for scenario in SCENARIOS if scenarios is None else scenarios:
+        for nelx, nely in SIZES[sizes]:
+            record = run_case(scenario, nelx, nely, iterations, solver, trace)
+            records.append(record)
+            if log is not None:
+                log(f"{scenario:15s} {nelx:5d}x{nely:<5d} {record['time']:9.3f} s  " +
+                    '  '.join(f"{phase}: {seconds:.3f}" for phase, seconds in record['phases'].items()))
+    return records
+
+
+def key(record):
+    return record['scenario'], record['nelx'], record['nely'], record['iterations']
+
+
+def compare(records, baseline, tolerance=1.5):
+    """Returns the cases of which the total time is more than ``tolerance`` times the baseline."""
+    reference = {key(r): r for r in baseline}
+    regressions = []
+    for record in records:
+        base = reference.get(key(record))
+        if base is not None and record['time'] > tolerance * base['time']:
+            regressions.append((record, base, record['time'] / base['time']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', nargs='*', choices=list(SCENARIOS), default=None)
+    parser.add_argument('--sizes', choices=list(SIZES), default='quick')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--linear-solver', choices=['cholmod', 'splu', 'cg', 'multigrid'], default=None)
+    parser.add_argument('--output', default='topology.json')
+    parser.add_argument('--trace', default=None, help='Directory for the Chrome traces of the cases')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    records = run(args.scenarios, args.sizes, args.iterations, args.linear_solver, args.trace)
+    with open(args.output, 'w') as file:
+        json.dump({'machine': platform.node(), 'python': platform.python_version(), 'numpy': np.__version__,
+                   'linear_solver': args.linear_solver, 'records': records}, file, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(records, json.load(file)['records'], args.tolerance)
+        for record, base, ratio in regressions:
+            slowest = max(record['phases'], key=lambda p: record['phases'][p] - base['phases'].get(p, 0.0))
+            print(f"REGRESSION {key(record)}: {record['time']:.3f} s, baseline {base['time']:.3f} s "
+                  f"({ratio:.2f}x), mostly in {slowest}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Benchmark of the sparse sensitivity paths on the Vanderplaats beam.
+
+Every case runs a fixed number of MMA iterations (``Taylor1(MMA02)`` with
+bounds and a relative move limit, solved by ``pdip``) on a
+``VanderplaatsBeam`` of ``N`` segments, i.e. ``2 N`` variables and ``2 N + 1`` constraints, of
+which the Jacobian has ``8 N`` nonzeros. The sensitivities are passed to
+the subproblem either as a dense array or as a ``scipy.sparse`` matrix.
+The wall time is split into the phases of ``benchmarks.topology``.
+
+Usage::
+
+    python -m benchmarks.vanderplaats --sizes quick --output results.json
+    python -m benchmarks.vanderplaats --sizes large --jacobian sparse --baseline old.json
+
+Dense cases with more than ``MAX_ENTRIES`` Jacobian entries are skipped,
+failures (e.g. parts of the pipeline without sparse support) are recorded
+with their error.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.topology import phases
+from problems.n_dim.vdp_beam import VanderplaatsBeam
+from sao.approximations import Taylor1
+from sao.intervening_variables.mma import MMA02
+from sao.move_limits import Bounds, MoveLimitFraction
+from sao.problems import ProfiledProblem, Subproblem
+from sao.solvers.primal_dual_interior_point import pdip
+from sao.util.profiling import profiler, span
+
+SIZES = {
+    'quick': [50, 100],
+    'large': [200, 1000, 10000, 100000],
+    'full': [200, 1000, 10000, 100000, 1000000],
+}
+
+# Dense cases with more Jacobian entries are skipped, the dense Newton systems of pdip scale with n^2 (m + 1)
+MAX_ENTRIES = 1e6
+
+
+def run_case(N, sparse, iterations=3):
+    """Runs one case, returns its record."""
+    record = {'N': N, 'n': 2 * N, 'sparse': sparse, 'iterations': iterations}
+    if not sparse and 2 * N * (2 * N + 2) > MAX_ENTRIES:
+        return dict(record, status='skipped')
+
+    profiler.reset().enable()
+    try:
+        start = time.perf_counter()
+        with span('setup.problem'):
+            problem = ProfiledProblem(VanderplaatsBeam(N, sparse=sparse))
+        subproblem = Subproblem(Taylor1(MMA02(x_min=problem.x_min, x_max=problem.x_max)),
+                                limits=[Bounds(problem.x_min, problem.x_max), MoveLimitFraction(2)])
+
+        x = problem.x0.copy()
+        for _ in range(iterations):
+            g = problem.g(x)
+            dg = problem.dg(x)
+            subproblem.build(x, g, dg)
+            x[:] = pdip(subproblem)[0]
+        total = time.perf_counter() - start
+    except Exception as error:
+        return dict(record, status='error', error=repr(error))
+    finally:
+        profiler.disable()
+
+    record = dict(record, status='ok', time=total, phases=phases(profiler.summary(exclusive=True), total),
+                  objective=float(g[0]), infeasibility=float(np.maximum(g[1:], 0).max()))
+    profiler.reset()
+    return record
+
+
+def run(sizes='quick', jacobians=('dense', 'sparse'), iterations=3, log=print):
+    records = []
+    for N in SIZES[sizes]:
+        for jacobian in jacobians:
+            record = run_case(N, jacobian == 'sparse', iterations)
+            records.append(record)
+            if log is not None and record['status'] != 'skipped':
+                log(f"N={N:<8d} {jacobian:6s} {record['status']:6s} {record.get('time', float('nan')):9.3f} s  " +
+                    '  '.join(f"{phase}: {seconds:.3f}" for phase, seconds in record.get('phases', {}).items()))
+    return records
+
+
+def key(record):
+    return record['N'], record['sparse'], record['iterations']
+
+
+def compare(records, baseline, tolerance=1.5):
+    """Returns the cases that are more than ``tolerance`` times slower than the baseline, or fail now."""
+    reference = {key(r): r for r in baseline if r['status'] == 'ok'}
+    regressions = []
+    for record in records:
+        base = reference.get(key(record))
+        if base is None:
+            continue
+        if record['status'] != 'ok':
+            regressions.append((record, base, float('inf')))
+        elif record['time'] > tolerance * base['time']:
+            regressions.append((record, base, record['time'] / base['time']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', choices=list(SIZES), default='quick')
+    parser.add_argument('--jacobian', nargs='*', choices=['dense', 'sparse'], default=['dense', 'sparse'])
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--output', default='vanderplaats.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    records = run(args.sizes, args.jacobian, args.iterations)
+    with open(args.output, 'w') as file:
+        json.dump({'machine': platform.node(), 'python': platform.python_version(), 'numpy': np.__version__,
+                   'sizes': args.sizes, 'records': records}, file, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(records, json.load(file)['records'], args.tolerance)
+        for record, base, ratio in regressions:
+            print(f"REGRESSION {key(record)}: {record.get('time', record['status'])} s, "
+                  f"baseline {base['time']:.3f} s ({ratio:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
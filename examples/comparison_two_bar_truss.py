@@ -122,8 +122,7 @@ def nonspherical_taylor2(p=1):
 def optimizer(problem, subproblem, converged):
     x = problem.x0
     while not converged:
-        f = problem.g(x)
-        df = problem.dg(x)
+        f, df = problem.evaluate(x)
         infeasibility = max(0.0, f[1], f[2])
         print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
         if (infeasibility < 0.001) and (f[0] < 1.001 * 1.51):
@@ -104,8 +104,7 @@ def cantilever_t2r(sub):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[]
 #
@@ -123,7 +122,7 @@ def cantilever_t2r(sub):
 #
     cnt=0
     while not converged:
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         infeasibility = max(0.0, np.max(f[1:]))
         history.popcol('f0',f[0]); history.popcol('inf',infeasibility)
         print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
@@ -1,3 +1,5 @@
+from functools import partial
+
 import numpy as np
 
 import sao
@@ -53,6 +55,18 @@ def mma_wrapper(n):
     print("Final design : ", f, x, "\n")
 
 
+"""
+Instead of a single random start, the wrapper can be run from many starts in parallel.
+Every worker process creates its own problem, runs that are clearly worse than the best so far are cancelled:
+"""
+
+
+def mma_multistart(n):
+    result = sao.solvers.wrappers.multistart(partial(Dummy, n), 8, stop_tol=1e-2)
+    print(result)
+    print("Final design : ", result.best.objective, result.best.x, "\n")
+
+
 """
 Alternatively, more advanced users can write their own loop.
 An example of such a loop is as follows:
@@ -70,8 +84,7 @@ def mma_loop(n):
     counter = 0
     while not converged:
         counter += 1
-        f = problem.g(x)
-        df = problem.dg(x)
+        f, df = problem.evaluate(x)
         print(counter, ":  ", f[0], x)
         sub_problem.build(x, f, df)
         x[:] = sao.solvers.primal_dual_interior_point.pdip(sub_problem)[0]
@@ -117,8 +130,7 @@ def adaptive_approximation(n):
     counter = 0
     while not converged:
         counter += 1
-        f = problem.g(x)
-        df = problem.dg(x)
+        f, df = problem.evaluate(x)
         print(counter, ":  ", f[0], x)
         sub_problem = sao.problems.Subproblem(approx1 if counter < 4 else approx2, lim)
         sub_problem.build(x, f, df)
@@ -162,6 +174,7 @@ only allow designs that improve the objective:
 
 if __name__ == "__main__":
     mma_wrapper(4)
+    mma_multistart(4)
     mma_loop(4)
     adaptive_approximation(4)
     # conditional_acceptance(4)
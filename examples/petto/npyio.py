@@ -1,27 +1,75 @@
+#
+#   Python side of TopOpt in PETSc, called from every MPI rank. The design is read from and the responses and
+#   sensitivities are written to the shared memory of PETScTopOpt (or its memory-mapped files with SAO_DIRECTORY),
+#   every rank only its own slice. Rank 0 waits for the next design with wait() and reports the analysis with done().
+#
+import os
+import time
+
 import numpy as np
 
+from sao.problems.external import ExternalBuffers, MappedBuffers, connect
+from sao.util.partition import Partition
+
+address = os.environ.get('SAO_ADDRESS', 'sao.sock')
+prefix = os.environ.get('SAO_PREFIX', 'petsc_topopt')
+directory = os.environ.get('SAO_DIRECTORY')
+buffers = None
+connection = None
+partition = None
+order = 1
+
+def attach(ranges, rank, m=1):
+    global buffers, partition
+    if buffers is None:
+        partition = Partition(ranges)
+        if directory is None:
+            buffers = ExternalBuffers(partition.n, m, prefix=prefix, create=False)
+        else:
+            buffers = MappedBuffers(partition.n, m, directory, prefix=prefix, create=False)
+        if rank == 0:
+            partition.save(prefix + '_partition.json')
+    return buffers
+
+def wait():
+    # Rank 0: blocks until the next design is available, returns 0 when the optimization has finished
+    global connection, order
+    if connection is None:
+        while not os.path.exists(address):
+            time.sleep(0.1)
+        connection = connect(address)
+    while True:
+        command, payload = connection.recv()
+        if command == 'attach':
+            connection.send(('ready', None))
+        elif command == 'evaluate':
+            order = payload
+            return 1
+        else:
+            connection.close()
+            return 0
+
+def done():
+    connection.send(('done', order))
+    return 0
+
 def write_df(vec):
 
     rank=vec[0]
-    np.save("df_%d.npy"%rank,vec[1:])
+    buffers.dg[0, partition.slice(rank)]=vec[1:]
     return 0
 
 def write_dg(vec):
 
     rank=vec[0]
-    np.save("dg_%d.npy"%rank,vec[1:])
+    buffers.dg[1, partition.slice(rank)]=vec[1:]
     return 0
 
 def write_fg(vec):
-    np.save("fg.npy",vec)
+    buffers.g[:]=vec
     return 0
 
 def read(vec):
     rank=vec[-1]
     ranges=vec[:-1]
-    tmp2=np.zeros((ranges[rank+1]-ranges[rank]),dtype=float)
-    tmp=np.load("xxx.npy")
-    tmp2[:]=tmp[ranges[rank]:ranges[rank+1]]
-    return tmp2
-
-    
+    return attach(ranges, rank).x[partition.slice(rank)]
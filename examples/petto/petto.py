@@ -1,5 +1,4 @@
 #
-import os
 import time
 #
 import numpy as np
@@ -11,6 +10,7 @@ from sao.solvers.primal_dual_interior_point import pdip, Pdipx
 from sao.solvers.t2dual import t2dual
 from sao.solvers.osqp import osqp
 #
+from sao.util.profiling import profiler, span
 from sao.util.records import Records
 from sao.function import Function
 #
@@ -86,8 +86,6 @@ def petsctopopt_t2r(sub):
 
     n = problem.n
     x = problem.x0
-#   problem.setx(x)
-#   problem.solve(cnt)
 #   f = problem.g(x)
 #   df = problem.dg(x)
 
@@ -111,12 +109,8 @@ def petsctopopt_t2r(sub):
 #
     while not converged:
 #
-        start = time.time()
-        problem.setx(x)
-        problem.solve(cnt)
-        f = problem.g(x); df = problem.dg(x)
-        end = time.time()
-        print('physic', end - start)
+        with span('physic'):
+            f, df = problem.evaluate(x)
 
         infeasibility = max(0.0, f[1])
         history.popcol('f0',f[0]); history.popcol('inf',infeasibility)
@@ -130,14 +124,10 @@ def petsctopopt_t2r(sub):
         con1.setpoint(x, f[1], df[1], aux)
 #
         #update the subproblem
-        start = time.time()
         subproblem.build(x,f,df)
-        end = time.time()
-        print('sub build', end - start)
 #
         x_old[:]=x
 #   
-        start = time.time()
         #solve the subproblem
         if sub =='pdip':
             x[:] = pdip(subproblem)[0]
@@ -145,20 +135,18 @@ def petsctopopt_t2r(sub):
             x[:] = t2dual(subproblem)[0]
         elif sub =='osqp':
             x[:] = osqp(subproblem)[0]
-        end = time.time()
-        print('subsolve',end - start)
 
         cnt=cnt+1
 #
-        if os.path.exists("exit.flg"):
-            break
-#
-    open("exit.flg", 'w').close()
+    problem.close()
+    for name, (calls, total) in profiler.summary().items():
+        print(name, calls, total)
 
     print("\n")
 #
     return history
 #
 if __name__ == "__main__":
+    profiler.enable()
     sub='t2dual'
     petsctopopt_t2r(sub)
@@ -15,6 +15,7 @@ from sao.intervening_variables import Linear, MixedIntervening
 from sao.intervening_variables.mma import MMA02 as MMA
 
 #
+from sao.util.profiling import profiler, span
 from sao.util.records import Records
 from sao.function import Function
 #
@@ -88,8 +89,7 @@ def petsctopopt_t2r(sub):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[]
 #
@@ -110,10 +110,8 @@ def petsctopopt_t2r(sub):
 #
     cnt=0
     while not converged:
-        start = time.time()
-        f = problem.g(x); df = problem.dg(x)
-        end = time.time()
-        print('physic', end - start)
+        with span('physic'):
+            f, df = problem.evaluate(x)
 
         infeasibility = max(0.0, f[1])
         history.popcol('f0',f[0]); history.popcol('inf',infeasibility)
@@ -127,14 +125,10 @@ def petsctopopt_t2r(sub):
         con1.setpoint(x, f[1], df[1], aux)
 #
         #update the subproblem
-        start = time.time()
         subproblem.build(x,f,df)
-        end = time.time()
-        print('sub build', end - start)
 #
         x_old[:]=x
 #   
-        start = time.time()
         #solve the subproblem
         if sub =='pdip':
             x[:] = pdip(subproblem)[0]
@@ -142,13 +136,16 @@ def petsctopopt_t2r(sub):
             x[:] = t2dual(subproblem)[0]
         elif sub =='osqp':
             x[:] = osqp(subproblem)[0]
-        end = time.time()
-        print('subsolve',end - start)
+
+    problem.close()
+    for name, (calls, total) in profiler.summary().items():
+        print(name, calls, total)
 
     print("\n")
 #
     return history
 #
 if __name__ == "__main__":
+    profiler.enable()
     sub='pdip'
     petsctopopt_t2r(sub)
@@ -88,8 +88,7 @@ def petsctopopt_t2r(sub):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[]
 #
@@ -111,7 +110,7 @@ def petsctopopt_t2r(sub):
     cnt=0
     while not converged:
         start = time.time()
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         end = time.time()
         print('physic', end - start)
 
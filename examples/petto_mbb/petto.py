@@ -108,7 +108,7 @@ def petsctopopt_t2r(sub):
         start = time.time()
         problem.setx(x)
         problem.solve(cnt)
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         end = time.time()
 #       print('physic', end - start)
 
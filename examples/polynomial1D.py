@@ -48,8 +48,7 @@ def example_polynomial_1D():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k)), ddg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
@@ -98,8 +97,7 @@ def example_polynomial_1D_mixed():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
@@ -55,8 +55,7 @@ def example_polynomial_2D():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k)), ddg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
@@ -108,8 +107,7 @@ def example_polynomial_2D_mixed():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
@@ -161,8 +159,7 @@ def example_polynomial_2D_cvxopt():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k)), ddg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
@@ -213,8 +210,7 @@ def example_polynomial_2D_scipy():
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k)), ddg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
         ddf = problem.ddg(x_k) if subproblem.approx.__class__.__name__ == 'Taylor2' else None
 
         # Build approximate sub-problem at X^(k)
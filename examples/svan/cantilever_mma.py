@@ -69,8 +69,7 @@ def cantilever_mma(t):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[t]
 #
@@ -87,7 +86,7 @@ def cantilever_mma(t):
     converged = IterationCount(15)
     cnt=0
     while not converged:
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         infeasibility = max(0.0, f[1])
         history.popcol('f0',f[0]); history.popcol('inf',infeasibility)
         print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
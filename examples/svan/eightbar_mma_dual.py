@@ -83,8 +83,7 @@ def eightbar_mma_dual(s):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[s]
 #
@@ -101,7 +100,7 @@ def eightbar_mma_dual(s):
     converged = IterationCount(20)
     cnt=0
     while not converged:
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         history.popcol('f0',f[0])
         infeasibility = max(0.0, np.max(f[1:]))
         print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
@@ -123,8 +123,7 @@ def twobartruss_pdip(obj,con1,con2):
 #
     n = problem.n
     x = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[problem.x_min,problem.x_max]
 #
@@ -138,7 +137,7 @@ def twobartruss_pdip(obj,con1,con2):
     converged = IterationCount(9)
     cnt=0
     while not converged:
-        f = problem.g(x); df = problem.dg(x)
+        f, df = problem.evaluate(x)
         history.popcol('f0',f[0]); history.popcol('x1',x[0]); history.popcol('x2',x[1])
         infeasibility = max(0.0, f[1], f[2])
         print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
@@ -0,0 +1,53 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from problems.topology_optimization.dynamic_compliance import DynamicComplianceMBB
+from problems.topology_optimization.util.to_utils import PlotDesign
+from sao.approximations import Taylor1
+from sao.convergence_criteria import IterationCount
+from sao.intervening_variables.mma import MMA02 as MMA
+from sao.move_limits import Bounds, MoveLimit
+from sao.problems import Subproblem
+from sao.solvers.primal_dual_interior_point import pdip
+
+itercount = 50
+nelx = 90
+nely = 30
+
+# Dynamic compliance at three frequencies, evaluated from a basis of 20 modes
+omega = np.array([500.0, 1000.0, 1500.0])
+problem = DynamicComplianceMBB(nelx, nely, volfrac=0.5, omega=omega, n_modes=20)
+sub_problem = Subproblem(Taylor1(MMA()), limits=[Bounds(0, 1), MoveLimit(0.1)])
+
+# The frequency response function is plotted outside of the problem
+fig, ax = plt.subplots(1, 1)
+ax.set_title("Frequency response function")
+ax.set_xlabel("Frequency (rad/s)")
+ax.set_ylabel("Amplitude (m/N)")
+ax.set_yscale('log')
+wrange = np.linspace(0, 2 * omega.max(), 1000)
+frf_line, = ax.plot([], [])
+omg_dots, = ax.plot([], [], 'k.')
+plt.show(block=False)
+
+x = problem.x0.copy()
+plotter = PlotDesign(problem, x)
+converged = IterationCount(itercount)
+while not converged:
+    f, df = problem.evaluate(x)
+    print(converged.iteration - 1, ":  ", f[0], f[1])
+
+    frf = np.absolute(problem.frf(wrange))
+    frf_line.set_data(wrange, frf)
+    omg_dots.set_data(omega, np.absolute(problem.f_compl))
+    ax.set_xlim([0, wrange[-1]])
+    ax.set_ylim([frf.min() * 0.9, frf.max() * 1.1])
+    fig.canvas.draw()
+    fig.canvas.flush_events()
+    plotter.plot(x, converged.iteration - 1)
+
+    sub_problem.build(x, f, df)
+    x[:] = pdip(sub_problem)[0]
+
+print(f"Eigenfrequencies: {problem.eigenfrequencies}")
+plt.show(block=True)
@@ -103,8 +103,7 @@ def compliance_mma(t):
     x1 = problem.x0
     x2 = problem.x0
     x3 = problem.x0
-    f = problem.g(x)
-    df = problem.dg(x)
+    f, df = problem.evaluate(x)
 #
     aux=[t]
 #
@@ -122,7 +121,7 @@ def compliance_mma(t):
 #   converged = IterationCount(10)
 #   while not converged:
 #
-    f = problem.g(x); df = problem.dg(x)
+    f, df = problem.evaluate(x)
     infeasibility = max(0.0, f[1])
     history.popcol('f0',f[0]); history.popcol('inf',infeasibility)
 #   print("{}: {:.3f} {:.3f}".format(converged.iteration - 1, f[0], infeasibility))
@@ -23,8 +23,7 @@ def optimize(problem, sub_problem, x, itercount):
 
         fold = f[0]
         ## RESPONSES
-        f = problem.g(x)
-        df = problem.dg(x)
+        f, df = problem.evaluate(x)
         ##
 
         # # Scaling
@@ -39,7 +38,7 @@ def optimize(problem, sub_problem, x, itercount):
         output2[counter, 0] = (f[0] - fold) / expected_lin  # relative objective change
         output2[counter, 1] = (f[0] - fold) / expected_approx
 
-        xphys = problem.filter.forward(x)
+        xphys = problem.xphys
         output2[counter, 2] = np.sum(4 * xphys.flatten() * (1 - xphys.flatten()) / problem.mesh.n)
 
         ## BUILD SUBPROBLEM
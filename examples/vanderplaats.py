@@ -54,8 +54,7 @@ def example_vanderplaats(N):
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
 
         # Apply scaling strategy
         f, df = scaling.scale(f, df)
@@ -113,8 +112,7 @@ def example_vanderplaats_mixed(N):
     while itte < 100:  # not criterion.converged:
 
         # Evaluate responses and sensitivities at current point, i.e. g(X^(k)), dg(X^(k))
-        f = problem.g(x_k)
-        df = problem.dg(x_k)
+        f, df = problem.evaluate(x_k)
 
         # Apply scaling strategy
         f, df = scaling.scale(f, df)
@@ -1,17 +1,29 @@
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy.sparse import csr_matrix
 
 from sao.problems.problem import Problem
 
 
 # CLASS: This is the VanderplaatsBeam cantilever beam by Dirk (scaled objective as: g_0' = self.scale * g_0)
 class VanderplaatsBeam(Problem):
-
-    def __init__(self, N):
+    """
+    Weight minimization of a cantilever of ``N`` segments with stress, aspect ratio and tip displacement constraints.
+
+    The responses are evaluated for all segments at once, the displacement
+    recursion over the segments is a cumulative sum. Every stress and
+    geometric constraint depends on the width and height of one segment
+    only, with ``sparse=True`` the sensitivities are returned as a
+    ``scipy.sparse.csr_matrix`` with ``8 N`` nonzeros instead of a dense
+    ``(2 N + 2) x 2 N`` array, e.g. for ``N = 1e4`` and more.
+    """
+
+    def __init__(self, N, sparse=False):
         super().__init__()
 
         # Number of segments
         self.N = N
+        self.sparse = sparse
 
         # Scaling factor
         self.scale = 1e-3
@@ -39,92 +51,58 @@ class VanderplaatsBeam(Problem):
         self.L = 5e2  # Total length
         self.S = self.L / self.N  # Segment length
 
-    def g(self, x_k):
-        y = 0.
-        ya = 0.
-        g = np.zeros((self.m + 1), dtype=float)
-
-        for i in range(self.N):
-            b = x_k[i]  # get width
-            h = x_k[self.N + i]  # get height
+        # Force moments at the segments, and the coefficients of the left and right displacements in 1 / I
+        i = np.arange(self.N)
+        self.M = self.P * (self.L - i * self.S)
+        self.c_y = (self.P * self.S ** 2) / (2 * self.E) * (self.L - (i + 1) * self.S + 2 * self.S / 3)
+        self.c_ya = (self.P * self.S) / self.E * (self.L - (i + 1) * self.S + self.S / 2)
 
-            # Weight objective
-            g[0] = g[0] + self.S * b * h * self.scale
+        # Sparsity pattern of the sensitivities: objective, stress, geometric and displacement constraints
+        rows = np.concatenate((np.zeros(self.n), np.tile(1 + i, 2), np.tile(1 + self.N + i, 2),
+                               np.full(self.n, 1 + 2 * self.N)))
+        cols = np.tile(np.arange(self.n), 4)
+        self.order = np.lexsort((cols, rows))
+        self.indices = cols[self.order]
+        self.indptr = np.searchsorted(rows[self.order], np.arange(self.m + 2))
 
-            # Force moment
-            M = self.P * (self.L - (i + 1) * self.S + self.S)
-
-            # Second moment of area
-            I = b * h ** 3 / 12
-
-            # Stress constraints
-            sts = (M * h) / (2 * I)
-            g[1 + i] = sts / self.sig_max - 1.
+    def g(self, x_k):
+        b, h = x_k[:self.N], x_k[self.N:]
+        g = np.empty((self.m + 1), dtype=float)
 
-            # Geometric constraints
-            g[1 + self.N + i] = h - 20 * b
+        # Weight objective
+        g[0] = self.S * self.scale * np.dot(b, h)
 
-            # Left displacement
-            y = (self.P * self.S ** 2) / (2 * self.E * I) * (
-                    self.L - (i + 1) * self.S + 2 * self.S / 3) + ya * self.S + y
+        # Stress constraints, with second moment of area I = b h^3 / 12
+        I = b * h ** 3 / 12
+        g[1:1 + self.N] = (self.M * h) / (2 * I) / self.sig_max - 1.
 
-            # Right displacement
-            ya = (self.P * self.S) / (self.E * I) * (self.L - (i + 1) * self.S + self.S / 2) + ya
+        # Geometric constraints
+        g[1 + self.N:1 + 2 * self.N] = h - 20 * b
 
-        # Displacement constraint value
+        # Displacement constraint: y = sum_i (c_y,i / I_i + S ya_i-1), with the rotations ya = cumsum(c_ya / I)
+        ya = np.cumsum(self.c_ya / I)
+        y = np.sum(self.c_y / I) + self.S * np.sum(ya[:-1])
         g[1 + 2 * self.N] = y / self.y_max - 1
 
         return g
 
     def dg(self, x_k):
-        y = 0.
-        ya = 0.
-        dg = np.zeros((self.m + 1, self.n), dtype=float)
-        for i in range(self.N):
-            b = x_k[i]  # get width
-            h = x_k[self.N + i]  # get height
-
-            # Derivatives of objective
-            dg[0, i] = self.S * h * self.scale
-            dg[0, self.N + i] = self.S * b * self.scale
-
-            # Force moment
-            M = self.P * (self.L - (i + 1) * self.S + self.S)
-
-            # Second moment of area and its derivatives
-            I = b * h ** 3 / 12
-            dIdb = h ** 3 / 12
-            dIdh = 3 * b * h ** 2 / 12
-
-            # Stress constraint sensitivities
-            sts = (M * h) / (2 * I)
-            dg[1 + i, i] = - (6 * M) / (self.sig_max * h ** 2 * b ** 2)
-            dg[1 + i, self.N + i] = - (12 * M) / (self.sig_max * b * h ** 3)
-
-            # Geometric constraint sensitivities
-            dg[1 + self.N + i, i] = -20.
-            dg[1 + self.N + i, self.N + i] = 1.
-
-            # Left displacement
-            y = (self.P * self.S ** 2) / (2 * self.E * I) * (
-                    self.L - (i + 1) * self.S + 2 * self.S / 3) + ya * self.S + y
-
-            # Right displacement
-            ya = (self.P * self.S) / (self.E * I) * (self.L - (i + 1) * self.S + self.S / 2) + ya
-
-            # The derivatives are a function of this segment
-            dA_db = -self.P * self.S ** 2 / self.E / I / I / 2 * (self.L - (i + 1) * self.S + 2 * self.S / 3) * dIdb
-            dA_dh = -self.P * self.S ** 2 / self.E / I / I / 2 * (self.L - (i + 1) * self.S + 2 * self.S / 3) * dIdh
-
-            # and the previous
-            dAa_db = -self.P * self.S / self.E / I / I * (self.L - (i + 1) * self.S + self.S / 2) * dIdb
-            dAa_dh = -self.P * self.S / self.E / I / I * (self.L - (i + 1) * self.S + self.S / 2) * dIdh
-
-            # Displacement constraint sensitivities
-            dg[1 + 2 * self.N, i] = ((self.N - i - 1) * dAa_db * self.S + dA_db) / self.y_max
-            dg[1 + 2 * self.N, self.N + i] = ((self.N - i - 1) * dAa_dh * self.S + dA_dh) / self.y_max
-
-        return dg
+        b, h = x_k[:self.N], x_k[self.N:]
+        I = b * h ** 3 / 12
+        dIdb = h ** 3 / 12
+        dIdh = 3 * b * h ** 2 / 12
+
+        # Derivative of the tip displacement to 1 / I of every segment, which affects all segments to its right
+        dydinvI = (self.c_y + (self.N - np.arange(self.N) - 1) * self.S * self.c_ya) / self.y_max
+        dydI = -dydinvI / I ** 2
+
+        values = np.concatenate((
+            self.S * h * self.scale, self.S * b * self.scale,  # Objective
+            - (6 * self.M) / (self.sig_max * h ** 2 * b ** 2), - (12 * self.M) / (self.sig_max * b * h ** 3),  # Stress
+            np.full(self.N, -20.), np.ones(self.N),  # Geometric
+            dydI * dIdb, dydI * dIdh))  # Displacement
+        dg = csr_matrix((values[self.order], self.indices, self.indptr), shape=(self.m + 1, self.n))
+        return dg if self.sparse else dg.toarray()
 
     def visualize(self, x_k, iteration, vis, **kwargs):
         """Function to visualize current design"""
@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.sparse import coo_matrix
 
 from problems.topology_optimization.util import to_utils as utils
 from sao.problems.problem import Problem
@@ -10,7 +9,7 @@ class ComplianceMBB(Problem):
     def __repr__(self):
         return f'{self.__class__.__name__}( n: {self.mesh.nelx}x{self.mesh.nely}, v: {self.vf}, r: {self.fradius} )'
 
-    def __init__(self, nx, ny, vf=0.2, fradius=2):
+    def __init__(self, nx, ny, vf=0.2, fradius=2, solver=None):
         super().__init__()
         self.eps = 1e-10
         self.mesh = utils.Mesh(nx, ny)
@@ -22,6 +21,7 @@ class ComplianceMBB(Problem):
         self.penal = 3
         self.vf = vf
         self.x0 = self.vf * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.dc = np.zeros((self.mesh.nely, self.mesh.nelx), dtype=float)
         self.ce = np.ones(self.mesh.n, dtype=float)
@@ -34,6 +34,8 @@ class ComplianceMBB(Problem):
         self.fixed = np.union1d(self.dofs[0:2 * (self.mesh.nely + 1):2],
                                 np.array([self.mesh.ndof - 1]))
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
         self.f = np.zeros(self.mesh.ndof, dtype=float)
         self.u = np.zeros((self.mesh.ndof, 1), dtype=float)
 
@@ -45,23 +47,26 @@ class ComplianceMBB(Problem):
         g = np.zeros(self.m + 1)
 
         xphys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xphys
 
         ym = self.eps + (xphys.flatten() ** self.penal) * (1 - self.eps)
-        stiffness_matrix = utils.assemble_K(ym, self.mesh, self.fixed)
+        stiffness_matrix = self.assembly.assemble(ym)
 
-        self.u[self.free, :] = utils.linear_solve(stiffness_matrix, self.f[self.free])
+        self.u[self.free, 0] = self.solver.update(stiffness_matrix).solve(self.f[self.free], x0=self.u[self.free, 0])
 
         # Objective and volume constraint
         self.ce[:] = (np.dot(self.u[self.mesh.edofMat].reshape(self.mesh.n, 8), self.ke) *
                       self.u[self.mesh.edofMat].reshape(self.mesh.n, 8)).sum(1)
 
-        g[0] = np.dot(self.f, self.u)
+        g[0] = np.dot(self.f, self.u[:, 0])
         g[1] = np.sum(xphys[:]) / (self.vf * self.mesh.n) - 1
         return g
 
     def dg(self, x):
         dg = np.zeros((2, self.mesh.n), dtype=float)
-        xphys = self.filter.forward(x)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
         dg[0, :] -= (1 - self.eps) * (self.penal * xphys ** (self.penal - 1)) * self.ce
         dg[1, :] = np.ones(self.mesh.n) / (self.vf * self.mesh.n)
         dg[0, :] = self.filter.backward(dg[0, :])
@@ -71,7 +76,7 @@ class ComplianceMBB(Problem):
 
 
 class Flexure(Problem):
-    def __init__(self, nx, ny, vf=0.5, fradius=2):
+    def __init__(self, nx, ny, vf=0.5, fradius=2, solver=None):
         super().__init__()
         self.eps = 1e-10
         self.mesh = utils.Mesh(nx, ny)
@@ -83,6 +88,7 @@ class Flexure(Problem):
         self.penal = 2
         self.vf = vf
         self.x0 = self.vf * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.ce = np.ones((self.mesh.n, 2), dtype=float)
 
@@ -100,6 +106,9 @@ class Flexure(Problem):
                             self.dofs[self.mesh.ndofy - 1::self.mesh.ndofy])
         self.fixed = np.union1d(top, bottom)
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
+        self.assembly_prescribed = utils.Assembly(self.mesh, self.free, cols=self.fixed, ke=self.ke)
         self.f = np.zeros((self.mesh.ndof, 2), dtype=float)
         self.u = np.zeros((self.mesh.ndof, 2), dtype=float)
 
@@ -110,29 +119,27 @@ class Flexure(Problem):
         g = np.zeros(self.m + 1)
 
         xphys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xphys
 
         ym = self.eps + (xphys ** self.penal) * (1 - self.eps)
-        sk = ((self.ke.flatten()[np.newaxis]).T * ym).flatten(order='F')
-        stiffness_matrix = coo_matrix((sk, (self.mesh.iK, self.mesh.jK)),
-                                      shape=(self.mesh.ndof, self.mesh.ndof)).tocsc()
-
-        self.u[self.free, :] = utils.linear_solve(stiffness_matrix[self.free, :][:, self.free],
-                                                  -stiffness_matrix[self.free, :][:, self.fixed] * self.u[self.fixed,
-                                                                                                   :])
+        self.solver.update(self.assembly.assemble(ym))
+        self.u[self.free, :] = self.solver.solve(-self.assembly_prescribed.assemble(ym) @ self.u[self.fixed, :],
+                                                 x0=self.u[self.free, :])
 
-        # Objective and volume constraint
-        for i in [0, 1]:
-            u = self.u[:, i]
-            self.ce[:, i] = (np.dot(u[self.mesh.edofMat].reshape(self.mesh.n, 8), self.ke) *
-                             u[self.mesh.edofMat].reshape(self.mesh.n, 8)).sum(1)
+        # Element energies of both load cases
+        ue = self.u[self.mesh.edofMat, :]
+        self.ce[:] = np.einsum('ijl,jk,ikl->il', ue, self.ke, ue)
 
-        g[0] = -np.sum(np.dot(self.u[:, 0], stiffness_matrix * self.u[:, 0]))
-        g[1] = np.sum(np.dot(self.u[:, 1], stiffness_matrix * self.u[:, 1])) - 1
+        # Strain energies u^T K u = sum_e ym_e * u_e^T ke u_e
+        g[0] = -np.dot(ym, self.ce[:, 0])
+        g[1] = np.dot(ym, self.ce[:, 1]) - 1
         return g
 
     def dg(self, x):
         dg = np.zeros((2, self.mesh.n), dtype=float)
-        xphys = self.filter.forward(x)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
         for i in [0, 1]:
             dg[i, :] = (1 - self.eps) * (self.penal * xphys ** (self.penal - 1)) * self.ce[:, i]
         dg[0, :] *= -1
@@ -144,17 +151,19 @@ class Flexure(Problem):
 
 class SelfweightArch(Problem):
 
-    def __init__(self, nelx, nely, load=0.0, gravity=10.0, volfrac=0.2, rmin=3, x0=0.5):
+    def __init__(self, nelx, nely, load=0.0, gravity=10.0, volfrac=0.2, rmin=3, x0=0.5, solver=None):
         super().__init__()
         self.name = 'self-weight'
         self.Eps = 1e-10
         self.mesh = utils.Mesh(nelx, nely)
         self.factor = None
+        self.m = 1
         self.n = self.mesh.n
 
         self.penal = 3
         self.volfrac = volfrac
         self.x0 = x0 * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.dc = np.zeros((self.mesh.nely, self.mesh.nelx), dtype=float)
         self.ce = np.ones(self.mesh.n, dtype=float)
@@ -167,6 +176,8 @@ class SelfweightArch(Problem):
         self.fixed = np.union1d(self.dofs[0:self.mesh.ndofy:2],
                                 np.array([self.mesh.ndof - 2, self.mesh.ndof - 1]))
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.KE)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
         self.f = np.zeros(self.mesh.ndof, dtype=float)
         self.u = np.zeros((self.mesh.ndof, 1), dtype=float)
 
@@ -179,6 +190,7 @@ class SelfweightArch(Problem):
         g = np.zeros(2)
 
         xPhys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xPhys
 
         # Gravity load
         self.f[:] = 0
@@ -187,21 +199,23 @@ class SelfweightArch(Problem):
         self.f[self.dout] -= self.load
 
         E = self.Eps + (0.1 * xPhys.flatten() + 0.9 * (xPhys.flatten() ** self.penal)) * (1 - self.Eps)
-        K = utils.assemble_K(E, self.mesh, self.fixed)
+        K = self.assembly.assemble(E)
 
-        self.u[self.free, :] = utils.linear_solve(K, self.f[self.free])
+        self.u[self.free, 0] = self.solver.update(K).solve(self.f[self.free], x0=self.u[self.free, 0])
 
         # Objective and volume constraint
         self.ce[:] = (np.dot(self.u[self.mesh.edofMat].reshape(self.mesh.n, 8), self.KE) *
                       self.u[self.mesh.edofMat].reshape(self.mesh.n, 8)).sum(1)
 
-        g[0] = np.dot(self.f, self.u)
+        g[0] = np.dot(self.f, self.u[:, 0])
         g[1] = 1 - sum(xPhys[:]) / (self.volfrac * self.mesh.n)
         return g
 
     def dg(self, x):
         dg = np.zeros((2, self.mesh.n), dtype=float)
-        xPhys = self.filter.forward(x)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xPhys = self.xphys
         dg[0, :] -= (1 - self.Eps) * (0.1 + 0.9 * self.penal * xPhys ** (self.penal - 1)) * self.ce
 
         # np.add.at(self.f, self.edofMat[:, 1::2].flatten(), np.kron(xPhys, -self.gravity*np.ones(4)/4))
@@ -220,11 +234,174 @@ class SelfweightArch(Problem):
 
 
 class SelfweightMBB(SelfweightArch):
-    def __init__(self, nelx, nely, load=0.0, gravity=10.0, volfrac=0.2, rmin=2, x0=0.5):
-        super().__init__(nelx, nely, load=load, gravity=gravity, volfrac=volfrac, rmin=rmin, x0=x0)
+    def __init__(self, nelx, nely, load=0.0, gravity=10.0, volfrac=0.2, rmin=2, x0=0.5, solver=None):
+        super().__init__(nelx, nely, load=load, gravity=gravity, volfrac=volfrac, rmin=rmin, x0=x0, solver=solver)
         self.fixed = np.union1d(self.dofs[0:self.mesh.ndofy:2],
                                 np.array([self.mesh.ndof - 1]))
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.KE)
+        self.solver.setup(self.mesh, self.free)
+
+
+class MultiLoadCompliance(Problem):
+    """
+    Weighted sum of the compliances of several load cases, subject to a volume constraint.
+
+    The stiffness matrix is factorized once per design and all load cases are
+    solved against that factorization. By default a cantilever clamped at the
+    left edge is loaded at its top and bottom right corners, as two separate
+    load cases.
+
+    :param loads: Load vectors of size [ndof, nload]
+    :param weights: Weights of the load cases, equal weights by default
+    :param fixed: The fixed dofs, the left edge by default
+    """
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( n: {self.mesh.nelx}x{self.mesh.nely}, loads: {self.f.shape[1]} )'
+
+    def __init__(self, nx, ny, loads=None, weights=None, fixed=None, vf=0.4, fradius=2, solver=None):
+        super().__init__()
+        self.eps = 1e-10
+        self.mesh = utils.Mesh(nx, ny)
+        self.m = 1
+        self.n = self.mesh.n
+        self.fradius = fradius
+
+        self.penal = 3
+        self.vf = vf
+        self.x0 = self.vf * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
+
+        self.ke = utils.element_matrix_stiffness()
+
+        self.filter = utils.Filter(self.mesh, fradius)
+
+        self.dofs = np.arange(self.mesh.ndof)
+        self.fixed = self.dofs[0:self.mesh.ndofy] if fixed is None else np.asarray(fixed)
+        self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
+
+        if loads is None:
+            loads = np.zeros((self.mesh.ndof, 2), dtype=float)
+            loads[self.mesh.ndof - self.mesh.ndofy + 1, 0] = -1
+            loads[self.mesh.ndof - 1, 1] = 1
+        self.f = np.asarray(loads, dtype=float).reshape(self.mesh.ndof, -1)
+        self.weights = np.ones(self.f.shape[1]) if weights is None else np.asarray(weights, dtype=float)
+        self.u = np.zeros_like(self.f)
+        self.ce = np.ones((self.mesh.n, self.f.shape[1]), dtype=float)
+
+    def g(self, x):
+        g = np.zeros(self.m + 1)
+
+        xphys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xphys
+
+        ym = self.eps + (xphys ** self.penal) * (1 - self.eps)
+        self.solver.update(self.assembly.assemble(ym))
+        self.u[self.free, :] = self.solver.solve(self.f[self.free, :], x0=self.u[self.free, :])
+
+        # Element energies of all load cases
+        ue = self.u[self.mesh.edofMat, :]
+        self.ce[:] = np.einsum('ijl,jk,ikl->il', ue, self.ke, ue)
+
+        g[0] = np.dot(self.weights, np.einsum('ij,ij->j', self.f, self.u))
+        g[1] = np.sum(xphys) / (self.vf * self.mesh.n) - 1
+        return g
+
+    def dg(self, x):
+        dg = np.zeros((2, self.mesh.n), dtype=float)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
+        dg[0, :] -= (1 - self.eps) * (self.penal * xphys ** (self.penal - 1)) * (self.ce @ self.weights)
+        dg[1, :] = np.ones(self.mesh.n) / (self.vf * self.mesh.n)
+        dg[0, :] = self.filter.backward(dg[0, :])
+        dg[1, :] = self.filter.backward(dg[1, :])
+
+        return dg
+
+
+class Compliance3D(Problem):
+    """
+    Compliance minimization of a 3D cantilever of hexahedral elements, subject to a volume constraint.
+
+    The face ``x = 0`` is clamped and a unit downward load is distributed over
+    the lower edge of the face ``x = nelx``. Assembly and energies are fully
+    vectorized, and by default the equilibrium is solved with the multigrid
+    preconditioned CG solver, warm started from the previous displacements,
+    which scales to large meshes where a direct factorization runs out of
+    memory. Multigrid coarsening requires even element numbers in all
+    directions.
+    """
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( n: {self.mesh.nelx}x{self.mesh.nely}x{self.mesh.nelz}, v: {self.vf}, ' \
+               f'r: {self.fradius} )'
+
+    def __init__(self, nx, ny, nz, vf=0.3, fradius=1.5, solver='multigrid'):
+        super().__init__()
+        self.eps = 1e-10
+        self.mesh = utils.Mesh3D(nx, ny, nz)
+        self.m = 1
+        self.n = self.mesh.n
+        self.fradius = fradius
+
+        self.penal = 3
+        self.vf = vf
+        self.x0 = self.vf * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
+
+        self.ce = np.ones(self.mesh.n, dtype=float)
+
+        self.ke = utils.element_matrix_stiffness_3d()
+
+        self.filter = utils.Filter(self.mesh, fradius)
+
+        self.dofs = np.arange(self.mesh.ndof)
+        nodes = self.mesh.nodgrid
+        self.fixed = (3 * nodes[:, 0, :].ravel()[:, np.newaxis] + np.arange(3)).ravel()
+        self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
+        self.f = np.zeros(self.mesh.ndof, dtype=float)
+        self.u = np.zeros((self.mesh.ndof, 1), dtype=float)
+
+        # Applied load along the lower edge of the free end, half weights at the corners
+        load_nodes = nodes[:, -1, 0]
+        self.f[3 * load_nodes + 1] = -1 / nz
+        self.f[3 * load_nodes[[0, -1]] + 1] = -0.5 / nz
+
+    def g(self, x):
+        g = np.zeros(self.m + 1)
+
+        xphys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xphys
+
+        ym = self.eps + (xphys ** self.penal) * (1 - self.eps)
+        self.solver.update(self.assembly.assemble(ym))
+        self.u[self.free, 0] = self.solver.solve(self.f[self.free], x0=self.u[self.free, 0])
+
+        # Objective and volume constraint
+        ue = self.u[self.mesh.edofMat, 0]
+        self.ce[:] = np.einsum('ij,jk,ik->i', ue, self.ke, ue)
+
+        g[0] = np.dot(self.f, self.u[:, 0])
+        g[1] = np.sum(xphys) / (self.vf * self.mesh.n) - 1
+        return g
+
+    def dg(self, x):
+        dg = np.zeros((2, self.mesh.n), dtype=float)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
+        dg[0, :] -= (1 - self.eps) * (self.penal * xphys ** (self.penal - 1)) * self.ce
+        dg[1, :] = np.ones(self.mesh.n) / (self.vf * self.mesh.n)
+        dg[0, :] = self.filter.backward(dg[0, :])
+        dg[1, :] = self.filter.backward(dg[1, :])
+
+        return dg
 
 
 if __name__ == "__main__":
@@ -242,3 +419,9 @@ if __name__ == "__main__":
 
     problem = SelfweightMBB(4, 4)
     finite_difference(problem, problem.x0, dx)
+
+    problem = MultiLoadCompliance(4, 4)
+    finite_difference(problem, problem.x0, dx)
+
+    problem = Compliance3D(4, 2, 2, solver='cholmod')
+    finite_difference(problem, problem.x0, dx)
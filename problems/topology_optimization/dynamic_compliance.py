@@ -1,20 +1,47 @@
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.sparse.linalg import eigsh, splu, LinearOperator, spsolve
 
+from problems.topology_optimization.util import to_utils as utils
+from problems.topology_optimization.util.frequency_response import ModalBasis, direct_response
 from sao.problems import Problem
 
 
 class DynamicComplianceMBB(Problem):
-    def __init__(self, nelx, nely, volfrac=0.6, penal=3, rmin=2, rho=1e-10, compute_eigenvalues=False,
-                 objective_scale=100.0, omega=1000.0, plot_frf=False):
+    """
+    Minimization of the dynamic compliance of an MBB beam, subject to a volume constraint.
+
+    The objective is the (weighted) sum of the dynamic compliance amplitudes
+    ``|f^T u(omega)|`` at the frequencies ``omega``. By default the harmonic
+    response is solved directly at every frequency. With ``n_modes`` the
+    responses and sensitivities follow from a reduced basis of the lowest
+    modes and the static correction, which is built once per design, such
+    that many frequencies cost little more than one solve. Its sensitivities
+    neglect the change of the basis. The frequency response function of the
+    last analysed design is available through ``frf``.
+    """
+
+    def __init__(self, nelx, nely, volfrac=0.6, penal=3, rmin=2, rho=1e-10, objective_scale=100.0, omega=1000.0,
+                 weights=None, n_modes=None, solver=None):
         super().__init__()
+        self.Eps = 1e-10
+        self.mesh = utils.Mesh(nelx, nely)
+        self.m = 1
+        self.n = self.mesh.n
         self.unitL = 10.0 / nelx
 
-        # Solution and RHS vectors
-        self.u = np.zeros(self.ndof, dtype=np.complex128)
-        self.f = np.zeros(self.ndof)
-        self.f[self.dout] = -1  # Set load
+        self.penal = penal
+        self.volfrac = volfrac
+        self.x0 = self.volfrac * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
+
+        self.KE = utils.element_matrix_stiffness()
+
+        self.filter = utils.Filter(self.mesh, rmin)
+
+        self.dofs = np.arange(self.mesh.ndof)
+        self.fixed = np.union1d(self.dofs[0:self.mesh.ndofy:2], np.array([self.mesh.ndof - 1]))
+        self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.KE)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
 
         # Material density
         self.rho = rho
@@ -23,107 +50,52 @@ class DynamicComplianceMBB(Problem):
         self.alpha = 1e-5
         self.beta = 1e-5
 
-        # Evaluation frequency
-        self.omega = omega
-        self.compute_eigenvalues = compute_eigenvalues
+        # Evaluation frequencies and their weights in the objective
+        self.omega = np.atleast_1d(np.asarray(omega, dtype=float))
+        self.weights = np.ones(len(self.omega)) if weights is None else np.asarray(weights, dtype=float)
+
+        # Solution and RHS vectors
+        self.dout = 1
+        self.f = np.zeros(self.mesh.ndof)
+        self.f[self.dout] = -1
+        self.u = np.zeros((self.mesh.ndof, len(self.omega)), dtype=np.complex128)
+
+        self.n_modes = n_modes
+        self.basis = ModalBasis(20 if n_modes is None else n_modes, solver=self.solver)
+        self.basis_current = False
 
-        # Objective scaling_strategies
+        # Objective scaling
         self.objective_scale = objective_scale
         self.g0fac = None
 
         self.xPhys = None
-        self.f_compl = 0
-
-        if plot_frf:
-            self.fig, self.ax = plt.subplots(1, 1)
-            self.ax.set_title("Frequency response function")
-            self.ax.set_xlabel("Frequency (rad/s)")
-            self.ax.set_ylabel("Amplitude (m/N)")
-            self.ax.set_yscale('log')
-            plt.show(block=False)
-            self.omg_line, = self.ax.plot([], [], 'k--')
-            self.omg_dot, = self.ax.plot([], [], 'k.')
-            self.frf_line, = self.ax.plot([], [])
+        self.f_compl = np.zeros(len(self.omega), dtype=np.complex128)
 
-        else:
-            self.fig, self.ax = None, None
+    def matrices(self, xPhys):
+        E = self.Eps + (0.1 * xPhys + 0.9 * (xPhys ** self.penal)) * (1 - self.Eps)
+        ro = self.Eps + (1 - self.Eps) * xPhys
+        K = self.assembly.assemble(E)
+        M = utils.assemble_M(ro, self.mesh, self.free, rho=self.rho, lx=self.unitL, ly=self.unitL)
+        return K, M
 
     def g(self, x):
         # Filter design variables
-        self.xPhys = np.asarray(self.H * x[np.newaxis].T / self.Hs)[:, 0]
-
-        # Assemble mass and stiffness matrix
-        K = self.assemble_K(self.xPhys, interpolation='simplin')
-        M = self.assemble_M(self.xPhys, rho=self.rho, lx=self.unitL, ly=self.unitL)
-
-        # Dynamic stiffness matrix
-        Z = K + 1j * self.omega * (self.alpha * M + self.beta * K) - self.omega ** 2 * M
-
-        # Solve the dynamic equation
-        self.u[self.free] = spsolve(Z, self.f[self.free])
-        self.f_compl = self.u @ self.f
-
-        if self.compute_eigenvalues or self.fig is not None:
-            Kinv = splu(K)
-            KinvOp = LinearOperator(K.shape, Kinv.solve)
-
-            # Solve the eigenvalue problem
-            n_modes = 20
-            eigvals, eigvecs = eigsh(K, M=M, k=n_modes, OPinv=KinvOp, sigma=0.0)
-            if self.compute_eigenvalues:
-                print(f"Eigenfrequencies: {np.sqrt(eigvals)}")
-            if self.fig is not None:
-                wmin, wmax = 0, 2 * self.omega
-                wrange = np.linspace(wmin, wmax, 1000)
-                # --- Approximate response ---
-                u_aug = KinvOp(self.f[self.free])
-                for i in range(n_modes):
-                    u_aug -= u_aug @ M @ eigvecs[:, i] * eigvecs[:, i]
-                u_aug /= u_aug @ M @ u_aug
-
-                V = np.hstack((eigvecs, u_aug[..., np.newaxis]))
-                lam_red = np.hstack((eigvals, u_aug @ K @ u_aug))
-
-                Fr = self.f[self.free] @ V
-                frf = np.absolute(Fr @ (Fr[..., np.newaxis] /
-                                        ((lam_red[..., np.newaxis] - (wrange ** 2)[np.newaxis]) +
-                                         1j * wrange[np.newaxis] * (
-                                                 self.alpha + self.beta * lam_red[..., np.newaxis]))))
-
-                '''
-                 # --- Actual response ---
-                frf = np.zeros_like(wrange)
-                for i, w in enumerate(wrange):
-                    sys.stdout.write(f"\rSolving frequency {i+1}/{len(wrange)}...")
-                    sys.stdout.flush()
-
-                    # Dynamic stiffness matrix
-                    Zi = K + 1j*w*(self.alpha*M + self.beta*K) - w**2 * M
-
-                    # Solve the dynamic equation
-                    u = spsolve(Zi, self.f[self.free])
-                    frf[i] = np.absolute(u@self.f[self.free])
-                sys.stdout.write(f"All {len(wrange)} frequencies solved\n")
-                sys.stdout.flush()
-                '''
-                # ---------------------------------
-
-                ymin, ymax = min(frf) * 0.9, max(frf) * 1.1
-                self.frf_line.set_xdata(wrange)
-                self.frf_line.set_ydata(frf)
-                self.omg_line.set_xdata([self.omega, self.omega])
-                self.omg_line.set_ydata([ymin, ymax])
-                self.omg_dot.set_xdata([self.omega])
-                self.omg_dot.set_ydata([np.absolute(self.f_compl)])
-                self.ax.set_ylim([ymin, ymax])
-                self.ax.set_xlim([0, 2 * self.omega])
-
-                self.fig.canvas.draw()
-                self.fig.canvas.flush_events()
+        self.xPhys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), self.xPhys
+
+        self.K, self.M = self.matrices(self.xPhys)
+        if self.n_modes is None:
+            self.u[self.free, :] = direct_response(self.K, self.M, self.f[self.free], self.omega, self.alpha, self.beta)
+            self.basis_current = False
+        else:
+            self.basis.update(self.K, self.M, self.f[self.free])
+            self.u[self.free, :] = self.basis.response(self.omega, self.alpha, self.beta)
+            self.basis_current = True
+        self.f_compl[:] = self.f @ self.u
 
         # Calculate responses
         g_j = np.empty(2)
-        g_j[0] = np.absolute(self.f_compl)
+        g_j[0] = np.dot(self.weights, np.absolute(self.f_compl))
         if self.g0fac is None:
             self.g0fac = self.objective_scale / g_j[0]
         g_j[0] *= self.g0fac
@@ -132,30 +104,46 @@ class DynamicComplianceMBB(Problem):
 
     def dg(self, x):
         dg_j = np.zeros((2, self.n))
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
 
-        ue = self.u[self.edofMat]
-
-        dg_dabs = self.f_compl / np.absolute(self.f_compl)
+        ue = self.u[self.mesh.edofMat, :]
 
-        dg_dK = dg_dabs * (-1 + 1j * self.omega * self.beta)
-        dg_dM = dg_dabs * (self.omega ** 2 + 1j * self.omega * self.alpha)
+        # d|C|/dZ = conj(C)/|C| * dC/dZ with dC = -u^T dZ u, for all frequencies
+        dg_dabs = self.weights * np.conj(self.f_compl) / np.absolute(self.f_compl)
+        dg_dK = -dg_dabs * (1 + 1j * self.omega * self.beta)
+        dg_dM = -dg_dabs * (1j * self.omega * self.alpha - self.omega ** 2)
 
-        dg_dsK = np.real(dg_dK * np.conj(np.einsum("ij,jk,ik->i", ue, self.KE, ue)))
         m_el = self.rho * self.unitL * self.unitL / 4
-        dg_dsM = np.real(dg_dM * m_el * np.conj(np.einsum("ij,ij->i", ue, ue)))
+        dg_dsK = np.real(np.einsum("ijl,jk,ikl->il", ue, self.KE, ue) @ dg_dK)
+        dg_dsM = np.real(m_el * np.einsum("ijl,ijl->il", ue, ue) @ dg_dM)
 
         dg_j[0, :] += dg_dsK * (1 - self.Eps) * (0.1 + 0.9 * self.penal * self.xPhys ** (self.penal - 1))
         dg_j[0, :] += dg_dsM * (1 - self.Eps)
 
         # Volume
-        dg_j[1, :] = np.ones(self.nely * self.nelx) / (self.volfrac * self.n)
+        dg_j[1, :] = np.ones(self.n) / (self.volfrac * self.n)
 
         # Sensitivity filtering
-        dg_j[0, :] = self.g0fac * np.asarray(self.H * (dg_j[0, :][np.newaxis].T / self.Hs))[:, 0]
-        dg_j[1, :] = 10 * np.asarray(self.H * (dg_j[1, :][np.newaxis].T / self.Hs))[:, 0]
+        dg_j[0, :] = self.g0fac * self.filter.backward(dg_j[0, :])
+        dg_j[1, :] = 10 * self.filter.backward(dg_j[1, :])
 
         return dg_j
 
+    def frf(self, omega):
+        """Dynamic compliance of the last analysed design at the frequencies ``omega``, from the modal basis."""
+        if not self.basis_current:
+            self.basis.update(self.K, self.M, self.f[self.free])
+            self.basis_current = True
+        return self.basis.compliance(omega, self.alpha, self.beta)
+
+    @property
+    def eigenfrequencies(self):
+        """Eigenfrequencies of the modal basis of the last analysed design."""
+        if not self.basis_current:
+            self.frf(self.omega)
+        return np.sqrt(self.basis.lam[:-1])
+
 
 if __name__ == "__main__":
     from problems.util.fd import finite_difference
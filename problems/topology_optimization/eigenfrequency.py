@@ -1,13 +1,30 @@
+import warnings
+
 import numpy as np
-from scipy.sparse.linalg import eigsh, splu, LinearOperator
+from scipy.sparse.linalg import eigsh, lobpcg, LinearOperator
 
-import util.to_utils as utils
+from problems.topology_optimization.util import to_utils as utils
 from sao.problems.problem import Problem
+from sao.util.profiling import profiled
 
 
 class EigenfrequencyClampedBeam(Problem):
-
-    def __init__(self, nelx, nely, volfrac=0.2, rmin=2, n_eigenvalues=20, rho=1.0e-2):
+    """
+    Maximization of the lowest eigenfrequencies of a clamped beam, subject to a volume constraint.
+
+    The eigenpairs are found by shift-invert ``eigsh``, started from the modes
+    of the previous design. With ``eigen_solver='lobpcg'`` the analyses after
+    the first one use LOBPCG instead, warm started from the previous modes and
+    preconditioned by the linear solver of the current stiffness matrix (which
+    reuses its symbolic factorization), up to a relative eigenvalue accuracy
+    of about ``tol``. ``n_guard`` additional modes are computed to speed up
+    convergence and to detect repeated eigenvalues at the boundary of the
+    included modes; ``multiplicity`` holds the number of (nearly) equal
+    eigenvalues of every mode.
+    """
+
+    def __init__(self, nelx, nely, volfrac=0.2, rmin=2, n_eigenvalues=20, rho=1.0e-2, eigen_solver='eigsh',
+                 n_guard=2, tol=1e-6, maxiter=100, solver=None):
         super().__init__()
         self.name = 'EigenfrequencyMBB'
         self.Eps = 1e-10
@@ -20,12 +37,16 @@ class EigenfrequencyClampedBeam(Problem):
         self.penal = 3
         self.volfrac = volfrac
         self.x0 = self.volfrac * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.dc = np.zeros((self.mesh.nely, self.mesh.nelx), dtype=float)
         self.ce = np.ones(self.mesh.n, dtype=float)
 
         self.KE = utils.element_matrix_stiffness()
 
+        # Element dimensions of the lumped mass matrix
+        self.lx, self.ly = 1 / self.mesh.nelx, self.mesh.nely
+
         self.filter = utils.Filter(self.mesh, rmin)
 
         self.dofs = np.arange(self.mesh.ndof)
@@ -34,38 +55,88 @@ class EigenfrequencyClampedBeam(Problem):
                            self.dofs[self.mesh.ndof - self.mesh.ndofy + 1:self.mesh.ndof:2])
         self.fixed = np.union1d(left, right)
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.KE)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
+
+        if eigen_solver not in ('eigsh', 'lobpcg'):
+            raise ValueError(f"Unknown eigen solver '{eigen_solver}'")
+        self.eigen_solver = eigen_solver
+        self.tol, self.maxiter = tol, maxiter
         self.n_eig = n_eigenvalues
-        self.u = np.zeros((self.mesh.ndof, self.n_eig), dtype=float)
+        self.n_guard = n_guard
+        self.u = np.zeros((self.mesh.ndof, self.n_eig + self.n_guard), dtype=float)
+        self.eigvals = None
+        self.multiplicity = np.ones(self.n_eig, dtype=int)
+
+    @profiled('linear_solver.eigenpairs')
+    def eigenpairs(self, K, M):
+        """Returns the lowest eigenpairs of ``K v = lambda M v``, sorted by eigenvalue."""
+        self.solver.update(K)
+        inverse = LinearOperator(K.shape, self.solver.solve, dtype=float)
+        if self.eigen_solver == 'lobpcg' and self.eigvals is not None:
+            # Iterative solvers only apply their preconditioner, e.g. a multigrid cycle
+            precondition = getattr(self.solver, 'precondition', self.solver.solve)
+            X = self.u[self.free, :]
+
+            # The eigenvalue error is of the order of the squared residual
+            tol = np.sqrt(self.tol)
+            preconditioner = LinearOperator(K.shape, matvec=precondition, matmat=precondition, dtype=float)
+            with warnings.catch_warnings():
+                # Convergence is checked below
+                warnings.simplefilter('ignore', UserWarning)
+                vals, vecs = lobpcg(K, X, B=M, M=preconditioner, largest=False,
+                                    tol=tol * np.linalg.norm(K @ X[:, 0]), maxiter=self.maxiter)
+            order = np.argsort(vals)
+            vals, vecs = vals[order], vecs[:, order]
+
+            # Fall back to shift-invert when the warm start did not converge
+            Kv = K @ vecs
+            residual = np.linalg.norm(Kv - (M @ vecs) * vals, axis=0) / np.linalg.norm(Kv, axis=0)
+            if np.all(residual[:self.n_eig] < tol):
+                return vals, vecs
+
+        # Start the Lanczos iterations from a combination of the previous modes
+        v0 = None if self.eigvals is None else self.u[self.free, :].sum(axis=1)
+        vals, vecs = eigsh(K, M=M, k=self.n_eig + self.n_guard, OPinv=inverse, sigma=0.0, v0=v0)
+        order = np.argsort(vals)
+        return vals[order], vecs[:, order]
 
     def g(self, x):
         g = np.zeros(self.m + 1)
 
         xPhys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xPhys
 
         E = self.Eps + (0.1 * xPhys.flatten() + 0.9 * (xPhys.flatten() ** self.penal)) * (1 - self.Eps)
-        K = utils.assemble_K(E, self.mesh, self.fixed)
+        K = self.assembly.assemble(E)
 
         ro = self.Eps + (1 - self.Eps) * xPhys.flatten()
-        M = utils.assemble_M(ro, self.mesh, self.free, rho=self.rho, lx=1 / self.mesh.nelx, ly=self.mesh.nely)
+        M = utils.assemble_M(ro, self.mesh, self.free, rho=self.rho, lx=self.lx, ly=self.ly)
+
+        self.eigvals, self.u[self.free, :] = self.eigenpairs(K, M)
 
-        Kinv = splu(K)
-        KinvOp = LinearOperator(K.shape, Kinv.solve)
-        self.eigvals, self.u[self.free, :] = eigsh(K, M=M, k=self.n_eig, OPinv=KinvOp, sigma=0.0)
+        # Groups of repeated eigenvalues, the objective is not differentiable when a group is split
+        groups = np.concatenate(([0], np.cumsum(np.diff(self.eigvals) > 1e-6 * np.abs(self.eigvals[1:]))))
+        self.multiplicity = np.bincount(groups)[groups][:self.n_eig]
+        if self.n_guard > 0 and groups[self.n_eig - 1] == groups[self.n_eig]:
+            warnings.warn('A repeated eigenvalue is split by the number of included eigenvalues')
 
-        g[0] = np.sum(1 / self.eigvals)
+        g[0] = np.sum(1 / self.eigvals[:self.n_eig])
         g[1] = np.sum(xPhys[:]) / (self.volfrac * self.mesh.n) - 1
         return g
 
     def dg(self, x):
         dg = np.zeros((2, self.mesh.n), dtype=float)
-        xPhys = self.filter.forward(x)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xPhys = self.xphys
 
-        dg_dlam = -1 / self.eigvals ** 2
+        eigvals = self.eigvals[:self.n_eig]
+        dg_dlam = -1 / eigvals ** 2
 
-        ue = self.u[self.mesh.edofMat, :]
+        ue = self.u[self.mesh.edofMat, :self.n_eig]
         dg_dsK = np.einsum("E,ijE,jk,ikE->i", dg_dlam, ue, self.KE, ue)
-        dg_dsM = np.einsum("E,ijE,ijE->i",
-                           -self.eigvals * dg_dlam * self.rho * (1 / self.mesh.nelx) * (1 / self.mesh.nely) / 4, ue, ue)
+        dg_dsM = np.einsum("E,ijE,ijE->i", -eigvals * dg_dlam * self.rho * self.lx * self.ly / 4, ue, ue)
 
         dg[0, :] += dg_dsK * (1 - self.Eps) * (0.1 + 0.9 * self.penal * xPhys ** (self.penal - 1))
         dg[0, :] += dg_dsM * (1 - self.Eps)
@@ -1,12 +1,11 @@
 import numpy as np
-from scipy.sparse import coo_matrix
 
-import util.to_utils as utils
+from problems.topology_optimization.util import to_utils as utils
 from sao.problems import Problem
 
 
 class MechanismClampedBeam(Problem):
-    def __init__(self, nx, ny, vf=0.2, fradius=2, kin=100, kout=100):
+    def __init__(self, nx, ny, vf=0.2, fradius=2, kin=100, kout=100, solver=None):
         super().__init__()
         self.eps = 1e-10
         self.mesh = utils.Mesh(nx, ny)
@@ -18,6 +17,7 @@ class MechanismClampedBeam(Problem):
         self.penal = 3
         self.vf = vf
         self.x0 = self.vf * np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.dc = np.zeros((self.mesh.nely, self.mesh.nelx), dtype=float)
         self.ce = np.ones(self.mesh.n, dtype=float)
@@ -43,11 +43,11 @@ class MechanismClampedBeam(Problem):
         self.f[self.din, 0] = 1
         self.f[self.dout, 1] = -1
 
-        istiff = np.array([self.din, self.dout])
-        jstiff = np.array([self.din, self.dout])
+        # Springs at the input and output ports
         self.sstiff = np.array([kin, kout])
-        self.mesh.iK = np.concatenate((self.mesh.iK, istiff))
-        self.mesh.jK = np.concatenate((self.mesh.jK, jstiff))
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
+        self.assembly.add_constant([self.din, self.dout], [self.din, self.dout], self.sstiff)
 
     def g(self, x):
         g = np.zeros(self.m + 1)
@@ -56,13 +56,11 @@ class MechanismClampedBeam(Problem):
         # y[0:2,-4::] = 1
         # y[self.mesh.nely-self.mesh.nely//10:self.mesh.nely-1,0:self.mesh.nelx//10] = 1
         xphys = self.filter.forward(x.flatten())
+        self.x_analysis, self.xphys = x.copy(), xphys
 
         ym = self.eps + (xphys.flatten() ** self.penal) * (1 - self.eps)
-        sk = np.concatenate((((self.ke.flatten()[np.newaxis]).T * ym).flatten(order='F'), self.sstiff))
-        stiffness_matrix = coo_matrix((sk, (self.mesh.iK, self.mesh.jK)),
-                                      shape=(self.mesh.ndof, self.mesh.ndof)).tocsc()
-
-        self.u[self.free, :] = utils.linear_solve(stiffness_matrix[self.free, :][:, self.free], self.f[self.free, :])
+        self.solver.update(self.assembly.assemble(ym))
+        self.u[self.free, :] = self.solver.solve(self.f[self.free, :], x0=self.u[self.free, :])
         u = self.u[:, 0]
         lag = self.u[:, 1]
 
@@ -76,7 +74,9 @@ class MechanismClampedBeam(Problem):
 
     def dg(self, x):
         dg = np.zeros((2, self.mesh.n), dtype=float)
-        xphys = self.filter.forward(x)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
         dg[0, :] = (1 - self.eps) * (self.penal * xphys ** (self.penal - 1)) * self.ce
         dg[1, :] = np.ones(self.mesh.n) / (self.vf * self.mesh.n)
         dg[0, :] = self.filter.backward(dg[0, :])
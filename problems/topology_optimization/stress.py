@@ -1,17 +1,28 @@
 import numpy as np
 
-import util.to_utils as utils
+from problems.topology_optimization.util import to_utils as utils
 from sao.problems import Problem
 
 
 class StressCantilever(Problem):
-
-    def __init__(self, nx, ny, vf=0.2, fradius=3, max_stress=0.1):
+    """
+    Volume minimization of a cantilever subject to p-norm aggregated stress constraints.
+
+    The relaxed element stresses are aggregated into ``n_clusters`` p-norm
+    constraints, of fixed clusters of elements: contiguous blocks in the
+    element numbering, i.e. vertical strips of the mesh. With a single
+    cluster this is the global p-norm constraint, with ``n_clusters`` equal
+    to the number of elements every element has its own stress constraint.
+    The adjoint loads of all clusters are solved with the factorization of
+    the analysis.
+    """
+
+    def __init__(self, nx, ny, vf=0.2, fradius=3, max_stress=0.1, n_clusters=1, solver=None):
         super().__init__()
         self.eps = 1e-10
         self.mesh = utils.Mesh(nx, ny)
         self.factor = None
-        self.m = 1
+        self.m = n_clusters
         self.n = self.mesh.n
         self.fradius = fradius
 
@@ -21,9 +32,10 @@ class StressCantilever(Problem):
         self.vf = vf
         self.P = 4
         self.x0 = np.ones(self.mesh.n, dtype=float)
+        self.x_analysis = None
 
         self.dc = np.zeros((self.mesh.nely, self.mesh.nelx), dtype=float)
-        self.ce = np.ones(self.mesh.n, dtype=float)
+        self.ce = np.ones((self.mesh.n, self.m), dtype=float)
 
         self.ke = utils.element_matrix_stiffness()
 
@@ -33,6 +45,8 @@ class StressCantilever(Problem):
         self.fixed = np.union1d(self.dofs[0:self.mesh.ndof:self.mesh.ndofy],
                                 self.dofs[1:self.mesh.ndof:self.mesh.ndofy])
         self.free = np.setdiff1d(self.dofs, self.fixed)
+        self.assembly = utils.Assembly(self.mesh, self.free, ke=self.ke)
+        self.solver = utils.linear_solver(solver, self.mesh, self.free)
         self.f = np.zeros(self.mesh.ndof, dtype=float)
         self.u = np.zeros((self.mesh.ndof, 1), dtype=float)
 
@@ -51,7 +65,16 @@ class StressCantilever(Problem):
                            [-0.5, 1, 0],
                            [0, 0, 3]])
 
-        self.lag = np.zeros((self.mesh.ndof, 1))
+        # Element stresses DB u_e (engineering shear strain) and squared von Mises stresses u_e^T M u_e
+        self.DB = self.D @ (np.array([1, 1, 2])[:, np.newaxis] * self.B)
+        self.M = self.DB.T @ self.V @ self.DB
+
+        # Fixed clusters of contiguous elements
+        self.clusters = np.zeros(self.mesh.n, dtype=int)
+        for i, elements in enumerate(np.array_split(np.arange(self.mesh.n), self.m)):
+            self.clusters[elements] = i
+        self.cluster_size = np.bincount(self.clusters, minlength=self.m)
+        self.lag = np.zeros((self.mesh.ndof, self.m))
 
         # Applied load at top
         self.dout = self.dofs[self.mesh.ndofy * (self.mesh.nelx // 2 + 1) - 2]
@@ -61,59 +84,55 @@ class StressCantilever(Problem):
         g = np.zeros(self.m + 1)
 
         xphys = self.filter.forward(x)
+        self.x_analysis, self.xphys = x.copy(), xphys
 
         ym = self.eps + (1.0 * xphys.flatten() + 0.9 * (xphys.flatten() ** self.penal)) * (1 - self.eps)
-        self.stiffness_matrix = utils.assemble_K(ym, self.mesh, self.fixed)
-
-        self.u[self.free, :] = utils.linear_solve(self.stiffness_matrix, self.f[self.free])
+        self.stiffness_matrix = self.assembly.assemble(ym)
 
-        self.elemental_strain = self.B.dot(self.u.flatten()[self.mesh.edofMat].transpose())
-        self.elemental_strain[2, :] *= 2  # voigt notation
+        self.solver.update(self.stiffness_matrix)
+        self.u[self.free, 0] = self.solver.solve(self.f[self.free], x0=self.u[self.free, 0])
 
-        self.elemental_stress = self.D.dot(self.elemental_strain).transpose()
-
-        self.stress_vm0 = (self.elemental_stress.dot(self.V) * self.elemental_stress).sum(1)
+        self.ue = self.u[self.mesh.edofMat, 0]
+        self.elemental_stress = self.ue @ self.DB.T
+        self.stress_vm0 = np.einsum('ij,jk,ik->i', self.ue, self.M, self.ue)
         self.stress_vm = np.sqrt(self.stress_vm0)
 
-        # self.stress[:] = xphys * self.stress_vm.flatten()
         self.gi = (self.stress_vm / self.max_stress) - 1
         self.gi_scaled = xphys * self.gi
         self.giplus = self.gi_scaled + 1
         self.giP = self.giplus ** self.P
-        self.gisum = (1 / self.mesh.n) * np.sum(self.giP)
-        giPP = self.gisum ** (1 / self.P)
-        g[1] = giPP - 1
+
+        self.gisum = np.bincount(self.clusters, weights=self.giP, minlength=self.m) / self.cluster_size
+        g[1:] = self.gisum ** (1 / self.P) - 1
 
         g[0] = np.sum(xphys[:]) / self.mesh.n
         return g
 
     def dg(self, x):
-        dg = np.zeros((2, self.mesh.n), dtype=float)
-        xphys = self.filter.forward(x)
+        dg = np.zeros((self.m + 1, self.mesh.n), dtype=float)
+        if self.x_analysis is None or not np.array_equal(x, self.x_analysis):
+            self.g(x)
+        xphys = self.xphys
 
-        dgdgi_scaled = (1 / self.mesh.n) * self.gisum ** (1 / self.P - 1) * self.giplus ** (self.P - 1)
-        dgidstress = dgdgi_scaled[:, np.newaxis] * xphys[:, np.newaxis] * \
-                     (self.stress_vm0 ** (-0.5) / self.max_stress)[:, np.newaxis] * \
-                     self.elemental_stress.dot(self.V)
-        dgdsstrainmat = np.einsum('jk,kl->jl', dgidstress, self.D)
-        dgdsstrainmat[:, 2] *= 2
-        dgdue = np.einsum('ij,jl->il', dgdsstrainmat, self.B)
-        y = np.zeros(self.mesh.ndof)
-        for i in range(0, self.mesh.n):
-            y[self.mesh.edofMat[i, :]] += dgdue[i, :]
+        # Derivatives of the cluster constraints to the relaxed stress of their elements
+        dgdgi_scaled = (self.gisum ** (1 / self.P - 1))[self.clusters] * self.giplus ** (self.P - 1) / \
+            self.cluster_size[self.clusters]
+        dgdue = (dgdgi_scaled * xphys / (self.max_stress * self.stress_vm))[:, np.newaxis] * (self.ue @ self.M)
 
-        self.lag[self.free, :] = utils.linear_solve(self.stiffness_matrix, y[self.free])
-        self.ce[:] = (np.dot(self.u[self.mesh.edofMat].reshape(self.mesh.n, 8), self.ke) *
-                      self.lag[self.mesh.edofMat].reshape(self.mesh.n, 8)).sum(1)
+        # Scatter the element adjoint loads into the column of their cluster
+        index = self.mesh.edofMat * self.m + self.clusters[:, np.newaxis]
+        y = np.bincount(index.ravel(), weights=dgdue.ravel(),
+                        minlength=self.mesh.ndof * self.m).reshape(self.mesh.ndof, self.m)
 
-        dg[1, :] = -(1 - self.eps) * (1.0 + 0.9 * self.penal * xphys ** (self.penal - 1)) * self.ce
-        dg[1, :] += (dgdgi_scaled * self.gi)
+        # Adjoint solves with the factorization of the last analysis
+        self.lag[self.free, :] = self.solver.solve(y[self.free, :], x0=self.lag[self.free, :], transpose=True)
+        self.ce[:] = np.einsum('ij,jk,ikl->il', self.ue, self.ke, self.lag[self.mesh.edofMat, :])
 
-        dg[0, :] = np.ones(self.mesh.n) / self.mesh.n
-        dg[0, :] = self.filter.backward(dg[0, :])
-        dg[1, :] = self.filter.backward(dg[1, :])
+        dg[1:, :] = -(1 - self.eps) * (1.0 + 0.9 * self.penal * xphys ** (self.penal - 1)) * self.ce.T
+        dg[1 + self.clusters, np.arange(self.mesh.n)] += dgdgi_scaled * self.gi
 
-        return dg
+        dg[0, :] = np.ones(self.mesh.n) / self.mesh.n
+        return self.filter.backward(dg.T).T
 
 
 if __name__ == "__main__":
@@ -121,3 +140,6 @@ if __name__ == "__main__":
 
     problem = StressCantilever(4, 4)
     finite_difference(problem, problem.x0, dx=1e-7)
+
+    problem = StressCantilever(4, 4, n_clusters=3)
+    finite_difference(problem, problem.x0 - 0.5 * np.random.rand(problem.n), dx=1e-7)
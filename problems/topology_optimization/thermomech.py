@@ -1,6 +1,6 @@
 import numpy as np
-from scipy.sparse import coo_matrix
 
+from problems.topology_optimization.util import to_utils as utils
 from sao.problems import Problem
 
 
@@ -20,28 +20,8 @@ class ThermoMechClamped(Problem):
         self.iK = np.kron(self.edofMat, np.ones((8, 1), dtype=int)).flatten()
         self.jK = np.kron(self.edofMat, np.ones((1, 8), dtype=int)).flatten()
 
-        # Filter: Build (and assemble) the index + data vectors for the coo matrix format
-        nfilter = int(self.nelx * self.nely * ((2 * (np.ceil(rmin) - 1) + 1) ** 2))
-        iH = np.zeros(nfilter)
-        jH = np.zeros(nfilter)
-        sH = np.zeros(nfilter)
-        cc = 0
-        for i in range(self.nelx):
-            for j in range(self.nely):
-                row = i * self.nely + j
-                kk1 = int(np.maximum(i - (np.ceil(rmin) - 1), 0))
-                kk2 = int(np.minimum(i + np.ceil(rmin), self.nelx))
-                ll1 = int(np.maximum(j - (np.ceil(rmin) - 1), 0))
-                ll2 = int(np.minimum(j + np.ceil(rmin), self.nely))
-                for k in range(kk1, kk2):
-                    for l in range(ll1, ll2):
-                        col = k * self.nely + l
-                        fac = rmin - np.sqrt(((i - k) * (i - k) + (j - l) * (j - l)))
-                        iH[cc] = row
-                        jH[cc] = col
-                        sH[cc] = np.maximum(0.0, fac)
-                        cc = cc + 1
-        self.H = coo_matrix((sH, (iH, jH)), shape=(self.nelx * self.nely, self.nelx * self.nely)).tocsc()
+        # Filter: Build (and assemble) the filter matrix
+        self.H = utils.filter_matrix(self.nelx, self.nely, rmin)
         self.Hs = self.H.sum(1)
         # a = np.reshape(np.arange(0, self.n), (self.nx, self.ny)).T
         # b = a[0:self.fradius, 2 * self.fradius:]
@@ -0,0 +1,69 @@
+import numpy as np
+from scipy.sparse.linalg import eigsh, splu, LinearOperator
+
+from problems.topology_optimization.util import to_utils as utils
+
+
+def dynamic_stiffness(K, M, omega, alpha=0.0, beta=0.0):
+    """Dynamic stiffness ``K + i omega (alpha M + beta K) - omega^2 M`` with Rayleigh damping."""
+    return K + 1j * omega * (alpha * M + beta * K) - omega ** 2 * M
+
+
+def direct_response(K, M, f, omega, alpha=0.0, beta=0.0):
+    """Solves the harmonic response for every frequency in ``omega``, returns an array [ndof, nfreq]."""
+    omega = np.atleast_1d(omega)
+    u = np.zeros((len(f), len(omega)), dtype=np.complex128)
+    for i, w in enumerate(omega):
+        u[:, i] = splu(dynamic_stiffness(K, M, w, alpha, beta).tocsc()).solve(f.astype(np.complex128))
+    return u
+
+
+class ModalBasis:
+    """
+    Reduced basis for harmonic responses with Rayleigh damping.
+
+    The basis consists of the ``n_modes`` lowest eigenmodes and the static
+    correction ``K^-1 f``, made mass orthogonal to the modes. As the basis is
+    both mass and stiffness orthogonal, the reduced dynamic stiffness is
+    diagonal and the response at any number of frequencies follows from
+    the basis without further solves. The basis is built once per design
+    with a single factorization of ``K``.
+    """
+
+    def __init__(self, n_modes=20, solver=None):
+        self.n_modes = n_modes
+        self.solver = utils.CholmodSolver() if solver is None else solver
+        self.V = None
+        self.lam = None
+        self.F = None
+
+    def update(self, K, M, f):
+        """Builds the basis of ``K``, ``M`` and load ``f``, returns self for method cascading."""
+        self.solver.update(K)
+        inverse = LinearOperator(K.shape, self.solver.solve, dtype=float)
+        v0 = None if self.V is None or self.V.shape[0] != K.shape[0] else self.V[:, :self.n_modes].sum(axis=1)
+        eigvals, eigvecs = eigsh(K, M=M, k=self.n_modes, OPinv=inverse, sigma=0.0, v0=v0)
+
+        # Static correction, mass orthogonal to the modes and mass normalized
+        us = self.solver.solve(f)
+        us -= eigvecs @ (eigvecs.T @ (M @ us))
+        us /= np.sqrt(us @ (M @ us))
+
+        self.V = np.hstack((eigvecs, us[:, np.newaxis]))
+        self.lam = np.hstack((eigvals, us @ (K @ us)))
+        self.F = self.V.T @ f
+        return self
+
+    def modal_response(self, omega, alpha=0.0, beta=0.0):
+        """Reduced coordinates of the response at the frequencies ``omega``, an array [nbasis, nfreq]."""
+        w = np.atleast_1d(omega)[np.newaxis]
+        lam = self.lam[:, np.newaxis]
+        return self.F[:, np.newaxis] / (lam - w ** 2 + 1j * w * (alpha + beta * lam))
+
+    def response(self, omega, alpha=0.0, beta=0.0):
+        """Approximate harmonic response at the frequencies ``omega``, an array [ndof, nfreq]."""
+        return self.V @ self.modal_response(omega, alpha, beta)
+
+    def compliance(self, omega, alpha=0.0, beta=0.0):
+        """Approximate dynamic compliance ``f^T u`` at the frequencies ``omega``."""
+        return self.F @ self.modal_response(omega, alpha, beta)
@@ -1,16 +1,23 @@
+import itertools
+import warnings
+
 import cvxopt
 import cvxopt.cholmod
 import matplotlib.pyplot as plt
 import numpy as np
 from cvxopt import cholmod
 from matplotlib import colors
-from scipy.sparse import coo_matrix, diags
+from scipy.ndimage import correlate
+from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, diags, identity, kron
+from scipy.sparse.linalg import splu
+
+from sao.util.profiling import profiled
 
 
 class PlotDesign:
     def __init__(self, problem, x):
         self.problem = problem
-        xPhys = np.asarray(problem.filter.H * x[np.newaxis].T / problem.filter.Hs)[:, 0]
+        xPhys = problem.filter.forward(x)
         plt.ion()  # acces interactive mode
         fig, ax = plt.subplots()  # obtain figure and axis objects
         # plt.title(f'{problem.__class__.__name__}: n = {problem.mesh.n}, iter = {0}', fontsize=16)
@@ -28,7 +35,7 @@ class PlotDesign:
         self.ax = ax
 
     def plot(self, x, counter):
-        xPhys = np.asarray(self.problem.filter.H * x[np.newaxis].T / self.problem.filter.Hs)[:, 0]
+        xPhys = self.problem.filter.forward(x)
         self.im.set_array(-xPhys.reshape((self.problem.mesh.nelx, self.problem.mesh.nely)).T)
         self.ax.set_title(f'{self.problem.__class__.__name__}: n = {self.problem.mesh.n}, iter = {counter}',
                           fontsize=16)
@@ -37,7 +44,16 @@ class PlotDesign:
 
 
 class Mesh:
-    def __init__(self, nelx, nely):
+    @profiled('setup.mesh')
+    def __init__(self, nelx, nely, index_dtype=None):
+        """
+        Structured mesh of ``nelx`` x ``nely`` bilinear quadrilateral elements.
+
+        :param nelx: Number of elements in x-direction
+        :param nely: Number of elements in y-direction
+        :param index_dtype: Integer type of the connectivity and coo index arrays,
+            defaults to ``np.int32`` whenever the number of dofs allows it
+        """
         self.nelx = nelx
         self.nely = nely
         self.n = nelx * nely
@@ -46,80 +62,548 @@ class Mesh:
         self.ndofx = 2 * (nelx + 1)
         self.ndofy = 2 * (nely + 1)
 
-        self.edofMat = np.zeros((self.nelx * self.nely, 8), dtype=int)
-        for elx in range(self.nelx):
-            for ely in range(self.nely):
-                el = ely + elx * self.nely
-                n1 = (self.nely + 1) * elx + ely
-                n2 = (self.nely + 1) * (elx + 1) + ely
-                self.edofMat[el, :] = np.array(
-                    [2 * n1 + 2, 2 * n1 + 3, 2 * n2 + 2, 2 * n2 + 3, 2 * n2, 2 * n2 + 1, 2 * n1, 2 * n1 + 1])
+        # Number of elements per direction, ordered from the slowest to the fastest varying node index
+        self.shape = (nelx, nely)
+        self.dofs_per_node = 2
+
+        if index_dtype is None:
+            index_dtype = np.int32 if self.ndof < np.iinfo(np.int32).max else np.int64
+        self.index_dtype = index_dtype
 
-        # Construct the index pointers for the coo format
-        self.iK = np.kron(self.edofMat, np.ones((8, 1), dtype=int)).flatten()
-        self.jK = np.kron(self.edofMat, np.ones((1, 8), dtype=int)).flatten()
+        # Element el = ely + elx * nely has lower-left node n1 and lower-right node n2 = n1 + nely + 1
+        elx, ely = np.meshgrid(np.arange(nelx, dtype=index_dtype), np.arange(nely, dtype=index_dtype),
+                               indexing='ij')
+        n1 = ((nely + 1) * elx + ely).ravel()
+        offset = np.array([2, 3, 2 * nely + 4, 2 * nely + 5, 2 * nely + 2, 2 * nely + 3, 0, 1], dtype=index_dtype)
+        self.edofMat = 2 * n1[:, np.newaxis] + offset
+
+        # Construct the index pointers for the coo format, entry (a, b) of element e at e * 64 + a * 8 + b
+        self.iK, self.jK = coo_indices(self.edofMat)
 
         self.elgrid = np.reshape(np.arange(0, self.n), (nelx, nely)).T
 
 
+class Mesh3D:
+    @profiled('setup.mesh')
+    def __init__(self, nelx, nely, nelz, index_dtype=None):
+        """
+        Structured mesh of ``nelx`` x ``nely`` x ``nelz`` trilinear hexahedral (hex8) elements.
+
+        Node ``(ix, iy, iz)`` has number ``(iz * (nelx + 1) + ix) * (nely + 1) + iy`` and element
+        ``(ex, ey, ez)`` number ``(ez * nelx + ex) * nely + ey``, which extends the numbering of ``Mesh``.
+        The coo index arrays of the element matrices, ``2 * 576`` indices per element, are not
+        stored, see ``coo_indices``; ``Assembly`` builds them only while it sets up the pattern.
+
+        :param nelx: Number of elements in x-direction
+        :param nely: Number of elements in y-direction
+        :param nelz: Number of elements in z-direction
+        :param index_dtype: Integer type of the connectivity and coo index arrays,
+            defaults to ``np.int32`` whenever the number of dofs allows it
+        """
+        self.nelx = nelx
+        self.nely = nely
+        self.nelz = nelz
+        self.n = nelx * nely * nelz
+        self.nnod = (nelx + 1) * (nely + 1) * (nelz + 1)
+        self.ndof = 3 * self.nnod
+
+        # Number of elements per direction, ordered from the slowest to the fastest varying node index
+        self.shape = (nelz, nelx, nely)
+        self.dofs_per_node = 3
+
+        if index_dtype is None:
+            index_dtype = np.int32 if self.ndof < np.iinfo(np.int32).max else np.int64
+        self.index_dtype = index_dtype
+
+        self.nodgrid = np.arange(self.nnod, dtype=index_dtype).reshape(nelz + 1, nelx + 1, nely + 1)
+
+        # Local node (a, b, c) of an element is the node at offset (x + a, y + b, z + c)
+        n1 = self.nodgrid[:-1, :-1, :-1].ravel()
+        offset = np.array([(c * (nelx + 1) + a) * (nely + 1) + b for a, b, c in hex8_nodes()], dtype=index_dtype)
+        self.edofMat = (3 * (n1[:, np.newaxis] + offset)[:, :, np.newaxis] + np.arange(3, dtype=index_dtype)).reshape(
+            self.n, 24)
+
+
+def coo_indices(edofMat):
+    """Coo row and column indices of the element matrices, entry (a, b) of element e at ``(e * k + a) * k + b``."""
+    k = edofMat.shape[1]
+    return np.tile(edofMat, k).ravel(), np.repeat(edofMat, k, axis=1).ravel()
+
+
+def hex8_nodes():
+    """Local node offsets (a, b, c) of the hex8 element, in the order of its dofs."""
+    return [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+
+
+def filter_kernel(rmin, ndim=2):
+    """Returns the cone-shaped weights ``max(0, rmin - dist)`` of the density filter on a grid of offsets."""
+    r = int(np.ceil(rmin)) - 1
+    d = np.meshgrid(*(ndim * [np.arange(-r, r + 1)]), indexing='ij')
+    return np.maximum(0.0, rmin - np.sqrt(sum(di * di for di in d)))
+
+
+def filter_matrix(nelx, nely, rmin, nelz=None):
+    """
+    Assembles the (unnormalized) density filter matrix ``H`` in csc format.
+
+    The loop runs over the few kernel offsets only; all elements are
+    treated at once for every offset. With ``nelz`` the filter of a 3D
+    mesh is returned, using the element numbering of ``Mesh3D``.
+    """
+    shape = (nelx, nely) if nelz is None else (nelz, nelx, nely)
+    kernel = filter_kernel(rmin, len(shape))
+    r = kernel.shape[0] // 2
+    index = np.indices(shape)
+    bounds = np.reshape(shape, (-1,) + len(shape) * (1,))
+    row = np.arange(np.prod(shape)).reshape(shape)
+    iH, jH, sH = [], [], []
+    for offset, fac in np.ndenumerate(kernel):
+        if fac <= 0.0:
+            continue
+        k = index + np.reshape(offset, bounds.shape) - r
+        inside = np.all((k >= 0) & (k < bounds), axis=0)
+        iH.append(row[inside])
+        jH.append(np.ravel_multi_index(tuple(k[:, inside]), shape))
+        sH.append(np.full(np.count_nonzero(inside), fac))
+    n = row.size
+    return coo_matrix((np.concatenate(sH), (np.concatenate(iH), np.concatenate(jH))), shape=(n, n)).tocsc()
+
+
 class Filter:
+    """
+    Density filter ``H * x / Hs`` with the sparse weight matrix ``H``.
+
+    ``forward`` and ``backward`` filter a vector of element values [n], or
+    every column of an array [n, k] at once.
+    """
+
+    @profiled('setup.filter')
     def __init__(self, mesh, rmin):
         self.mesh = mesh
         self.rmin = rmin
-        # Filter: Build (and assemble) the index + data vectors for the coo matrix format
-        nfilter = int(mesh.nelx * mesh.nely * ((2 * (np.ceil(rmin) - 1) + 1) ** 2))
-        iH = np.zeros(nfilter)
-        jH = np.zeros(nfilter)
-        sH = np.zeros(nfilter)
-        cc = 0
-        for i in range(mesh.nelx):
-            for j in range(mesh.nely):
-                row = i * mesh.nely + j
-                kk1 = int(np.maximum(i - (np.ceil(rmin) - 1), 0))
-                kk2 = int(np.minimum(i + np.ceil(rmin), mesh.nelx))
-                ll1 = int(np.maximum(j - (np.ceil(rmin) - 1), 0))
-                ll2 = int(np.minimum(j + np.ceil(rmin), mesh.nely))
-                for k in range(kk1, kk2):
-                    for l in range(ll1, ll2):
-                        col = k * mesh.nely + l
-                        fac = rmin - np.sqrt(((i - k) * (i - k) + (j - l) * (j - l)))
-                        iH[cc] = row
-                        jH[cc] = col
-                        sH[cc] = np.maximum(0.0, fac)
-                        cc = cc + 1
-
-            # Finalize assembly and convert to csc format
-            self.H = coo_matrix((sH, (iH, jH)), shape=(mesh.n, mesh.n)).tocsc()
-            self.Hs = self.H.sum(1)
+        self.H = filter_matrix(mesh.nelx, mesh.nely, rmin, nelz=getattr(mesh, 'nelz', None))
+        self.Hs = np.asarray(self.H.sum(1)).ravel()
+
+    def scale(self, x):
+        """The normalization ``Hs`` broadcast to the rows of ``x``."""
+        return np.reshape(self.Hs, (-1,) + (np.ndim(x) - 1) * (1,))
 
+    @profiled('filter.forward')
     def forward(self, x):
-        return np.asarray(self.H * x[np.newaxis].T / self.Hs)[:, 0]
+        return self.H @ x / self.scale(x)
 
+    @profiled('filter.backward')
     def backward(self, x):
-        return np.asarray(self.H * (x[np.newaxis].T / self.Hs))[:, 0]
+        return self.H @ (x / self.scale(x))
 
     def set_padding(self, x):
         padel = np.unique(np.concatenate((x)))
         self.Hs[padel] = np.max(self.Hs)
 
 
+class ConvolutionFilter(Filter):
+    """
+    Matrix-free density filter.
+
+    Applies the same weights and boundary normalization ``Hs`` as ``Filter``,
+    but evaluates ``H * x`` as a correlation of the element grid with the
+    filter kernel. As the kernel is symmetric, the same operation is used
+    in the backward (sensitivity) filter.
+    """
+
+    @profiled('setup.filter')
+    def __init__(self, mesh, rmin):
+        self.mesh = mesh
+        self.rmin = rmin
+        self.kernel = filter_kernel(rmin, len(mesh.shape))
+        self.Hs = self.apply(np.ones(mesh.n))
+
+    def apply(self, x):
+        """Evaluates ``H * x`` without assembling ``H``, of every column of ``x`` [n, k]."""
+        columns = np.shape(x)[1:]
+        grid = np.reshape(x, tuple(self.mesh.shape) + columns)
+        kernel = np.reshape(self.kernel, self.kernel.shape + len(columns) * (1,))
+        return correlate(grid, kernel, mode='constant', cval=0.0).reshape(np.shape(x))
+
+    @profiled('filter.forward')
+    def forward(self, x):
+        return self.apply(x) / self.scale(x)
+
+    @profiled('filter.backward')
+    def backward(self, x):
+        return self.apply(x / self.scale(x))
+
+
 def linear_solve(K, f):
-    Kcoo = K.tocoo()
-    K = cvxopt.spmatrix(Kcoo.data, Kcoo.row.astype(int), Kcoo.col.astype(int))
-    B = cvxopt.matrix(f)
-    cvxopt.cholmod.linsolve(K, B)
-    return np.array(B)
+    return CholmodSolver().update(K).solve(f)
+
+
+class LinearSolver:
+    """
+    Base class of the linear solvers for the finite element systems ``K u = f``.
+
+    A solver is updated once per design with the current system matrix,
+    after which any number of right-hand sides can be solved against it,
+    e.g. multiple load cases and adjoint loads. As the sparsity pattern of
+    ``K`` does not change between design iterations, solvers may keep any
+    pattern-dependent work (ordering, symbolic analysis) from previous updates.
+
+    Solvers can be pickled, e.g. to send a problem to the worker processes of
+    ``check_gradient``: the ``transient`` attributes, which hold e.g. a
+    factorization, are dropped and rebuilt from ``K`` on unpickling.
+    """
+
+    transient = ()
+
+    def __init__(self):
+        self.K = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(dict.fromkeys(self.transient))
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.transient and self.K is not None:
+            self.update(self.K)
+
+    def setup(self, mesh, free):
+        """Prepares the solver for the free dofs of a mesh, e.g. for geometric multigrid."""
+        return self
+
+    def update(self, K):
+        """Sets the system matrix of the current design, returns self for method cascading."""
+        self.K = K
+        return self
+
+    def solve(self, f, x0=None, transpose=False):
+        """
+        Solves ``K u = f`` (or ``K^T u = f``) for one or more right-hand sides.
+
+        :param f: Right-hand side of size [ndof] or [ndof, nrhs]
+        :param x0: Optional initial guess, only used by iterative solvers
+        :param transpose: Solve the transposed (adjoint) system
+        :return: Solution of the same shape as ``f``
+        """
+        raise NotImplementedError
+
+    def __call__(self, K, f):
+        return self.update(K).solve(f)
 
 
-class CholmodLinearSolver:
+class CholmodSolver(LinearSolver):
+    """
+    Sparse Cholesky solver using the ``cholmod`` interface of ``cvxopt``.
+
+    The fill-reducing ordering and symbolic analysis are performed once and
+    are only repeated when the sparsity pattern of ``K`` changes. Every
+    update performs a new numeric factorization on that analysis.
+    """
+
+    transient = ('factor',)
+
     def __init__(self):
-        self.inv = None
+        super().__init__()
+        self.factor = None
+        self.indptr, self.indices = None, None
+        self.col = None
+
+    @profiled('linear_solver.update')
+    def update(self, K):
+        K = K.tocsc()
+        K.sort_indices()
+        if self.factor is None or not self.same_pattern(K):
+            self.indptr, self.indices = K.indptr.copy(), K.indices.copy()
+            self.col = np.repeat(np.arange(K.shape[1]), np.diff(K.indptr))
+            self.factor = cholmod.symbolic(self.spmatrix(K))
+        cholmod.numeric(self.spmatrix(K), self.factor)
+        self.K = K
+        return self
+
+    def same_pattern(self, K):
+        return np.array_equal(self.indptr, K.indptr) and np.array_equal(self.indices, K.indices)
+
+    def spmatrix(self, K):
+        return cvxopt.spmatrix(K.data, self.indices.astype(int), self.col.astype(int), K.shape)
+
+    @profiled('linear_solver.solve')
+    def solve(self, f, x0=None, transpose=False):
+        B = cvxopt.matrix(np.asarray(f, dtype=float).reshape(f.shape[0], -1))
+        cholmod.solve(self.factor, B)
+        return np.array(B).reshape(f.shape)
+
+
+class SuperLUSolver(LinearSolver):
+    """Sparse LU solver using ``scipy.sparse.linalg.splu``, also suited for non-symmetric systems."""
+
+    transient = ('lu',)
+
+    def __init__(self, permc_spec='MMD_AT_PLUS_A'):
+        super().__init__()
+        self.permc_spec = permc_spec
+        self.lu = None
+
+    @profiled('linear_solver.update')
+    def update(self, K):
+        self.K = K.tocsc()
+        self.lu = splu(self.K, permc_spec=self.permc_spec)
+        return self
+
+    @profiled('linear_solver.solve')
+    def solve(self, f, x0=None, transpose=False):
+        return self.lu.solve(f, trans='T' if transpose else 'N')
+
+
+class CGSolver(LinearSolver):
+    """
+    Preconditioned conjugate gradient solver for symmetric positive definite systems.
+
+    By default a Jacobi (diagonal) preconditioner is used. The solution of the
+    previous solve is used as initial guess when no ``x0`` is given, as the
+    displacements change little between design iterations.
+    """
+
+    def __init__(self, tol=1e-8, maxiter=10000):
+        super().__init__()
+        self.tol = tol
+        self.maxiter = maxiter
+        self.inv_diag = None
+        self.x = None
+        self.iterations = 0
+
+    @profiled('linear_solver.update')
+    def update(self, K):
+        self.K = K.tocsr()
+        self.inv_diag = 1 / self.K.diagonal()
+        return self
+
+    def precondition(self, r):
+        """Applies the preconditioner to one or more (columns of) residuals."""
+        return self.inv_diag.reshape((-1,) + (1,) * (r.ndim - 1)) * r
+
+    @profiled('linear_solver.solve')
+    def solve(self, f, x0=None, transpose=False):
+        if x0 is None and self.x is not None and self.x.shape == f.shape:
+            x0 = self.x
+        x = np.zeros_like(f, dtype=float) if x0 is None else np.array(x0, dtype=float)
+        if f.ndim == 1:
+            x = self.pcg(f, x)
+        else:
+            for i in range(f.shape[1]):
+                x[:, i] = self.pcg(f[:, i], x[:, i])
+        self.x = x.copy()
+        return x
+
+    def pcg(self, b, x):
+        """
+        Solves ``K x = b`` up to a relative residual ``tol``, starting from ``x``.
+
+        Warns when ``tol`` is not reached within ``maxiter`` iterations, and
+        returns the last iterate.
+        """
+        self.iterations = 0
+        r = b - self.K @ x
+        bnorm = np.linalg.norm(b)
+        if bnorm == 0:
+            return np.zeros_like(b)
+        z = self.precondition(r)
+        p = z.copy()
+        rz = r @ z
+        while np.linalg.norm(r) > self.tol * bnorm:
+            if self.iterations == self.maxiter:
+                warnings.warn(f'{type(self).__name__} did not converge in {self.maxiter} iterations, '
+                              f'relative residual {np.linalg.norm(r) / bnorm:.2e}', RuntimeWarning)
+                break
+            Kp = self.K @ p
+            alpha = rz / (p @ Kp)
+            x += alpha * p
+            r -= alpha * Kp
+            z = self.precondition(r)
+            rz, rz_old = r @ z, rz
+            p = z + (rz / rz_old) * p
+            self.iterations += 1
+        return x
+
+
+def prolongation_1d(nel):
+    """Linear interpolation from the nodes of ``nel // 2`` to the nodes of ``nel`` line elements."""
+    nc = nel // 2
+    rows = np.concatenate((2 * np.arange(nc + 1), 2 * np.arange(nc) + 1, 2 * np.arange(nc) + 1))
+    cols = np.concatenate((np.arange(nc + 1), np.arange(nc), np.arange(nc) + 1))
+    vals = np.concatenate((np.ones(nc + 1), 0.5 * np.ones(2 * nc)))
+    return csr_matrix((vals, (rows, cols)), shape=(nel + 1, nc + 1))
+
+
+def prolongation(shape, dofs_per_node):
+    """Prolongation of the dofs of a structured mesh with twice coarser elements in every direction."""
+    P = identity(dofs_per_node, format='csr')
+    for nel in reversed(shape):
+        P = kron(prolongation_1d(nel), P, format='csr')
+    return P
+
 
-    def linear_solve(self, K, f):
-        if self.inv is None:
-            self.inv = cholmod.analyze(K, ordering_method='best')
-            self.inv.cholesky_inplace(K)
-        return self.inv(f)
+class MultigridSolver(CGSolver):
+    """
+    Conjugate gradient solver preconditioned by a geometric multigrid V-cycle.
+
+    For the structured meshes the coarse levels are found by merging 2 x 2
+    elements, using (bi)linear interpolation as prolongation ``P``. The
+    coarse matrices follow from Galerkin coarsening ``P^T K P`` after every
+    update, and the coarsest level is solved directly. Damped Jacobi is used
+    as (symmetric) smoother. Coarsening stops at ``levels`` or when the
+    element grid can no longer be halved.
+    """
+
+    def __init__(self, levels=4, smoothing_steps=2, omega=0.6, min_elements=2, tol=1e-8, maxiter=1000,
+                 coarse_solver=None):
+        super().__init__(tol=tol, maxiter=maxiter)
+        self.levels = levels
+        self.smoothing_steps = smoothing_steps
+        self.omega = omega
+        self.min_elements = min_elements
+        self.coarse_solver = CholmodSolver() if coarse_solver is None else coarse_solver
+        self.P = []
+        self.Ks, self.inv_diags = [], []
+
+    def setup(self, mesh, free):
+        self.P = []
+        shape, dofs = np.array(mesh.shape), np.asarray(free)
+        while len(self.P) < self.levels - 1 and np.all(shape % 2 == 0) and np.all(shape // 2 >= self.min_elements):
+            P = prolongation(shape, mesh.dofs_per_node)[dofs, :]
+
+            # Coarse dofs are kept when their coinciding fine dof is free
+            keep = np.flatnonzero(np.isclose(P.max(axis=0).toarray().ravel(), 1.0))
+            self.P.append(P[:, keep].tocsr())
+            shape, dofs = shape // 2, keep
+        return self
+
+    @profiled('linear_solver.update')
+    def update(self, K):
+        super().update(K)
+        self.Ks, self.inv_diags = [self.K], [self.inv_diag]
+        for P in self.P:
+            Kc = (P.T @ self.Ks[-1] @ P).tocsr()
+            self.Ks.append(Kc)
+            self.inv_diags.append(1 / Kc.diagonal())
+        self.coarse_solver.update(self.Ks[-1])
+        return self
+
+    def precondition(self, r):
+        return self.vcycle(0, r)
+
+    def vcycle(self, level, r):
+        if level == len(self.P):
+            return self.coarse_solver.solve(r)
+        K, inv_diag = self.Ks[level], self.inv_diags[level].reshape((-1,) + (1,) * (r.ndim - 1))
+        x = self.omega * inv_diag * r
+        for i in range(self.smoothing_steps - 1):
+            x += self.omega * inv_diag * (r - K @ x)
+        x += self.P[level] @ self.vcycle(level + 1, self.P[level].T @ (r - K @ x))
+        for i in range(self.smoothing_steps):
+            x += self.omega * inv_diag * (r - K @ x)
+        return x
+
+
+@profiled('setup.linear_solver')
+def linear_solver(solver, mesh, free):
+    """
+    Returns a linear solver set up for the free dofs of the mesh.
+
+    :param solver: A ``LinearSolver`` instance, one of the names
+        ``'cholmod'``, ``'splu'``, ``'cg'``, ``'multigrid'``, or None for cholmod
+    """
+    if solver is None or isinstance(solver, str):
+        solvers = {'cholmod': CholmodSolver, 'splu': SuperLUSolver, 'cg': CGSolver, 'multigrid': MultigridSolver}
+        solver = solvers['cholmod' if solver is None else solver]()
+    return solver.setup(mesh, free)
+
+
+class Assembly:
+    """
+    Precomputed assembly of the reduced stiffness matrix ``K[rows, :][:, cols]``.
+
+    The element matrix entries that land in the reduced matrix are mapped once
+    onto the data array of its (fixed) csc pattern, such that assembling for a
+    given vector of element stiffness factors ``x`` scatters ``ke * x`` into
+    that array, without any coo to csc conversion or slicing.
+    By default ``cols = rows``, which gives the free-free block of ``K``.
+
+    Only the scatter positions are stored, an index of ``mesh.index_dtype``
+    per element matrix entry, i.e. 2.3 KB per hex8 element with ``int32``
+    indices, 2.3 GB for 10^6 elements. Every entry ``(a, b)`` of the element
+    matrices lands on a different entry of ``K`` for different elements,
+    which holds for the structured meshes of this module.
+    """
+
+    @profiled('setup.assembly')
+    def __init__(self, mesh, rows, cols=None, ke=None):
+        self.ke = element_matrix_stiffness() if ke is None else ke
+        cols = rows if cols is None else cols
+        self.shape = (len(rows), len(cols))
+
+        # Global to reduced dof numbering, -1 for the removed dofs
+        self.row_map = np.full(mesh.ndof, -1, dtype=mesh.index_dtype)
+        self.row_map[rows] = np.arange(len(rows))
+        self.col_map = np.full(mesh.ndof, -1, dtype=mesh.index_dtype)
+        self.col_map[cols] = np.arange(len(cols))
+
+        # The coo indices are only kept while the pattern is set up
+        iK, jK = coo_indices(mesh.edofMat)
+        i, j = self.row_map[iK], self.col_map[jK]
+        del iK, jK
+        retained = (i >= 0) & (j >= 0)
+
+        # Column-major keys of the retained entries yield the csc ordering
+        keys, position = np.unique(j[retained].astype(np.int64) * self.shape[0] + i[retained], return_inverse=True)
+        del i, j
+        self.nnz = len(keys)
+        self.indices = (keys % self.shape[0]).astype(mesh.index_dtype)
+        self.indptr = np.zeros(self.shape[1] + 1, dtype=mesh.index_dtype)
+        np.cumsum(np.bincount(keys // self.shape[0], minlength=self.shape[1]), out=self.indptr[1:])
+        del keys
+
+        # Position of entry k of element e in the data array at [k, e], nnz for the removed entries
+        dtype = mesh.index_dtype if self.nnz < np.iinfo(mesh.index_dtype).max else np.int64
+        scatter = np.full(retained.shape, self.nnz, dtype=dtype)
+        scatter[retained] = position.ravel()
+        del position, retained
+        self.position = np.ascontiguousarray(scatter.reshape(mesh.n, self.ke.size).T)
+        self.constant = None
+
+    @property
+    def nbytes(self):
+        """Memory of the stored pattern and scatter positions."""
+        return self.position.nbytes + self.indices.nbytes + self.indptr.nbytes + \
+            (0 if self.constant is None else self.constant.nbytes)
+
+    def add_constant(self, i, j, values):
+        """Adds constant entries (e.g. springs) at the global dofs ``(i, j)``, which must be in the reduced pattern."""
+        rows, cols = self.row_map[np.atleast_1d(i)], self.col_map[np.atleast_1d(j)]
+        if np.any(rows < 0) or np.any(cols < 0):
+            raise ValueError("Constant entries must lie within the sparsity pattern of the reduced matrix.")
+        position = np.empty(len(rows), dtype=int)
+        for k, (row, col) in enumerate(zip(rows, cols)):
+            column = self.indices[self.indptr[col]:self.indptr[col + 1]]
+            p = np.searchsorted(column, row)
+            if p == len(column) or column[p] != row:
+                raise ValueError("Constant entries must lie within the sparsity pattern of the reduced matrix.")
+            position[k] = self.indptr[col] + p
+        if self.constant is None:
+            self.constant = np.zeros(self.nnz)
+        np.add.at(self.constant, position, values)
+        return self
+
+    @profiled('fem.assembly')
+    def assemble(self, x):
+        """Returns the reduced matrix for the element stiffness factors ``x``."""
+        data = np.zeros(self.nnz + 1)
+        if self.constant is not None:
+            data[:-1] = self.constant
+        # The positions of an element matrix entry differ between elements, apart from the removed ones
+        for position, k in zip(self.position, self.ke.ravel()):
+            data[position] += k * x
+        return csc_matrix((data[:-1], self.indices, self.indptr), shape=self.shape)
 
 
 def assemble_K(x, mesh, fixed):
@@ -130,9 +614,11 @@ def assemble_K(x, mesh, fixed):
     return K
 
 
+@profiled('fem.assembly')
 def assemble_M(x, mesh, free, rho=1.0, lx=1.0, ly=1.0, lz=1.0):
     m_E = lx * ly * lz * rho  # Mass of one element
-    sM = np.kron(x, np.ones(8) * m_E / 4)
+    nodes = mesh.edofMat.shape[1] // mesh.dofs_per_node
+    sM = np.kron(x, np.ones(mesh.edofMat.shape[1]) * m_E / nodes)
     xdiag = np.zeros(mesh.ndof)
     np.add.at(xdiag, mesh.edofMat.flatten(), sM)  # Assemble the diagonal
     return diags(xdiag[free])
@@ -154,6 +640,31 @@ def element_matrix_stiffness():
     return KE
 
 
+def element_matrix_stiffness_3d(E=1.0, nu=0.3):
+    """
+    Stiffness matrix of the unit cube hex8 element, with dofs ordered as ``Mesh3D.edofMat``.
+
+    Integrated with 2 x 2 x 2 point Gauss quadrature, which is exact for the trilinear element.
+    """
+    D = E / ((1 + nu) * (1 - 2 * nu)) * np.diag([1 - nu] * 3 + [(1 - 2 * nu) / 2] * 3)
+    D[:3, :3] += E * nu / ((1 + nu) * (1 - 2 * nu)) * (1 - np.eye(3))
+    nodes = np.array(hex8_nodes(), dtype=float)
+    KE = np.zeros((24, 24))
+    for point in itertools.product(0.5 + np.array([-0.5, 0.5]) / np.sqrt(3), repeat=3):
+        # Shape function derivatives dN[i, a] = dN_a / dx_i at the integration point
+        w = np.where(nodes == 1, point, 1 - np.array(point))
+        sign = 2 * nodes - 1
+        dN = np.array([sign[:, i] * np.prod(np.delete(w, i, axis=1), axis=1) for i in range(3)])
+        B = np.zeros((6, 24))
+        for i in range(3):
+            B[i, i::3] = dN[i]
+        B[3, 0::3], B[3, 1::3] = dN[1], dN[0]
+        B[4, 1::3], B[4, 2::3] = dN[2], dN[1]
+        B[5, 0::3], B[5, 2::3] = dN[2], dN[0]
+        KE += B.T @ D @ B / 8
+    return KE
+
+
 def deleterowcol(A, delrow, delcol):
     m = A.shape[0]
     keep = np.delete(np.arange(0, m), delrow)
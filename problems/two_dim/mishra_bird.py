@@ -11,7 +11,7 @@ class MishraBird(Problem):
         self.n = 2
         self.m = 1
         self.x_min = np.array([0., 0.])
-        self.xmax = np.array([10., 6.5])
+        self.x_max = np.array([10., 6.5])
         self.x0 = np.array([7.3, 2.])
         self.name = 'MishraBird'
 
@@ -1,11 +1,14 @@
 #
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 #
 def finite_difference(prob, y, dx):
 #
     x = y
-    g0 = prob.g(x)
-    dg_an = prob.dg(x)
+    g0, dg_an = prob.evaluate(x)
 #
     print(f"\nProblem:  {prob.name}")
     tmp=f"{' ':4}"
@@ -46,3 +49,152 @@ def finite_difference_use(prob, y, dx):
 #
     return dg_fd
 #
+
+
+# State of the worker processes of ``check_gradient``, set once per process
+_worker = {}
+
+
+def _initialize(problem, x, g0):
+    _worker.update(problem=problem, x=x, g0=g0)
+
+
+def _derivatives(directions, dx, method):
+    return np.array([derivative(_worker['problem'], _worker['x'], d, dx, method, _worker['g0'])
+                     for d in directions]).T
+
+
+def derivative(prob, x, direction, dx, method='central', g0=None):
+    """
+    Finite difference derivative of the responses of ``prob`` at ``x`` along ``direction``, without modifying ``x``.
+
+    :param direction: A variable index, for the partial derivatives, or a direction vector
+    :param method: ``'forward'``, ``'central'`` or ``'complex'`` (complex step, for problems
+        of which the responses are analytic and accept complex designs)
+    :param g0: The responses at ``x``, required by forward differences
+    """
+    if np.ndim(direction) == 0:
+        step = np.zeros(len(x))
+        step[direction] = dx
+    else:
+        step = dx * np.asarray(direction, dtype=float)
+    if method == 'forward':
+        return (prob.g(x + step) - g0) / dx
+    if method == 'central':
+        return (prob.g(x + step) - prob.g(x - step)) / (2 * dx)
+    if method == 'complex':
+        return np.imag(prob.g(x + 1j * step)) / dx
+    raise ValueError(f"Unknown finite difference method '{method}'")
+
+
+class GradientCheck:
+    """
+    Analytic and finite difference derivatives of the responses along the checked directions.
+
+    ``analytic`` and ``approximate`` are of size [m + 1, directions]. The
+    relative ``error`` of an entry is scaled by the largest analytic
+    derivative of its response times ``floor``, such that entries that are
+    (nearly) zero are not reported for round-off errors.
+    """
+
+    def __init__(self, name, method, analytic, approximate, labels, rtol=1e-4, floor=1e-3, evaluations=0,
+                 time=0.0, processes=1):
+        self.name, self.method = name, method
+        self.analytic, self.approximate = analytic, approximate
+        self.labels = labels
+        self.rtol, self.floor = rtol, floor
+        self.evaluations, self.time, self.processes = evaluations, time, processes
+
+    @property
+    def error(self):
+        scale = np.maximum(np.abs(self.analytic), np.abs(self.approximate))
+        scale = np.maximum(scale, self.floor * np.abs(self.analytic).max(axis=1, initial=0.0)[:, np.newaxis])
+        return np.abs(self.analytic - self.approximate) / np.maximum(scale, np.finfo(float).tiny)
+
+    @property
+    def passed(self):
+        return bool(np.all(self.error <= self.rtol))
+
+    def report(self):
+        """Summary of the largest errors per response."""
+        error = self.error
+        lines = [f"Problem: {self.name}, {self.method} differences along {error.shape[1]} directions, "
+                 f"{self.evaluations} evaluations in {self.time:.2f} s on {self.processes} processes",
+                 f"{'':4}{'max error':>12}{'at':>10}{'analytic':>12}{'approx.':>12}{'failed':>10}"]
+        for j, row in enumerate(error):
+            i = int(np.argmax(row)) if len(row) else 0
+            failed = int(np.sum(row > self.rtol))
+            lines.append(f"g{j:<3}{row.max(initial=0.0):12.2e}{self.labels[i] if len(row) else '-':>10}"
+                         f"{self.analytic[j, i] if len(row) else 0.0:12.3e}"
+                         f"{self.approximate[j, i] if len(row) else 0.0:12.3e}{failed:>6}/{len(row):<3}")
+        lines.append(f"{'PASSED' if self.passed else 'FAILED'} (rtol {self.rtol:.0e})")
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.report()
+
+
+def check_gradient(prob, x, dx=None, method='central', directions=None, processes=None, seed=0, rtol=1e-4,
+                   floor=1e-3, mp_context=None):
+    """
+    Compares the sensitivities ``prob.dg`` at ``x`` to finite differences of ``prob.g``.
+
+    The perturbed designs are evaluated in a pool of ``processes`` processes,
+    each holding its own copy of the problem (``processes=1`` evaluates them
+    in this process). The problem is pickled to the workers, which holds for
+    the topology optimization problems also with the ``'spawn'`` start method,
+    as their linear solvers drop and rebuild their factorization. Without
+    ``directions`` all partial derivatives are checked, which costs ``n``
+    (forward, complex) or ``2 n`` (central) evaluations. With an integer
+    ``directions`` that many random directional derivatives ``dg @ d`` are
+    checked instead, which detects errors in any of the sensitivities at the
+    cost of a few evaluations. ``x`` is not modified.
+
+    The steps of forward and central differences trade truncation errors for
+    the round-off errors of the analysis, e.g. of a linear solve. The default
+    steps suit responses that are accurate to about 1e-12 relative to their
+    value, for designs of order one.
+
+    :param dx: The step size, by default 1e-6 (forward), 1e-3 (central) or 1e-20 (complex)
+    :param method: ``'forward'``, ``'central'`` or ``'complex'``, see ``derivative``
+    :param directions: None for all variables, the number of random directions, or an array
+        of directions of size [k, n]
+    :param processes: Number of worker processes, by default the number of CPUs
+    :param mp_context: The ``multiprocessing`` context of the workers, e.g. ``get_context('spawn')``,
+        by default that of the platform
+    :return: ``GradientCheck`` of which ``report()`` summarizes the errors
+    """
+    start = time.perf_counter()
+    x = np.array(x, dtype=float)
+    dx = {'forward': 1e-6, 'central': 1e-3, 'complex': 1e-20}[method] if dx is None else dx
+    g0, dg = prob.g(x), prob.dg(x)
+
+    if directions is None:
+        tasks, analytic = list(range(prob.n)), np.asarray(dg)
+        labels = [f'x_{i}' for i in tasks]
+    else:
+        if np.ndim(directions) == 0:
+            directions = np.random.default_rng(seed).standard_normal((directions, prob.n))
+            directions /= np.linalg.norm(directions, axis=1)[:, np.newaxis]
+        tasks = list(np.atleast_2d(directions))
+        analytic = np.asarray(dg @ np.array(tasks).T)
+        labels = [f'd_{i}' for i in range(len(tasks))]
+
+    processes = os.cpu_count() if processes is None else processes
+    processes = max(1, min(processes, len(tasks)))
+    if processes == 1:
+        approximate = np.array([derivative(prob, x, d, dx, method, g0) for d in tasks]).T
+    else:
+        # A few chunks per process balance the load, every chunk holds every k-th direction
+        k = min(len(tasks), 4 * processes)
+        with ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_initialize,
+                                 initargs=(prob, x, g0)) as pool:
+            parts = pool.map(_derivatives, [tasks[i::k] for i in range(k)], [dx] * k, [method] * k)
+            approximate = np.empty(analytic.shape, dtype=float)
+            for i, part in enumerate(parts):
+                approximate[:, i::k] = part.real
+
+    evaluations = len(tasks) * (2 if method == 'central' else 1) + 1
+    return GradientCheck(type(prob).__name__, method, analytic, approximate.real, labels,
+                         rtol=rtol, floor=floor, evaluations=evaluations, time=time.perf_counter() - start,
+                         processes=processes)
@@ -1,11 +1,8 @@
-from sao import approximations, \
-    intervening_variables, \
-    scaling_strategies, \
-    move_limits, \
-    problems, \
-    convergence_criteria, \
-    solvers, \
-    util
+from sao.util.tools import lazy_attributes
 
+# The subpackages are imported on first access, e.g. ``sao.solvers``, such that
+# ``import sao`` does not load the solver backends (scipy.optimize, cvxopt, ...)
 __all__ = ['approximations', 'intervening_variables', 'scaling_strategies', 'move_limits', 'problems',
            'convergence_criteria', 'solvers', 'util']
+
+__getattr__, __dir__ = lazy_attributes(__name__, dict.fromkeys(__all__))
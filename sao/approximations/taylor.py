@@ -1,6 +1,10 @@
+import copy
+
 import numpy as np
+from scipy.sparse import csr_matrix, issparse
 
 from sao.intervening_variables import Linear
+from sao.util.profiling import span
 from sao.util.tools import parse_to_list
 from .approximation import Approximation
 
@@ -27,23 +31,59 @@ class Taylor1(Approximation):
         self.y0 = None
         self.dgdy = None
         self.nresp, self.nvar = -1, -1
+        self.pattern, self.rows = None, None
 
     def update(self, x, f, df, ddf=None):
-        """Update the approximation with new information."""
+        """
+        Update the approximation with new information.
+
+        The sensitivities ``df`` can be a ``scipy.sparse`` matrix, of which the
+        sparsity pattern is kept: ``dgdy`` and the gradients returned by ``dg``
+        and ``ddg`` are then ``csr_matrix`` with the same pattern.
+        """
         self.nresp, self.nvar = df.shape
         assert len(x) == self.nvar, "Mismatch in number of design variables."
         assert len(f) == self.nresp, "Mismatch in number of responses."
+        if issparse(df):
+            df = csr_matrix(df)
+            df.sum_duplicates()
+            self.pattern = df
+            self.rows = np.repeat(np.arange(self.nresp), np.diff(df.indptr))
+        else:
+            self.pattern, self.rows = None, None
         for intv in self.interv:
-            intv.update(x, f, df, ddf)
+            with span('intervening.update', type=type(intv).__name__):
+                intv.update(x, f, df, ddf)
         self.g0 = f.copy()
-        self.dgdy = [df / intv.dydx(x) for intv in self.interv]
+        if self.pattern is None:
+            self.dgdy = [df / intv.dydx(x) for intv in self.interv]
+        else:
+            self.dgdy = [self.sparse(df.data / self.values(intv.dydx(x))) for intv in self.interv]
         self.y0 = [intv.y(x) for intv in self.interv]
 
         # Gather all zero order terms in self.g0 (to be computed only once per design iteration)
         for dgdy, y0 in zip(self.dgdy, self.y0):
-            self.g0 -= np.sum(dgdy * y0, axis=1)
+            self.g0 -= self.row_sum(dgdy, y0)
         return self
 
+    def values(self, a):
+        """Values of an intervening variable quantity, [n], [m+1, n] or sparse, on the sparsity pattern."""
+        if issparse(a):
+            return a.data
+        if a.ndim == 1:
+            return a[self.pattern.indices]
+        return a[self.rows, self.pattern.indices]
+
+    def sparse(self, values):
+        """Matrix with the sparsity pattern of the sensitivities and the given values."""
+        return csr_matrix((values, self.pattern.indices, self.pattern.indptr), shape=self.pattern.shape)
+
+    def row_sum(self, dgdy, y):
+        """Sum over the variables of ``dgdy * y``, for every response."""
+        if self.pattern is None:
+            return np.sum(dgdy * y, axis=1)
+        return np.bincount(self.rows, dgdy.data * self.values(y), minlength=self.nresp)
+
     def g(self, x, out=None):
         """Evaluates the approximation at design point `x`."""
         y_of_x = [intv.y(x) for intv in self.interv]
@@ -51,11 +91,13 @@ class Taylor1(Approximation):
             out = np.zeros(self.nresp)
         out[:] = self.g0
         for dgdy, y in zip(self.dgdy, y_of_x):
-            out += np.sum(dgdy * y, axis=1)
+            out += self.row_sum(dgdy, y)
         return out
 
     def dg(self, x, out=None):
         """Evaluates the approximation's gradient at design point `x`."""
+        if self.pattern is not None:
+            return self.sparse(sum(dgdy.data * self.values(intv.dydx(x)) for dgdy, intv in zip(self.dgdy, self.interv)))
         if out is None:
             out = np.zeros((self.nresp, self.nvar))
         else:
@@ -66,6 +108,8 @@ class Taylor1(Approximation):
 
     def ddg(self, x, out=None):
         """Evaluates the approximation's second derivative at design point `x`."""
+        if self.pattern is not None:
+            return self.sparse(sum(dgdy.data * self.values(intv.ddyddx(x)) for dgdy, intv in zip(self.dgdy, self.interv)))
         if out is None:
             out = np.zeros((self.nresp, self.nvar))
         else:
@@ -74,6 +118,45 @@ class Taylor1(Approximation):
             out += dgdy * intv.ddyddx(x)
         return out
 
+    def product(self, dgdy, y):
+        """Separable terms ``dgdy * y``, of which only the values on the sparsity pattern for sparse sensitivities."""
+        if self.pattern is None:
+            return dgdy * y
+        return dgdy.data * self.values(y)
+
+    def bound(self, x_min, x_max):
+        """
+        Upper bounds of the approximate responses for designs within `x_min` and `x_max`.
+
+        The separable term of every variable and intervening variable is
+        bounded by its largest value at either bound, which is exact as the
+        intervening variables in this package are monotone in their variable.
+        """
+        terms = sum(np.maximum(self.product(dgdy, intv.y(x_min)), self.product(dgdy, intv.y(x_max)))
+                    for dgdy, intv in zip(self.dgdy, self.interv))
+        if self.pattern is not None:
+            return self.g0 + np.bincount(self.rows, terms, minlength=self.nresp)
+        return self.g0 + np.sum(terms, axis=1)
+
+    def restrict(self, rows):
+        """
+        The approximation of the responses ``rows`` only, e.g. of the constraints that remain after screening.
+
+        The copy evaluates ``g``, ``dg`` and ``ddg`` of the selected responses
+        only, in their order, and holds until the next ``update`` of this
+        approximation.
+        """
+        out = copy.copy(self)
+        out.nresp = len(rows)
+        out.interv = [intv.restrict(rows) for intv in self.interv]
+        out.g0 = self.g0[rows]
+        out.dgdy = [dgdy[rows] for dgdy in self.dgdy]
+        out.y0 = [y0[rows] if issparse(y0) or np.ndim(y0) > 1 else y0 for y0 in self.y0]
+        if self.pattern is not None:
+            out.pattern = self.pattern[rows]
+            out.rows = np.repeat(np.arange(len(rows)), np.diff(out.pattern.indptr))
+        return out
+
     def clip(self, x):
         """Clips any vector `x` within the feasible bounds of any intervening variables."""
         [intv.clip(x) for intv in self.interv]
@@ -105,6 +188,7 @@ class Taylor2(Taylor1):
 
     def update(self, x, f, df, ddf=None):
         """Update the approximation with new information."""
+        assert not issparse(df), "Second order Taylor approximations need dense sensitivities"
         super().update(x, f, df, ddf)
         assert ddf is not None, "Second order taylor needs second order information"
         self.ddgddy = [ddf * intv.dxdy(x) ** 2 + df * intv.ddxddy(x) for intv in self.interv]
@@ -130,6 +214,36 @@ class Taylor2(Taylor1):
 
         return out
 
+    def bound(self, x_min, x_max):
+        """
+        Upper bounds of the approximate responses for designs within `x_min` and `x_max`.
+
+        Convex terms are bounded by their largest value at either bound, as
+        in ``Taylor1``. Concave terms (negative ``ddgddy``) are bounded by
+        their maximum, at ``y0 - dgdy / ddgddy`` clipped to the range of the
+        intervening variable within the bounds.
+        """
+        out = self.g0.copy()
+        for ddgddy, dgdy, y0, intv in zip(self.ddgddy, self.dgdy, self.y0, self.interv):
+            def term(y):
+                return dgdy * y + 0.5 * ddgddy * y ** 2 - ddgddy * y * y0
+
+            y_min, y_max = intv.y(x_min), intv.y(x_max)
+            terms = np.maximum(term(y_min), term(y_max))
+            concave = ddgddy < 0
+            if np.any(concave):
+                step = np.divide(dgdy, ddgddy, out=np.zeros_like(terms), where=concave)
+                peak = np.clip(y0 - step, np.minimum(y_min, y_max), np.maximum(y_min, y_max))
+                terms = np.where(concave, np.maximum(terms, term(peak)), terms)
+            out += np.sum(terms, axis=1)
+        return out
+
+    def restrict(self, rows):
+        out = super().restrict(rows)
+        out.ddgddy = [ddgddy[rows] for ddgddy in self.ddgddy]
+        out.dgdy0 = [dgdy0[rows] for dgdy0 in self.dgdy0]
+        return out
+
     def dg(self, x, out=None):
         """Evaluates the approximation's gradient at design point `x`."""
         y_of_x = [intv.y(x) for intv in self.interv]
@@ -187,6 +301,7 @@ class SphericalTaylor2(Taylor2):
         self.f = f
         self.xold1 = self.x
         self.x = x.copy()  # keep .copy(), otherwise previous value won't be stored
+        assert not issparse(df), "Second order Taylor approximations need dense sensitivities"
         Taylor1.update(self, x, f, df, ddf)
         assert ddf is None, "SphericalTaylor2 generates its own curvature; if 2nd-order info is known, use Taylor2"
 
@@ -242,6 +357,7 @@ class NonSphericalTaylor2(SphericalTaylor2):
         self.df = df
         self.xold1 = self.x
         self.x = x.copy()  # keep .copy(), otherwise previous value won't be stored
+        assert not issparse(df), "Second order Taylor approximations need dense sensitivities"
         Taylor1.update(self, x, f, df, ddf)
         assert ddf is None, "NonSphericalTaylor2 generates its own curvature; if 2nd-order info is known, use Taylor2"
 
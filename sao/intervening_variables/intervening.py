@@ -58,3 +58,12 @@ class Intervening(ABC):
     def clip(self, x):
         """Default clipping is none."""
         return x
+
+    def restrict(self, rows):
+        """
+        The mapping of the responses ``rows`` only, of which the outputs [m+1, n] have a row per selected response.
+
+        Mappings that are the same for all responses, of which the outputs
+        are of size [n], are returned as is.
+        """
+        return self
@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 
 from sao.intervening_variables import Intervening, Linear
@@ -158,3 +160,13 @@ class MixedIntervening(Intervening):
         for intv in self.intervening_variables:
             intv.clip(x)
         return x
+
+    def restrict(self, rows):
+        """A copy of the mapping for the responses ``rows`` only, renumbered in their order."""
+        index = {int(r): i for i, r in enumerate(rows)}
+        out = copy.copy(self)
+        out.nresp = len(index)
+        out.iv_mapping = [(intv.restrict(rows), {index[r] for r in responses if r in index},
+                           {index[r]: variables[r] for r in variables if r in index})
+                          for intv, responses, variables in self.iv_mapping]
+        return out
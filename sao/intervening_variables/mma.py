@@ -23,33 +23,34 @@ class MMAp(PositiveNegative):
 
     def update(self, x, f, df, *args, **kwargs):
         """Update state of previous iterations."""
-        self.positive = df >= 0
+        super().update(x, f, df)
         [self.low, self.upp] = self.get_asymptotes(x)
 
     def get_asymptotes(self, x):
         return 1.0 * self.low, 1.0 * self.upp
 
+    # The left and right intervening variables are the same, of the distance to the upper or lower asymptote
     def y(self, x):
-        return super().y(np.where(self.positive, self.upp - x, x - self.low))
+        return self.sparse(self.right.y(self.where(self.upp - x, x - self.low)))
 
     def dydx(self, x):
-        g_x = np.where(self.positive, self.upp - x, x - self.low)
-        dg_x = np.where(self.positive, -1, +1)
-        return super().dydx(g_x) * dg_x
+        g_x = self.where(self.upp - x, x - self.low)
+        dg_x = self.where(-1, +1)
+        return self.sparse(self.right.dydx(g_x) * dg_x)
 
     def ddyddx(self, x):
-        g_x = np.where(self.positive, self.upp - x, x - self.low)
-        return super().ddyddx(g_x)
+        g_x = self.where(self.upp - x, x - self.low)
+        return self.sparse(self.right.ddyddx(g_x))
 
     def clip(self, x):
         """
         Clips a vector x between the lower and upper asymptote, with minimum
-        safety distance `albefa` to the asymptotes.
+        safety distance `factor` times the distance between the asymptotes.
         :param x: The vector to be clipped
         :return: Clipped vector (reference of x)
         """
-        x_min = (1.0 + self.factor) * self.low
-        x_max = (1.0 - self.factor) * self.upp
+        x_min = self.low + self.factor * (self.upp - self.low)
+        x_max = self.upp - self.factor * (self.upp - self.low)
         return np.clip(x, x_min, x_max, out=x)
 
 
@@ -1,32 +1,74 @@
+import copy
+
 import numpy as np
+from scipy.sparse import csr_matrix, issparse
 
 from .exponential import Linear, Reciprocal
 from .intervening import Intervening
 
 
 class PositiveNegative(Intervening):
+    """
+    Uses the ``right`` intervening variable where ``dg_j/dx_i >= 0`` and the ``left`` one elsewhere.
+
+    With sparse sensitivities ``df`` the mapping is only evaluated on their
+    sparsity pattern, and ``y``, ``dydx`` and ``ddyddx`` return a
+    ``csr_matrix`` with that pattern instead of an array [m+1, n].
+    """
+
     def __init__(self, left: Intervening, right: Intervening):
         self.left = left
         self.right = right
         self.positive = None
+        self.pattern = None
 
     def update(self, x, f, df, *args, **kwargs):
-        self.positive = df >= 0
+        if issparse(df):
+            self.pattern = csr_matrix(df)
+            self.positive = self.pattern.data >= 0
+        else:
+            self.pattern = None
+            self.positive = df >= 0
+
+    def where(self, positive, negative):
+        """Selects ``positive`` where ``dg_j/dx_i >= 0`` and ``negative`` elsewhere, per nonzero of a sparse ``df``."""
+        if self.pattern is None:
+            return np.where(self.positive, positive, negative)
+        indices = self.pattern.indices
+        return np.where(self.positive, positive if np.ndim(positive) == 0 else positive[indices],
+                        negative if np.ndim(negative) == 0 else negative[indices])
+
+    def sparse(self, values):
+        """Returns the values of ``where`` as a matrix with the sparsity pattern of ``df``, if sparse."""
+        if self.pattern is None:
+            return values
+        return csr_matrix((values, self.pattern.indices, self.pattern.indptr), shape=self.pattern.shape)
 
     def y(self, x):
-        return np.where(self.positive, self.right.y(x), self.left.y(x))
+        return self.sparse(self.where(self.right.y(x), self.left.y(x)))
 
     def dydx(self, x):
-        return np.where(self.positive, self.right.dydx(x), self.left.dydx(x))
+        return self.sparse(self.where(self.right.dydx(x), self.left.dydx(x)))
 
     def ddyddx(self, x):
-        return np.where(self.positive, self.right.ddyddx(x), self.left.ddyddx(x))
+        return self.sparse(self.where(self.right.ddyddx(x), self.left.ddyddx(x)))
 
     def clip(self, x):
         self.left.clip(x)
         self.right.clip(x)
         return x
 
+    def restrict(self, rows):
+        """A copy that selects between ``left`` and ``right`` for the responses ``rows`` only."""
+        out = copy.copy(self)
+        out.left, out.right = self.left.restrict(rows), self.right.restrict(rows)
+        if self.pattern is None:
+            out.positive = self.positive[rows]
+        else:
+            out.pattern = self.pattern[rows]
+            out.positive = out.pattern.data >= 0
+        return out
+
 
 class ConLin(PositiveNegative):
     """The ``ConLin`` formulation of intervening variables.
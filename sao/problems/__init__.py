@@ -1,4 +1,10 @@
+from .aggregated import AggregatedProblem
+from .cached import CachedProblem
+from .external import ExternalProblem
 from .problem import Problem
+from .profiled import ProfiledProblem
+from .screening import ActiveSetScreening
 from .subproblem import Subproblem
 
-__all__ = ['Problem', 'Subproblem']
+__all__ = ['ActiveSetScreening', 'AggregatedProblem', 'CachedProblem', 'ExternalProblem', 'Problem', 'ProfiledProblem',
+           'Subproblem']
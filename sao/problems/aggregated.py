@@ -0,0 +1,180 @@
+import numpy as np
+from scipy.sparse import csr_matrix, diags, issparse
+
+from sao.problems.problem import Problem
+
+
+class AggregatedProblem(Problem):
+    """
+    Wraps a problem such that groups of its constraints are aggregated into a single constraint each.
+
+    Many local constraints, e.g. a stress constraint per element, make for a
+    large subproblem, of which ``pdip`` solves an ``m x m`` system. Here every
+    group of constraints is replaced by one smooth, conservative estimate of
+    its maximum, trading a small loss of accuracy for a far smaller
+    subproblem. The aggregates are either
+
+    - ``'ks'``, the Kreisselmeier-Steinhauser function
+      ``max(g) + log(sum(exp(rho (g_j - max(g))))) / rho``, which exceeds the
+      maximum by at most ``log(k) / rho`` for a group of ``k`` constraints, or
+    - ``'pnorm'``, the p-norm ``(sum(r_j^p))^(1/p) - 1`` of the ratios
+      ``r_j = g_j + 1``, for constraints of the form ``r_j - 1 <= 0`` with
+      ``r_j >= 0`` (negative ratios count as zero), e.g. relative stresses.
+
+    With ``alpha > 0`` the aggregates are normalized adaptively to track the
+    true maximum of their group: after every evaluation of the sensitivities
+    the normalization moves a fraction ``alpha`` towards the one that makes
+    the aggregate exact at that design, i.e. an additive shift for KS and a
+    factor on the ratio for the p-norm. The normalization is constant
+    between sensitivity evaluations, such that the responses and
+    sensitivities of a design are consistent; use ``alpha=0`` for finite
+    difference checks.
+
+    The responses are the objective, the aggregates of the ``groups`` and
+    the constraints that are in no group, in their original order. The
+    sensitivities are exact, and sparse for sparse sensitivities of the
+    wrapped problem. Other attributes are those of the wrapped problem.
+    """
+
+    def __init__(self, problem, groups=1, method='ks', rho=50., p=8., alpha=0.5):
+        """
+        :param problem: The problem of which the constraints are aggregated
+        :param groups: Number of groups of consecutive constraints, or a list of arrays of the response
+            indices (1 to m) of every group
+        :param method: ``'ks'`` or ``'pnorm'``
+        :param rho: Aggregation parameter of KS
+        :param p: Exponent of the p-norm
+        :param alpha: Relaxation of the adaptive normalization, 0 for a fixed normalization
+        """
+        assert method in ('ks', 'pnorm'), f"Unknown aggregation method '{method}'"
+        self.problem = problem
+        self.method = method
+        self.rho, self.p, self.alpha = rho, p, alpha
+
+        constraints = np.arange(1, problem.m + 1)
+        if isinstance(groups, (int, np.integer)):
+            groups = np.array_split(constraints, groups)
+        self.groups = [np.asarray(group, dtype=int) for group in groups if len(group) > 0]
+        grouped = np.concatenate(self.groups) if self.groups else np.zeros(0, dtype=int)
+        assert len(np.unique(grouped)) == len(grouped), "A constraint can only be in a single group."
+        assert np.all((grouped >= 1) & (grouped <= problem.m)), "Groups hold response indices 1 to m."
+        self.ungrouped = np.setdiff1d(constraints, grouped)
+        self.m = len(self.groups) + len(self.ungrouped)
+
+        # Rows and columns of the aggregation matrices, of the responses of the wrapped problem
+        self.rows = np.concatenate([[0]] + [np.full(len(group), 1 + i) for i, group in enumerate(self.groups)] +
+                                   [1 + len(self.groups) + np.arange(len(self.ungrouped))]).astype(int)
+        self.cols = np.concatenate([[0], grouped, self.ungrouped]).astype(int)
+
+        # Normalization: additive shift of KS, factor of the p-norm ratio
+        self.shift = np.zeros(len(self.groups))
+        self.c = np.ones(len(self.groups))
+
+        self.x, self.responses = None, None
+        self.raw, self.max = None, None
+        self.weights, self.weights2, self.curvature = None, None, None
+
+    def __getattr__(self, name):
+        if name == 'problem':
+            raise AttributeError(name)
+        return getattr(self.problem, name)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( {self.problem}, {self.method}, groups: {len(self.groups)} )'
+
+    def aggregate(self, x, g):
+        """Aggregates the responses ``g`` of the wrapped problem at ``x``, and keeps the chain rule weights."""
+        self.x, self.responses = np.array(x), np.array(g)
+        ng = len(self.groups)
+        self.raw, self.max = np.zeros(ng), np.zeros(ng)
+        weights, weights2, curvature = [], [], np.zeros(ng)
+        for i, group in enumerate(self.groups):
+            gi = g[group]
+            self.max[i] = gi.max()
+            if self.method == 'ks':
+                # Shifted by the maximum, such that the exponentials do not overflow
+                e = np.exp(self.rho * (gi - self.max[i]))
+                self.raw[i] = self.max[i] + np.log(e.sum()) / self.rho
+                w = e / e.sum()
+                weights.append(w)
+                weights2.append(self.rho * w)
+                curvature[i] = -self.rho
+            else:
+                r = np.maximum(gi + 1, 0.)
+                scale = r.max() if r.max() > 0 else 1.
+                norm = scale * np.sum((r / scale) ** self.p) ** (1 / self.p)
+                self.raw[i] = norm - 1
+                w = self.c[i] * (r / norm) ** (self.p - 1) if norm > 0 else np.zeros_like(r)
+                weights.append(w)
+                weights2.append((self.p - 1) * np.divide(w, r, out=np.zeros_like(r), where=r > 0))
+                curvature[i] = (1 - self.p) / (self.c[i] * norm) if norm > 0 else 0.
+        self.weights = np.concatenate([[1.]] + weights + [np.ones(len(self.ungrouped))])
+        self.weights2 = np.concatenate([[0.]] + weights2 + [np.zeros(len(self.ungrouped))])
+        self.curvature = np.concatenate([[0.], curvature, np.zeros(len(self.ungrouped))])
+
+        out = np.empty(self.m + 1)
+        out[0] = g[0]
+        if self.method == 'ks':
+            out[1:1 + ng] = self.raw + self.shift
+        else:
+            out[1:1 + ng] = self.c * (self.raw + 1) - 1
+        out[1 + ng:] = g[self.ungrouped]
+        return out
+
+    def normalize(self):
+        """Moves the normalization towards the one that is exact at the last aggregated design."""
+        if self.alpha == 0 or self.raw is None:
+            return
+        if self.method == 'ks':
+            self.shift += self.alpha * (self.max - self.raw - self.shift)
+        else:
+            exact = np.divide(np.maximum(self.max + 1, 0), self.raw + 1, out=self.c.copy(), where=self.raw + 1 > 0)
+            self.c += self.alpha * (exact - self.c)
+
+    def matrix(self, weights):
+        return csr_matrix((weights, (self.rows, self.cols)), shape=(self.m + 1, self.problem.m + 1))
+
+    def chain(self, dg):
+        """Sensitivities of the aggregated responses, from those of the wrapped problem."""
+        out = self.matrix(self.weights) @ dg
+        return out.tocsr() if issparse(out) else np.asarray(out)
+
+    def chain2(self, dg, ddg):
+        """Diagonal second derivatives of the aggregated responses."""
+        square = dg.multiply(dg) if issparse(dg) else dg ** 2
+        first = self.matrix(self.weights) @ dg
+        first2 = first.multiply(first) if issparse(first) else first ** 2
+        out = self.matrix(self.weights) @ ddg + self.matrix(self.weights2) @ square + diags(self.curvature) @ first2
+        return out.tocsr() if issparse(out) else np.asarray(out)
+
+    def current(self, x):
+        """Aggregates at ``x``, unless it was the last aggregated design."""
+        if self.x is None or not np.array_equal(x, self.x):
+            self.aggregate(x, self.problem.g(x))
+
+    def g(self, x):
+        return self.aggregate(x, self.problem.g(x))
+
+    def dg(self, x):
+        self.current(x)
+        dg = self.chain(self.problem.dg(x))
+        self.normalize()
+        return dg
+
+    def ddg(self, x):
+        self.current(x)
+        ddg = self.problem.ddg(x)
+        if ddg is None:
+            return None
+        return self.chain2(self.problem.dg(x), ddg)
+
+    def evaluate(self, x, order=1):
+        responses = self.problem.evaluate(x, order)
+        out = (self.aggregate(x, responses[0]),)
+        if order >= 1:
+            out += (self.chain(responses[1]),)
+        if order >= 2:
+            out += (None if responses[2] is None else self.chain2(responses[1], responses[2]),)
+        if order >= 1:
+            self.normalize()
+        return out
@@ -0,0 +1,85 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from sao.problems.problem import Problem
+
+
+class CachedProblem(Problem):
+    """
+    Wraps a problem such that it is analysed only once per unique design.
+
+    The responses and sensitivities are stored for the ``maxsize`` most
+    recently used designs, keyed by a hash of the design vector. Repeated
+    calls at the same design, e.g. for logging, convergence checks or the
+    final evaluation of a driver, are served from the cache.
+
+    When the sensitivities are requested at the design the wrapped problem
+    was last analysed at, only ``dg`` is called on it. Otherwise
+    ``evaluate`` is used, such that responses and sensitivities follow from
+    a single analysis. Other attributes, e.g. ``n``, ``m``, ``x0`` and the
+    bounds, are those of the wrapped problem.
+    """
+
+    orders = ('g', 'dg', 'ddg')
+
+    def __init__(self, problem, maxsize=8):
+        self.problem = problem
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits, self.misses = 0, 0
+        self.current = None
+
+    def __getattr__(self, name):
+        if name == 'problem':
+            raise AttributeError(name)
+        return getattr(self.problem, name)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( {self.problem}, hits: {self.hits}, misses: {self.misses} )'
+
+    @staticmethod
+    def key(x):
+        x = np.ascontiguousarray(x)
+        return x.shape, x.dtype.str, hashlib.blake2b(x.tobytes(), digest_size=16).digest()
+
+    def clear(self):
+        self.cache.clear()
+        self.hits, self.misses = 0, 0
+        self.current = None
+
+    def evaluate(self, x, order=1):
+        key = self.key(x)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.cache[key] = {}
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+
+        names = self.orders[:order + 1]
+        missing = [name for name in names if name not in entry]
+        if not missing:
+            self.hits += 1
+        elif self.current == key:
+            # The wrapped problem is still in the state of this design
+            self.misses += 1
+            for name in missing:
+                entry[name] = getattr(self.problem, name)(x)
+        else:
+            self.misses += 1
+            entry.update(zip(names, self.problem.evaluate(x, order)))
+            self.current = key
+
+        return tuple(None if entry[name] is None else np.copy(entry[name]) for name in names)
+
+    def g(self, x):
+        return self.evaluate(x, order=0)[0]
+
+    def dg(self, x):
+        return self.evaluate(x, order=1)[1]
+
+    def ddg(self, x):
+        return self.evaluate(x, order=2)[2]
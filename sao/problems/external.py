@@ -0,0 +1,299 @@
+import os
+from multiprocessing import Pipe, Process, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from scipy.sparse import issparse
+
+from sao.problems.problem import Problem
+
+
+class ExternalBuffers:
+    """
+    Numpy views on the shared memory blocks of the design ``x``, responses ``g`` and sensitivities ``dg``.
+
+    The optimizer side creates the blocks, the analysis side attaches to them
+    by the names in ``spec``. With a ``prefix`` the blocks are named
+    ``prefix_x``, ``prefix_g`` and ``prefix_dg``, such that processes can
+    attach with ``create=False`` without receiving ``spec``. Reading and writing the views is
+    zero-copy, e.g. every MPI rank of an analysis can write its slice of
+    ``dg`` in place.
+    """
+
+    def __init__(self, n, m, spec=None, prefix=None, create=None):
+        self.n, self.m = n, m
+        shapes = {'x': (n,), 'g': (m + 1,), 'dg': (m + 1, n)}
+        self.owner = spec is None if create is None else create
+        names = spec or {key: None if prefix is None else f'{prefix}_{key}' for key in shapes}
+        self.blocks = {}
+        for key, shape in shapes.items():
+            if self.owner:
+                block = SharedMemory(name=names[key], create=True, size=max(1, int(np.prod(shape))) * 8)
+            else:
+                block = attach(names[key], names.get('tracker'))
+            self.blocks[key] = block
+            setattr(self, key, np.ndarray(shape, dtype=float, buffer=block.buf))
+
+    @property
+    def spec(self):
+        """Names of the blocks, to attach to them from another process."""
+        return dict({key: block.name for key, block in self.blocks.items()}, tracker=tracker())
+
+    def close(self):
+        """Releases the views and the blocks, which are removed by their owner."""
+        self.x = self.g = self.dg = None
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+
+class MappedBuffers(ExternalBuffers):
+    """
+    Memory-mapped ``.npy`` files of ``x``, ``g`` and ``dg``, for analyses without access to the shared memory.
+
+    The files ``prefix_x.npy``, ``prefix_g.npy`` and ``prefix_dg.npy`` in
+    ``directory`` (e.g. on a shared file system of a cluster) are allocated
+    once by the optimizer side. Every process maps them and only touches the
+    pages it reads or writes, e.g. the MPI ranks of an analysis their own
+    slices (see ``sao.util.partition``), while the optimizer maps ``dg`` as
+    one array.
+    """
+
+    def __init__(self, n, m, directory, spec=None, prefix='sao', create=None):
+        self.n, self.m = n, m
+        self.directory, self.prefix = os.fspath(directory), prefix
+        self.owner = spec is None if create is None else create
+        self.blocks = {}
+        for key, shape in {'x': (n,), 'g': (m + 1,), 'dg': (m + 1, n)}.items():
+            path = os.path.join(self.directory, f'{prefix}_{key}.npy')
+            if self.owner:
+                array = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=shape)
+            else:
+                array = np.load(path, mmap_mode='r+')
+            self.blocks[key] = path
+            setattr(self, key, array)
+
+    @property
+    def spec(self):
+        return {'directory': self.directory, 'prefix': self.prefix}
+
+    def close(self):
+        for key in self.blocks:
+            getattr(self, key).flush()
+        self.x = self.g = self.dg = None
+        if self.owner:
+            for path in self.blocks.values():
+                os.remove(path)
+        self.blocks = {}
+
+
+def open_buffers(n, m, spec):
+    """Attaches to the buffers of ``spec``, in shared memory or memory-mapped files."""
+    if 'directory' in spec:
+        return MappedBuffers(n, m, spec['directory'], spec=spec, prefix=spec['prefix'])
+    return ExternalBuffers(n, m, spec=spec)
+
+
+def tracker():
+    """
+    Process id of the resource tracker, which removes the shared memory blocks of its processes at exit.
+
+    The id is a private attribute of ``multiprocessing.resource_tracker``, which is None when it is
+    not available.
+    """
+    resource_tracker.ensure_running()
+    try:
+        return resource_tracker._resource_tracker._pid
+    except AttributeError:
+        return None
+
+
+def attach(name, owner_tracker=None):
+    """Attaches to an existing shared memory block, leaving its removal to the owner."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks attached blocks, which must not be removed by another tracker.
+        # If either tracker is unknown, the block is untracked as well: should the trackers be the
+        # same, the block is then not removed when the owner crashes, rather than removed too early.
+        block = SharedMemory(name=name)
+        pid = tracker()
+        if pid is None or owner_tracker is None or pid != owner_tracker:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class ExternalProblem(Problem):
+    """
+    Problem of which the responses are evaluated by an external analysis process.
+
+    The design, responses and sensitivities are exchanged through shared
+    memory (see ``ExternalBuffers``), the process is notified over a
+    connection: a Unix socket at ``address``, on which this problem waits for
+    the analysis to connect, or any ``multiprocessing`` connection, e.g. one
+    end of a pipe. Evaluations block on the reply of the analysis, without
+    polling the file system.
+
+    The protocol consists of tuples ``(command, payload)``. The problem sends
+    ``('attach', spec)`` once, followed by ``('evaluate', order)`` for every
+    design in ``buffers.x`` and ``('close', None)`` at the end. The analysis
+    answers ``('ready', None)``, ``('done', order)`` or ``('error', message)``.
+    ``serve`` implements the analysis side for any ``Problem``, and ``local``
+    runs a problem in such a separate process, e.g. for testing.
+
+    The shared memory blocks are named after ``prefix`` if given (see
+    ``ExternalBuffers``). With a ``directory`` memory-mapped files are used
+    instead (see ``MappedBuffers``), e.g. when the analysis runs on other
+    nodes of a cluster. By default copies of the shared arrays are returned. With ``copy=False``
+    the returned arrays are views of the buffers, which are valid until the
+    next evaluation.
+
+    Without a reply within ``timeout`` seconds a ``TimeoutError`` is raised
+    and the problem is closed, as a late reply would otherwise be taken for
+    that of the next request; later requests raise a ``RuntimeError``.
+    """
+
+    def __init__(self, n, m, address=None, connection=None, authkey=None, timeout=None, copy=True, prefix=None,
+                 directory=None, x0=None, x_min=None, x_max=None, process=None):
+        super().__init__()
+        self.name = 'External'
+        self.n, self.m = n, m
+        self.x0 = np.zeros(n) if x0 is None else x0
+        self.x_min, self.x_max = x_min, x_max
+        self.timeout = timeout
+        self.copy = copy
+        self.process = process
+        self.x_analysis, self.order = None, -1
+
+        if directory is None:
+            self.buffers = ExternalBuffers(n, m, prefix=prefix)
+        else:
+            self.buffers = MappedBuffers(n, m, directory, prefix='sao' if prefix is None else prefix)
+        if connection is None:
+            with Listener(address, family='AF_UNIX', authkey=authkey) as listener:
+                connection = listener.accept()
+        self.connection = connection
+        self.request('attach', self.buffers.spec)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @classmethod
+    def local(cls, problem, **kwargs):
+        """Runs ``problem`` in a separate process, which is served through this external problem."""
+        # The process shares the resource tracker of this one
+        tracker()
+        connection, remote = Pipe()
+        process = Process(target=serve, args=(problem, remote), daemon=True)
+        process.start()
+        remote.close()
+        return cls(problem.n, problem.m, connection=connection, x0=problem.x0, x_min=problem.x_min,
+                   x_max=problem.x_max, process=process, **kwargs)
+
+    def request(self, command, payload=None):
+        """Sends a command and waits for the reply of the analysis."""
+        if self.connection is None:
+            raise RuntimeError("The external analysis is closed")
+        self.connection.send((command, payload))
+        if not self.connection.poll(self.timeout):
+            self.close()
+            raise TimeoutError(f"No reply of the external analysis on '{command}' within {self.timeout} s")
+        status, message = self.connection.recv()
+        if status == 'error':
+            raise RuntimeError(f"External analysis failed: {message}")
+        return message
+
+    def analyse(self, x, order):
+        if self.order >= order and np.array_equal(x, self.x_analysis):
+            return
+        if self.connection is None:
+            raise RuntimeError("The external analysis is closed")
+        self.buffers.x[:] = x
+        self.request('evaluate', order)
+        self.x_analysis, self.order = self.buffers.x.copy(), order
+
+    def result(self, name):
+        array = getattr(self.buffers, name)
+        return array.copy() if self.copy else array
+
+    def g(self, x):
+        self.analyse(x, 0)
+        return self.result('g')
+
+    def dg(self, x):
+        self.analyse(x, 1)
+        return self.result('dg')
+
+    def evaluate(self, x, order=1):
+        self.analyse(x, min(order, 1))
+        out = (self.result('g'),)
+        if order >= 1:
+            out += (self.result('dg'),)
+        if order >= 2:
+            out += (self.ddg(x),)
+        return out
+
+    def close(self):
+        """Stops the analysis and releases the shared memory."""
+        if self.connection is None:
+            return
+        try:
+            self.connection.send(('close', None))
+        except (BrokenPipeError, OSError):
+            pass
+        self.connection.close()
+        self.connection = None
+        self.x_analysis, self.order = None, -1
+        if self.process is not None:
+            self.process.join(self.timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.buffers.close()
+
+
+def connect(address, authkey=None):
+    """Connects an analysis process to the ``ExternalProblem`` listening at ``address``."""
+    return Client(address, family='AF_UNIX', authkey=authkey)
+
+
+def serve(problem, connection):
+    """
+    Serves the evaluations of an ``ExternalProblem`` with ``problem``, until it is closed.
+
+    :param problem: The problem that is analysed, on the design in shared memory
+    :param connection: Connection to the ``ExternalProblem``, e.g. from ``connect``
+    """
+    shared = None
+    try:
+        while True:
+            try:
+                command, payload = connection.recv()
+            except EOFError:
+                break
+            if command == 'close':
+                break
+            try:
+                if command == 'attach':
+                    shared = open_buffers(problem.n, problem.m, payload)
+                elif command == 'evaluate':
+                    out = problem.evaluate(shared.x, payload)
+                    shared.g[:] = out[0]
+                    if payload >= 1:
+                        shared.dg[:] = out[1].toarray() if issparse(out[1]) else out[1]
+                else:
+                    raise ValueError(f"Unknown command '{command}'")
+            except Exception as error:
+                connection.send(('error', repr(error)))
+            else:
+                connection.send(('ready', None) if command == 'attach' else ('done', payload))
+    finally:
+        if shared is not None:
+            shared.close()
+        connection.close()
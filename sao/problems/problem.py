@@ -25,3 +25,22 @@ class Problem(ABC):
 
     def ddg(self, x):
         ...
+
+    def evaluate(self, x, order=1):
+        """
+        Evaluates the responses and their sensitivities at the same design.
+
+        The default implementation calls ``g``, ``dg`` and ``ddg`` in turn.
+        Problems that share an analysis between these methods can override
+        it to return all quantities from a single analysis.
+
+        :param x: The design
+        :param order: The highest derivative order to return (0, 1 or 2)
+        :return: Tuple ``(g,)``, ``(g, dg)`` or ``(g, dg, ddg)``
+        """
+        out = (self.g(x),)
+        if order >= 1:
+            out += (self.dg(x),)
+        if order >= 2:
+            out += (self.ddg(x),)
+        return out
@@ -0,0 +1,44 @@
+from sao.problems.problem import Problem
+from sao.util.profiling import count, span
+
+
+class ProfiledProblem(Problem):
+    """
+    Wraps a problem such that its evaluations are recorded by the global profiler.
+
+    Every call of ``g``, ``dg``, ``ddg`` and ``evaluate`` is recorded as a
+    span ``problem.<method>`` and counted, e.g. to separate the time spent in
+    the analysis from the time spent in the optimizer. Other attributes are
+    those of the wrapped problem.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+
+    def __getattr__(self, name):
+        if name == 'problem':
+            raise AttributeError(name)
+        return getattr(self.problem, name)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( {self.problem} )'
+
+    def g(self, x):
+        count('problem.g')
+        with span('problem.g'):
+            return self.problem.g(x)
+
+    def dg(self, x):
+        count('problem.dg')
+        with span('problem.dg'):
+            return self.problem.dg(x)
+
+    def ddg(self, x):
+        count('problem.ddg')
+        with span('problem.ddg'):
+            return self.problem.ddg(x)
+
+    def evaluate(self, x, order=1):
+        count('problem.evaluate')
+        with span('problem.evaluate', order=order):
+            return self.problem.evaluate(x, order)
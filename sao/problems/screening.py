@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class ActiveSetScreening:
+    """
+    Screens the constraints of a subproblem that are guaranteed to be inactive within its bounds.
+
+    A constraint is dropped from the subproblem when the upper bound of its
+    approximation on the move-limited bounds of the subproblem, see
+    ``Taylor1.bound`` and ``Taylor2.bound``, is below ``-margin``. It can
+    then not become active in the subproblem, of which the solution is that
+    of the subproblem with all constraints. Constraints of which the current
+    value is above ``-margin`` are never dropped. The constraints are
+    screened at every build, such that a dropped constraint is added again
+    as soon as it approaches activity, i.e. its bound rises above
+    ``-margin``. With a positive margin constraints are kept a little before
+    they can become active.
+    """
+
+    def __init__(self, margin=0.0, keep=()):
+        """
+        :param margin: Constraints of which the bound is above ``-margin`` are kept
+        :param keep: Response indices (1 to m) of constraints that are never dropped
+        """
+        self.margin = margin
+        self.keep = np.asarray(keep, dtype=int)
+
+    def select(self, approximation, x_min, x_max, f=None):
+        """
+        Returns the response indices of the constraints that can become active between ``x_min`` and ``x_max``.
+
+        :param f: The responses at the current design, of which the constraints above ``-margin`` are kept
+        """
+        active = approximation.bound(x_min, x_max)[1:] > -self.margin
+        if f is not None:
+            active |= np.asarray(f)[1:] > -self.margin
+        active[self.keep - 1] = True
+        return 1 + np.flatnonzero(active)
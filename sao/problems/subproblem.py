@@ -3,15 +3,34 @@ import numpy as np
 from sao.approximations.taylor import Taylor1
 from sao.move_limits.move_limit import Bounds
 from sao.problems.problem import Problem
+from sao.util.profiling import count, profiled, span
 from sao.util.tools import parse_to_list
 
 
 class Subproblem(Problem):
-    def __init__(self, approximation=Taylor1(), limits=Bounds(xmin=0, xmax=1)):
+    """
+    The approximate subproblem of an iteration, with the bounds of its move limits.
+
+    With a ``screening`` policy, e.g. ``ActiveSetScreening``, the constraints
+    that cannot become active within the bounds are dropped at every build:
+    ``m``, ``g``, ``dg`` and ``ddg`` are those of the remaining constraints,
+    of which ``active`` holds the response indices. These are evaluated by
+    the approximation restricted to the active responses, ``reduced``, such
+    that the cost of the subsolver follows the number of potentially active
+    constraints.
+    ``dropped`` is the number of dropped constraints, and ``multipliers``
+    maps the multipliers of the subsolver back to all constraints.
+    """
+
+    def __init__(self, approximation=Taylor1(), limits=Bounds(xmin=0, xmax=1), screening=None):
         super().__init__()
         self.approx = approximation
         self.set_limits(limits)
         self.lims = parse_to_list(limits)
+        self.screening = screening
+        self.active = None
+        self.reduced = None
+        self.dropped = 0
 
     def set_limits(self, *limits):
         self.lims = parse_to_list(*limits)
@@ -19,11 +38,23 @@ class Subproblem(Problem):
     def add_limits(self, *limits):
         self.lims.extend(parse_to_list(*limits))
 
+    @profiled('subproblem.build')
     def build(self, x, f, df, ddf=None):
+        """
+        Builds the approximate subproblem at ``x``.
+
+        :param x: Current design [n]
+        :param f: Responses at ``x`` [m+1]
+        :param df: Sensitivities at ``x`` [m+1, n], an array or a ``scipy.sparse`` matrix. A sparse
+            ``df`` stays sparse in ``Taylor1`` approximations, of which ``dg`` and ``ddg`` are then
+            sparse as well, which ``pdip`` solves with sparse Newton systems.
+        :param ddf: Optional second order sensitivities [m+1, n]
+        """
         self.n, self.m = len(x), len(f) - 1
 
         # Update the approximation
-        self.approx.update(x, f, df, ddf)
+        with span('approximation.update', type=type(self.approx).__name__):
+            self.approx.update(x, f, df, ddf)
 
         # Update the local problem bounds
         self.x_min = np.full_like(x, -np.inf)
@@ -34,9 +65,10 @@ class Subproblem(Problem):
         # the feasible range of the intervening variables. First the move
         # limits are applied to constraint the step size.
         for ml in self.lims:
-            ml.update(x, f, df, ddf)
-            ml.clip(self.x_min)
-            ml.clip(self.x_max)
+            with span('move_limit.update', type=type(ml).__name__):
+                ml.update(x, f, df, ddf)
+                ml.clip(self.x_min)
+                ml.clip(self.x_max)
 
         # Additional constraint on the step size by the feasible range of the
         # intervening variables. This prevents the subsolver to make an update
@@ -49,15 +81,34 @@ class Subproblem(Problem):
             "The bounds must be finite. Use at least one move-limit or bound."
         # TODO: Possibly a check for finiteness of the bounds
 
+        # Drop the constraints that cannot become active within the bounds
+        if self.screening is None:
+            self.active, self.reduced, self.dropped = None, None, 0
+        else:
+            with span('subproblem.screening', type=type(self.screening).__name__):
+                self.active = np.concatenate(([0], self.screening.select(self.approx, self.x_min, self.x_max, f)))
+                self.reduced = self.approx.restrict(self.active)
+            self.dropped = self.m - (len(self.active) - 1)
+            self.m = len(self.active) - 1
+            count('subproblem.dropped', self.dropped)
+
+    def multipliers(self, lam):
+        """Multipliers of all constraints, from those of the remaining constraints, zero for dropped constraints."""
+        if self.active is None:
+            return lam
+        out = np.zeros(self.m + self.dropped)
+        out[self.active[1:] - 1] = lam
+        return out
+
     # TODO These might also be removed if the solver uses prob.approx.g instead of prob.g
     def g(self, x):
-        return self.approx.g(x)
+        return (self.approx if self.active is None else self.reduced).g(x)
 
     def dg(self, x):
-        return self.approx.dg(x)
+        return (self.approx if self.active is None else self.reduced).dg(x)
 
     def ddg(self, x):
-        return self.approx.ddg(x)
+        return (self.approx if self.active is None else self.reduced).ddg(x)
 
     '''
     P = dg_j/dy_ji = dg_j/dx_i * dx_i/dy_ji [(m+1) x n]
@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.sparse import issparse
 
 from sao.scaling_strategies import Scaling
 
@@ -52,9 +53,11 @@ class InitialResponseScaling(InitialObjectiveScaling):
         self.factor[0] = self.scale_to[0] / f[0]
 
         # Scale constraints wrt the norm of their sensitivities
-        for j in range(1, len(f)):
-            constr_norm = np.linalg.norm(df[j, :])
-            if constr_norm == 0:
-                raise ZeroDivisionError(f'Cannot use {self.__class__.__name__} class when ||dg_j/dx|| = 0')
-            self.factor[j] = self.scale_to[j] / constr_norm
+        if issparse(df):
+            constr_norm = np.sqrt(np.asarray(df[1:].multiply(df[1:]).sum(axis=1))).ravel()
+        else:
+            constr_norm = np.linalg.norm(df[1:], axis=1)
+        if np.any(constr_norm == 0):
+            raise ZeroDivisionError(f'Cannot use {self.__class__.__name__} class when ||dg_j/dx|| = 0')
+        self.factor[1:] = self.scale_to[1:] / constr_norm
         return self
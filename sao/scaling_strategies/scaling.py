@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 import numpy as np
+from scipy.sparse import diags, issparse
 
 
 class Scaling(ABC):
@@ -23,9 +24,12 @@ class Scaling(ABC):
     def scale(self, f=None, df=None, **kwargs):
         """ This method scales the response vector ``f`` and the sensitivity matrix ``df``
         according to the `update_factor` method when ``update_condition`` is met.
+        A sparse ``df`` is scaled by its rows and stays sparse.
         """
         if self.update_condition(f, df):
             self.update_factor(f, df)
+        if issparse(df):
+            return self.factor * f, (diags(self.factor) @ df).tocsr()
         return self.factor * f, (df.T * self.factor).T
 
 
@@ -1,9 +1,18 @@
-from sao.solvers.pdip_svanberg import ipsolver
-from sao.solvers.wrappers.cvxopt import cvxopt_solver
-from sao.solvers.wrappers.mma import mma
-from sao.solvers.optimality_criteria import oc, oc1999
-from sao.solvers.primal_dual_interior_point import pdip, Pdipx, Pdipxy, Pdipxyz
-from sao.solvers.wrappers.scipy import scipy_solver
+from sao.util.tools import lazy_attributes
 
 __all__ = ['ipsolver', 'cvxopt_solver', 'mma', 'oc', 'oc1999',
            'pdip', 'Pdipx', 'Pdipxy', 'Pdipxyz', 'scipy_solver']
+
+# The solvers are imported on first access, as they depend on (optional) backends
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'ipsolver': 'sao.solvers.pdip_svanberg',
+    'cvxopt_solver': 'sao.solvers.wrappers.cvxopt',
+    'mma': 'sao.solvers.wrappers.mma',
+    'oc': 'sao.solvers.optimality_criteria',
+    'oc1999': 'sao.solvers.optimality_criteria',
+    'pdip': 'sao.solvers.primal_dual_interior_point',
+    'Pdipx': 'sao.solvers.primal_dual_interior_point',
+    'Pdipxy': 'sao.solvers.primal_dual_interior_point',
+    'Pdipxyz': 'sao.solvers.primal_dual_interior_point',
+    'scipy_solver': 'sao.solvers.wrappers.scipy',
+})
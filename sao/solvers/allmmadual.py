@@ -1,7 +1,9 @@
 #
 import numpy as np
 from scipy.optimize import minimize
+from sao.util.profiling import profiled
 #
+@profiled('solver.allmmadual')
 def allmmadual(problem, funcs):
 #
     n = problem.n
@@ -2,6 +2,7 @@ import numpy as np
 from scipy.optimize import minimize
 from sao.approximations.taylor import Taylor1
 from sao.intervening_variables import ConLin
+from sao.util.tools import require_dense
 
 def sub_con(prob, x, y):
     """
@@ -16,7 +17,7 @@ def sub_con(prob, x, y):
         assert isinstance(y_of_x, ConLin)
 
     g = prob.g(x)
-    dg = prob.dg(x)
+    dg = require_dense(prob.dg(x), 'sub_con')
 
     sol=minimize(con_dual,y,
                  args=(prob.n,prob.m,x,g,dg,prob.x_min,prob.x_max),
@@ -3,6 +3,7 @@ from scipy.optimize import minimize
 from sao.approximations.taylor import Taylor1
 from sao.intervening_variables import MixedIntervening
 from sao.intervening_variables.mma import MMAp
+from sao.util.tools import require_dense
 
 
 def sub_mma(prob, x, y):
@@ -28,7 +29,7 @@ def sub_mma(prob, x, y):
         U = prob.approx.interv[0].upp
 
     g = prob.g(x)
-    dg = prob.dg(x)
+    dg = require_dense(prob.dg(x), 'sub_mma')
 
     r = np.zeros((prob.m+1),dtype=np.float64)
     p = np.zeros((prob.m+1,prob.n),dtype=np.float64)
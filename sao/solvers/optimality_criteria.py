@@ -1,23 +1,44 @@
 import numpy as np
 
 from sao.convergence_criteria import VariableChange
+from sao.problems import CachedProblem
+from sao.util.profiling import profiled
 
 """
 OC wrapper.
 """
 
 
-def oc(problem, x0=None, target=None, move=0.2, tol=1e-3, stop_tol=1e-6):
+@profiled('solver.oc')
+def oc(problem, x0=None, target=None, move=0.2, tol=1e-3, stop_tol=1e-6, callback=None, verbose=True,
+       responses=False):
+    """
+    Optimizes ``problem`` with optimality criteria updates until the variable change is below ``stop_tol``.
+
+    The responses and sensitivities of every design follow from a single
+    analysis, ``problem.evaluate``, of which the sensitivities are passed
+    on to ``oc1999``.
+
+    :param callback: Called as ``callback(iteration, x, f)`` with the responses ``f`` at the
+        design ``x`` of every iteration, the optimization stops at ``x`` when it returns True
+    :param verbose: Print the objective and design of every iteration
+    :param responses: Return all responses of the final design instead of its objective
+    :return: The final design and its objective (or responses)
+    """
+    problem = CachedProblem(problem, maxsize=1)
     x = problem.x0 if x0 is None else x0
     converged = VariableChange(x, tolerance=stop_tol)
     counter = 0
     while not converged:
         counter += 1
-        f = problem.g(x)
-        print(counter, ":  ", f[0], x)
-        x[:] = oc1999(problem, x0=x, target=target, move=move, tol=tol)
+        f, df = problem.evaluate(x)
+        if verbose:
+            print(counter, ":  ", f[0], x)
+        if callback is not None and callback(counter, x, f):
+            break
+        x[:] = oc1999(problem, x0=x, target=target, move=move, tol=tol, dg=df)
     f = problem.g(x)
-    return x, f[0]
+    return x, f if responses else f[0]
 
 
 """
@@ -37,10 +58,12 @@ In that case the update ensures the material usage stays constant
 """
 
 
-def oc1999(problem, x0=None, target=None, move=0.2, tol=1e-3, lower=0, upper=1e9):
-    x_new = problem.x0 if x0 is None else x0
+@profiled('solver.oc1999')
+def oc1999(problem, x0=None, target=None, move=0.2, tol=1e-3, lower=0, upper=1e9, dg=None):
+    x0 = problem.x0 if x0 is None else x0
+    x_new = x0.copy()
     target = np.sum(x_new) if target is None else target  # target material usage
-    dg = problem.dg(x0)  # get sensitivities from (sub)problem
+    dg = problem.dg(x0) if dg is None else dg  # get sensitivities from (sub)problem, unless given
     while (upper - lower) / (lower + upper) > tol:  # loop until Lagrange multiplier is found (within tolerance)
         middle = (lower + upper) / 2
         x_new[:] = x0 * np.sqrt(-dg[0] / dg[1] / middle)  # set step in direction of objective sensitivities
@@ -2,7 +2,9 @@
 import osqp as qp
 import numpy as np
 from scipy import sparse
+from sao.util.profiling import profiled
 #
+@profiled('solver.osqp')
 def osqp(problem):
 #
     n = problem.n
@@ -1,7 +1,11 @@
 import numpy as np
 
+from sao.util.profiling import profiled
+from sao.util.tools import require_dense
+
 
 # Svanberg's InteriorPoint solver found in http://www.ingveh.ulg.ac.be/uploads/education/meca-0027-1/MMA_DCAMM_1998.pdf
+@profiled('solver.ipsolver')
 def ipsolver(problem, x0=None, epsimin=1e-6, max_inner_iter=20, max_lines_iter=20, max_outer_iter=100,
              epsifac=0.9, epsired=0.1, cCoef=1000):
     """
@@ -171,7 +175,7 @@ def ipsolver(problem, x0=None, epsimin=1e-6, max_inner_iter=20, max_lines_iter=2
 def residual(x, y, z, lam, xsi, eta, mu, zet, s, epsi, a0, a, c, d, problem):
     # Calculating g_j_tilde_value, dg_j_tilde_value and dpsi_dx
     g_j_tilde_value = problem.g(x)
-    dg_j_tilde_value = problem.dg(x)
+    dg_j_tilde_value = require_dense(problem.dg(x), 'ipsolver')
     dpsi_dx = (dg_j_tilde_value[0, :] + np.dot(lam.T, dg_j_tilde_value[1:, :]))
 
     # Calculation of other residuals
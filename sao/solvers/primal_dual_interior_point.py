@@ -1,9 +1,11 @@
 from abc import ABC
 from copy import deepcopy
 from dataclasses import dataclass, fields
-from numba import njit
 import numpy as np
-from scipy.sparse import diags
+from scipy.sparse import csc_matrix, diags, issparse
+from scipy.sparse.linalg import spsolve
+
+from sao.util.profiling import profiled
 
 
 @dataclass
@@ -63,6 +65,28 @@ class StateZ(StateY):
     zeta: np.array
 
 
+def split(dg):
+    """Objective row, as an array, and the constraint rows of a dense or sparse matrix of (second) derivatives."""
+    if issparse(dg):
+        dg = dg.tocsr()
+        return dg[0].toarray().ravel(), dg[1:]
+    return dg[0], dg[1:]
+
+
+def schur(J, d):
+    """Returns ``J diag(d) J^T``, sparse for a sparse ``J``."""
+    if issparse(J):
+        return J @ diags(d) @ J.T
+    return np.einsum("ki,i,ji->kj", J, d, J)
+
+
+def solve(A, B):
+    """Solves the dense or sparse Newton system ``A x = B``."""
+    if issparse(A):
+        return spsolve(csc_matrix(A), B)
+    return np.linalg.solve(A, B)
+
+
 class Pdip(ABC):
     def __init__(self, problem, **kwargs):
         self.problem = problem
@@ -73,11 +97,12 @@ class Pdip(ABC):
     wold: State = NotImplemented
 
     def get_point(self):
+        """Distances to the bounds, responses, and the split (second) derivatives at the current point."""
         return self.w.x - self.problem.x_min, \
                self.problem.x_max - self.w.x, \
                self.problem.g(self.w.x), \
-               self.problem.dg(self.w.x), \
-               self.problem.ddg(self.w.x)
+               split(self.problem.dg(self.w.x)), \
+               split(self.problem.ddg(self.w.x))
 
     def residual(self, epsi):
         ...
@@ -117,8 +142,8 @@ class Pdipx(Pdip):
         r(lam)      = gi[x] - ri + si
         r(s)        = lam * si - e
         """
-        dg = self.problem.dg(self.w.x)
-        self.r.x = dg[0] + self.w.lam.dot(dg[1:]) - self.w.xsi + self.w.eta
+        dg0, J = split(self.problem.dg(self.w.x))
+        self.r.x = dg0 + J.T @ self.w.lam - self.w.xsi + self.w.eta
         self.r.xsi = self.w.xsi * (self.w.x - self.problem.x_min) - epsi
         self.r.eta = self.w.eta * (self.problem.x_max - self.w.x) - epsi
         self.r.lam = self.problem.g(self.w.x)[1:] + self.w.s
@@ -126,32 +151,32 @@ class Pdipx(Pdip):
         return self.r.norm(), self.r.max()
 
     def get_newton_direction(self, epsi):
-        a, b, g, dg, ddg = self.get_point()
+        a, b, g, (dg0, J), (ddg0, ddJ) = self.get_point()
 
         # delta_lambda
         delta_lambda = g[1:] + epsi / self.w.lam
-        delta_x = dg[0] + self.w.lam.dot(dg[1:]) - epsi / a + epsi / b
+        delta_x = dg0 + J.T @ self.w.lam - epsi / a + epsi / b
 
         diag_lambda = self.w.s / self.w.lam  # s./lam
-        diag_x = ddg[0] + self.w.lam.dot(ddg[1:]) + self.w.xsi / a + self.w.eta / b
+        diag_x = ddg0 + ddJ.T @ self.w.lam + self.w.xsi / a + self.w.eta / b
 
         if self.problem.m > self.problem.n:
             dldl = delta_lambda / diag_lambda
-            B = -delta_x - dldl.dot(dg[1:])
-            A = diags(diag_x) + dg[1:].transpose().dot(diags(1 / diag_lambda) * dg[1:])
+            B = -delta_x - J.T @ dldl
+            A = diags(diag_x) + J.transpose().dot(diags(1 / diag_lambda) * J)
 
             # solve for dx
-            self.dw.x[:] = np.linalg.solve(A, B)  # n x n
-            self.dw.lam[:] = dg[1:].dot(self.dw.x) / diag_lambda + dldl  # calculate dlam[dx]
+            self.dw.x[:] = solve(A, B)  # n x n
+            self.dw.lam[:] = J.dot(self.dw.x) / diag_lambda + dldl  # calculate dlam[dx]
 
         else:
             dxdx = delta_x / diag_x
-            B = delta_lambda - dxdx.dot(dg[1:].transpose())
-            A = diags(diag_lambda) + np.einsum("ki,i,ji->kj", dg[1:], 1 / diag_x, dg[1:])
+            B = delta_lambda - J @ dxdx
+            A = diags(diag_lambda) + schur(J, 1 / diag_x)
 
             # solve for dlam
-            self.dw.lam = np.linalg.solve(A, B)  # m x m
-            self.dw.x = -dxdx - (self.dw.lam.dot(dg[1:])) / diag_x
+            self.dw.lam = solve(A, B)  # m x m
+            self.dw.x = -dxdx - (J.T @ self.dw.lam) / diag_x
 
         # get dxsi[dx], deta[dx] and ds[dlam]
         self.dw.xsi = -self.w.xsi + epsi / a - (self.w.xsi * self.dw.x) / a
@@ -198,27 +223,27 @@ class Pdipxy(Pdipx):
         return super().residual(epsi)
 
     def get_newton_direction(self, epsi):
-        a, b, g, dg, ddg = self.get_point()
+        a, b, g, (dg0, J), (ddg0, ddJ) = self.get_point()
 
         # delta_lambda
         delta_lambda = g[1:] - self.w.y + epsi / self.w.lam
-        delta_x = dg[0] + self.w.lam.dot(dg[1:]) - epsi / a + epsi / b
+        delta_x = dg0 + J.T @ self.w.lam - epsi / a + epsi / b
         delta_y = self.c - self.w.lam - epsi / self.w.y
 
         diag_lambda = self.w.s / self.w.lam  # s./lam
-        diag_x = ddg[0] + self.w.lam.dot(ddg[1:]) + self.w.xsi / a + self.w.eta / b
+        diag_x = ddg0 + ddJ.T @ self.w.lam + self.w.xsi / a + self.w.eta / b
         diag_y = self.w.mu / self.w.y
 
         diag_lambday = diag_lambda + 1 / diag_y
         delta_lambday = delta_lambda + delta_y / diag_y
 
         dxdx = delta_x / diag_x
-        Blam = delta_lambday - dxdx.dot(dg[1:].transpose())
-        Alam = diags(diag_lambday) + np.einsum("ki,i,ji->kj", dg[1:], 1 / diag_x, dg[1:])  # calculate dx[lam]
+        Blam = delta_lambday - J @ dxdx
+        Alam = diags(diag_lambday) + schur(J, 1 / diag_x)  # calculate dx[lam]
 
         # solve for dlam
-        self.dw.lam[:] = np.linalg.solve(Alam, Blam)
-        self.dw.x = -dxdx - (self.dw.lam.dot(dg[1:])) / diag_x
+        self.dw.lam[:] = solve(Alam, Blam)
+        self.dw.x = -dxdx - (J.T @ self.dw.lam) / diag_x
 
         # get dxsi[dx], deta[dx] and ds[dlam]
         self.dw.xsi = -self.w.xsi + epsi / a - (self.w.xsi * self.dw.x) / a
@@ -272,16 +297,16 @@ class Pdipxyz(Pdipxy):
         return super().residual(epsi)
 
     def get_newton_direction(self, epsi):
-        a, b, g, dg, ddg = self.get_point()
+        a, b, g, (dg0, J), (ddg0, ddJ) = self.get_point()
 
         # delta_lambda
         delta_lambda = g[1:] - self.w.y + epsi / self.w.lam - self.a * self.w.z
-        delta_x = dg[0] + self.w.lam.dot(dg[1:]) - epsi / a + epsi / b
+        delta_x = dg0 + J.T @ self.w.lam - epsi / a + epsi / b
         delta_y = self.c - self.w.lam - epsi / self.w.y
         delta_z = self.a0 - np.dot(self.w.lam, self.a) - epsi / self.w.z
 
         diag_lambda = self.w.s / self.w.lam  # s./lam
-        diag_x = ddg[0] + self.w.lam.dot(ddg[1:]) + self.w.xsi / a + self.w.eta / b
+        diag_x = ddg0 + ddJ.T @ self.w.lam + self.w.xsi / a + self.w.eta / b
         diag_y = self.w.mu / self.w.y
 
         diag_lambday = diag_lambda + 1 / diag_y
@@ -289,12 +314,14 @@ class Pdipxyz(Pdipxy):
 
         dxdx = delta_x / diag_x
         zzeta = self.w.z / self.w.zeta
-        Blam = delta_lambday - dxdx.dot(dg[1:].transpose()) + zzeta * self.a * delta_z
-        Alam = diags(diag_lambday) + np.einsum("ki,i,ji->kj", dg[1:], 1 / diag_x, dg[1:]) + zzeta * self.a * self.a.T
+        Blam = delta_lambday - J @ dxdx + zzeta * self.a * delta_z
+        Alam = diags(diag_lambday) + schur(J, 1 / diag_x)
+        if np.any(self.a):
+            Alam = Alam + zzeta * self.a * self.a.T
 
         # solve for dlam
-        self.dw.lam[:] = np.linalg.solve(Alam, Blam)
-        self.dw.x = -dxdx - (self.dw.lam.dot(dg[1:])) / diag_x
+        self.dw.lam[:] = solve(Alam, Blam)
+        self.dw.x = -dxdx - (J.T @ self.dw.lam) / diag_x
         self.dw.z = zzeta * (np.dot(self.a, self.dw.lam) - delta_z)
 
         # get dxsi[dx], deta[dx] and ds[dlam]
@@ -306,6 +333,7 @@ class Pdipxyz(Pdipxy):
         self.dw.zeta = -1 / zzeta * self.dw.z - self.w.zeta + epsi / self.w.z
 
 
+@profiled('solver.pdip')
 def pdip(problem, x0=None, variables=Pdipxyz, epsimin=1e-9, max_outer_iter=100,
          max_lines_iter=20, max_inner_iter=20, epsifac=0.9, epsired=0.1):
     if x0 is None:
@@ -1,7 +1,9 @@
 #
 import numpy as np
 from scipy.optimize import minimize
+from sao.util.profiling import profiled
 #
+@profiled('solver.t2dual')
 def t2dual(problem):
 #
     n = problem.n
@@ -1,5 +1,13 @@
-from sao.solvers.wrappers.cvxopt import cvxopt_solver
-from sao.solvers.wrappers.scipy import scipy_solver
+from sao.util.tools import lazy_attributes
+
+# The functions are bound eagerly, as importing their submodules of the same name would shadow them
 from sao.solvers.wrappers.mma import mma
+from sao.solvers.wrappers.multistart import MultiStartResult, multistart
+
+__all__ = ['cvxopt_solver', 'scipy_solver', 'mma', 'multistart', 'MultiStartResult']
 
-__all__ = ['cvxopt_solver', 'scipy_solver', 'mma']
+# The other wrappers are imported on first access, as they depend on (optional) backends
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'cvxopt_solver': 'sao.solvers.wrappers.cvxopt',
+    'scipy_solver': 'sao.solvers.wrappers.scipy',
+})
@@ -1,8 +1,12 @@
 import numpy as np
 
+from sao.util.profiling import profiled
+from sao.util.tools import require_dense
+
 try:
     from cvxopt import solvers, matrix, spdiag
 
+    @profiled('solver.cvxopt_solver')
     def cvxopt_solver(problem, **kwargs):
         """
         This is a wrapper function that uses the ``cvxopt`` solver library found in the following link:
@@ -37,11 +41,12 @@ try:
             if x is None:
                 x0 = matrix(0.5 * (problem.x_min + problem.x_max), (problem.n, 1))
                 return problem.m, x0
-            f = matrix(problem.g(np.array(x).flatten()), (problem.m + 1, 1))
-            Df = matrix(problem.dg(np.array(x).flatten()), (problem.m + 1, problem.n))
+            responses = problem.evaluate(np.array(x).flatten(), order=1 if z is None else 2)
+            f = matrix(responses[0], (problem.m + 1, 1))
+            Df = matrix(require_dense(responses[1], 'cvxopt_solver'), (problem.m + 1, problem.n))
             if z is None:
                 return f, Df
-            DiagonalHessian = matrix(problem.ddg(np.array(x).flatten()))
+            DiagonalHessian = matrix(responses[2])
             H = spdiag(DiagonalHessian.T * z)
             return f, Df, H
 
@@ -2,11 +2,24 @@ from sao.approximations import Taylor1
 from sao.convergence_criteria.change import VariableChange
 from sao.intervening_variables.mma import MMA02 as MMA
 from sao.move_limits import Bounds, MoveLimit, AdaptiveMoveLimit
-from sao.problems import Subproblem
+from sao.problems import CachedProblem, Subproblem
 from sao.solvers.primal_dual_interior_point import pdip
+from sao.util.profiling import profiled
 
 
-def mma(problem, x0=None, move=0.2, xmin=0.0, xmax=1.0, stop_tol=1e-6):
+@profiled('solver.mma')
+def mma(problem, x0=None, move=0.2, xmin=0.0, xmax=1.0, stop_tol=1e-6, callback=None, verbose=True,
+        responses=False):
+    """
+    Optimizes ``problem`` with MMA until the variable change is below ``stop_tol``.
+
+    :param callback: Called as ``callback(iteration, x, f)`` with the responses ``f`` at the
+        design ``x`` of every iteration, the optimization stops at ``x`` when it returns True
+    :param verbose: Print the objective and design of every iteration
+    :param responses: Return all responses of the final design instead of its objective
+    :return: The final design and its objective (or responses)
+    """
+    problem = CachedProblem(problem, maxsize=1)
     int_variable = MMA(x_min=xmin, x_max=xmax)
     approx = Taylor1(int_variable)
     lim1 = Bounds(problem.x_min, problem.x_max)
@@ -21,10 +34,12 @@ def mma(problem, x0=None, move=0.2, xmin=0.0, xmax=1.0, stop_tol=1e-6):
     iter = 0
     while not converged:
         iter += 1
-        f = problem.g(x)
-        df = problem.dg(x)
-        print(iter, ":  ", f[0], x)
+        f, df = problem.evaluate(x)
+        if verbose:
+            print(iter, ":  ", f[0], x)
+        if callback is not None and callback(iter, x, f):
+            break
         sub_problem.build(x, f, df)
         x[:] = pdip(sub_problem)[0]
     f = problem.g(x)
-    return x, f[0]
+    return x, f if responses else f[0]
@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Value
+
+import numpy as np
+
+from sao.problems.problem import Problem
+from sao.solvers.wrappers.mma import mma
+
+# State of the worker processes of ``multistart``, set once per process
+_worker = {}
+
+
+def _initialize(problem, optimizer, kwargs, best, settings):
+    _worker.update(problem=problem() if not isinstance(problem, Problem) else problem, optimizer=optimizer,
+                   kwargs=kwargs, best=best, **settings)
+
+
+class Run:
+    """Result of one start of ``multistart``."""
+
+    def __init__(self, index, x0, x, g, iterations, cancelled, time, feasibility_tol=1e-6):
+        self.index, self.x0, self.x, self.g = index, x0, x, g
+        self.iterations, self.cancelled, self.time = iterations, cancelled, time
+        self.feasible = bool(np.all(g[1:] <= feasibility_tol))
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}( {self.index}: f: {self.objective:.6g}, feasible: {self.feasible}, '
+                f'iterations: {self.iterations}{", cancelled" if self.cancelled else ""} )')
+
+    @property
+    def objective(self):
+        return float(self.g[0])
+
+
+def _run(index, x0):
+    """Runs the optimizer of this worker from ``x0``, stopping it when dominated by the best run so far."""
+    problem, best = _worker['problem'], _worker['best']
+    patience, tolerance, max_iter = _worker['patience'], _worker['tolerance'], _worker['max_iter']
+    state = {'iterations': 0, 'cancelled': False}
+
+    def callback(iteration, x, f):
+        state['iterations'] = iteration
+        if max_iter is not None and iteration > max_iter:
+            return True
+        if best is not None and iteration > patience and f[0] > best.value + tolerance * abs(best.value):
+            state['cancelled'] = True
+        return state['cancelled']
+
+    start = time.perf_counter()
+    x, g = _worker['optimizer'](problem, x0=x0.copy(), callback=callback, responses=True, **_worker['kwargs'])
+    run = Run(index, x0, np.array(x), np.array(g, dtype=float), state['iterations'],
+              state['cancelled'], time.perf_counter() - start, _worker['feasibility_tol'])
+
+    if best is not None and run.feasible and not run.cancelled:
+        with best.get_lock():
+            best.value = min(best.value, run.objective)
+    return run
+
+
+class MultiStartResult:
+    """
+    Runs of a ``multistart``, the feasible runs in order of increasing objective followed by the infeasible ones.
+    """
+
+    def __init__(self, runs, time=0.0, processes=1):
+        self.runs = sorted(runs, key=lambda r: (not r.feasible, r.objective))
+        self.time, self.processes = time, processes
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}( runs: {len(self.runs)}, feasible: {len(self.feasible)}, '
+                f'cancelled: {sum(r.cancelled for r in self.runs)}, best: {self.best} )')
+
+    @property
+    def best(self):
+        """The best feasible run, or the best run when none is feasible."""
+        return self.runs[0] if self.runs else None
+
+    @property
+    def feasible(self):
+        return [run for run in self.runs if run.feasible]
+
+    def optima(self, tol=1e-6):
+        """The distinct designs of the feasible, completed runs, with the number of runs that found them."""
+        optima = []
+        for run in self.runs:
+            if not run.feasible or run.cancelled:
+                continue
+            for optimum in optima:
+                if np.allclose(run.x, optimum[0].x, atol=tol, rtol=0):
+                    optimum[1] += 1
+                    break
+            else:
+                optima.append([run, 1])
+        return [tuple(optimum) for optimum in optima]
+
+
+def multistart(problem, starts, optimizer=mma, processes=None, patience=10, tolerance=0.1, max_iter=None, seed=0,
+               feasibility_tol=1e-6, **kwargs):
+    """
+    Runs independent optimizations of ``problem`` from multiple starting points in a pool of processes.
+
+    Every worker process holds one instance of the problem, which is created
+    by the worker itself when ``problem`` is a class or factory function
+    (e.g. a ``functools.partial`` of a problem class), or is a copy of the given
+    problem instance. The starts are distributed over the workers one at a
+    time. The best feasible objective found so far is shared between the
+    workers: a run of which the objective is still more than ``tolerance``
+    (relative) above it after ``patience`` iterations is dominated and is
+    cancelled.
+
+    :param problem: A ``Problem``, or a callable without arguments that returns one
+    :param starts: The number of starting points, drawn uniformly within the bounds, or an array [k, n]
+    :param optimizer: A wrapper such as ``mma`` or ``oc``, called as ``optimizer(problem, x0=x0,
+        callback=callback, responses=True, **kwargs)``, that returns the final design and its responses
+    :param processes: Number of worker processes, by default the number of CPUs; with 1 the runs are
+        performed in this process
+    :param patience: Number of iterations before a run can be cancelled, None to never cancel runs
+    :param max_iter: Maximum number of iterations per run
+    :param kwargs: Passed to the optimizer, by default with ``verbose=False``
+    :return: ``MultiStartResult`` of all runs
+    """
+    start = time.perf_counter()
+    if np.ndim(starts) == 0:
+        instance = problem if isinstance(problem, Problem) else problem()
+        rng = np.random.default_rng(seed)
+        starts = instance.x_min + rng.random((starts, instance.n)) * (instance.x_max - instance.x_min)
+    starts = np.atleast_2d(np.asarray(starts, dtype=float))
+    kwargs.setdefault('verbose', False)
+
+    processes = os.cpu_count() if processes is None else processes
+    processes = max(1, min(processes, len(starts)))
+    best = None if patience is None else Value('d', np.inf)
+    settings = {'patience': patience, 'tolerance': tolerance, 'max_iter': max_iter,
+                'feasibility_tol': feasibility_tol}
+    initargs = (problem, optimizer, kwargs, best, settings)
+
+    if processes == 1:
+        _initialize(*initargs)
+        try:
+            runs = [_run(i, x0) for i, x0 in enumerate(starts)]
+        finally:
+            _worker.clear()
+    else:
+        with ProcessPoolExecutor(processes, initializer=_initialize, initargs=initargs) as pool:
+            runs = list(pool.map(_run, range(len(starts)), starts))
+    return MultiStartResult(runs, time.perf_counter() - start, processes)
@@ -1,5 +1,8 @@
 from scipy import optimize
 
+from sao.util.profiling import profiled
+from sao.util.tools import require_dense
+
 """
 This is a wrapper class to use the SCIPY optimization library found in the following link:
 https://docs.scipy.org/doc/scipy/tutorial/optimize.html#constrained-minimization-of-multivariate-scalar-functions-minimize.
@@ -7,6 +10,7 @@ Requires an installation of ``scipy``.
 """
 
 
+@profiled('solver.scipy_solver')
 def scipy_solver(problem, **kwargs):
     """
         This function solves a given problem P:
@@ -30,10 +34,11 @@ def scipy_solver(problem, **kwargs):
 
     x0 = kwargs.get('x0', 0.5 * (problem.x_min + problem.x_max))
     bounds = optimize.Bounds(problem.x_min, problem.x_max)
+    jacobian = lambda x: require_dense(problem.dg(x), 'scipy_solver')
     objective = lambda x: problem.g(x)[0]
-    objective_der = lambda x: problem.dg(x)[0]
+    objective_der = lambda x: jacobian(x)[0]
     constraints = lambda x: -problem.g(x)[1:]
-    constraints_der = lambda x: -problem.dg(x)[1:]
+    constraints_der = lambda x: -jacobian(x)[1:]
     # TODO: Possibly add diagonal Hessian that we currently have (they use a full Hessian with different dimensions)
 
     ineq_cons = {'type': 'ineq',
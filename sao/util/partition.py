@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+
+
+class Partition:
+    """
+    Contiguous partition of a distributed vector, rank ``r`` owns the entries ``ranges[r]:ranges[r + 1]``.
+
+    :param ranges: The offsets of the ranks, starting at 0 and ending at the vector size
+    """
+
+    def __init__(self, ranges):
+        self.ranges = np.asarray(ranges, dtype=np.int64)
+        if self.ranges[0] != 0 or np.any(np.diff(self.ranges) < 0):
+            raise ValueError("The ranges must start at 0 and be non-decreasing.")
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}( n: {self.n}, size: {self.size} )'
+
+    def __eq__(self, other):
+        return isinstance(other, Partition) and np.array_equal(self.ranges, other.ranges)
+
+    @classmethod
+    def even(cls, n, size):
+        """Splits ``n`` entries over ``size`` ranks as evenly as possible, as PETSc does by default."""
+        counts = np.full(size, n // size)
+        counts[:n % size] += 1
+        return cls(np.concatenate(([0], np.cumsum(counts))))
+
+    @property
+    def n(self):
+        return int(self.ranges[-1])
+
+    @property
+    def size(self):
+        return len(self.ranges) - 1
+
+    def slice(self, rank):
+        return slice(int(self.ranges[rank]), int(self.ranges[rank + 1]))
+
+    def owner(self, index):
+        """Ranks owning the entries ``index``."""
+        return np.searchsorted(self.ranges, index, side='right') - 1
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump({'ranges': self.ranges.tolist()}, file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls(json.load(file)['ranges'])
+
@@ -0,0 +1,162 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    """Times a block of code and records it with the profiler as a complete event."""
+
+    __slots__ = ('profiler', 'name', 'args', 'start')
+
+    def __init__(self, profiler, name, args):
+        self.profiler, self.name, self.args = profiler, name, args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler.record(self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class Profiler:
+    """
+    Collects timed spans and counters of an optimization.
+
+    Spans are opened with ``span(name, **args)`` as context manager, which
+    records the name, start, duration and thread of the block. Counters are
+    incremented with ``count(name, value)``. When the profiler is disabled,
+    ``span`` returns a shared null context and ``count`` returns directly,
+    such that instrumented code costs no more than an attribute lookup.
+
+    The events can be exported as JSON lines (``export_jsonl``) or in the
+    Chrome trace format (``export_chrome``), which is read by e.g.
+    chrome://tracing and Perfetto. ``summary`` returns the number of calls
+    and total time per span name.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self.counters = defaultdict(float)
+        self.origin = time.perf_counter_ns()
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def reset(self):
+        self.events.clear()
+        self.counters.clear()
+        self.origin = time.perf_counter_ns()
+        return self
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] += value
+
+    def record(self, name, start, duration, args=None):
+        self.events.append((name, start - self.origin, duration, threading.get_ident(), args or {}))
+
+    def summary(self, exclusive=False):
+        """
+        Number of calls and total time [s] per span name, in order of decreasing time.
+
+        With ``exclusive`` the time of the spans nested in a span (on the same
+        thread) is subtracted from it, such that the times add up to the
+        total time of the outermost spans.
+        """
+        durations = [duration for _, _, duration, _, _ in self.events]
+        if exclusive:
+            stacks = defaultdict(list)
+            order = sorted(range(len(self.events)), key=lambda i: (self.events[i][1], -self.events[i][2]))
+            for i in order:
+                _, start, duration, thread, _ = self.events[i]
+                stack = stacks[thread]
+                while stack and self.events[stack[-1]][1] + self.events[stack[-1]][2] <= start:
+                    stack.pop()
+                if stack:
+                    durations[stack[-1]] -= duration
+                stack.append(i)
+
+        totals = defaultdict(lambda: [0, 0.0])
+        for (name, _, _, _, _), duration in zip(self.events, durations):
+            totals[name][0] += 1
+            totals[name][1] += duration * 1e-9
+        return dict(sorted(((name, tuple(v)) for name, v in totals.items()), key=lambda item: -item[1][1]))
+
+    def export_jsonl(self, path):
+        """Writes one JSON object per span (times in seconds), followed by the counters."""
+        with open(path, 'w') as file:
+            for name, start, duration, thread, args in self.events:
+                file.write(json.dumps({'name': name, 'start': start * 1e-9, 'duration': duration * 1e-9,
+                                       'thread': thread, 'args': args}) + '\n')
+            for name, value in self.counters.items():
+                file.write(json.dumps({'counter': name, 'value': value}) + '\n')
+
+    def export_chrome(self, path):
+        """Writes the spans and counters in the Chrome trace event format (times in microseconds)."""
+        pid = os.getpid()
+        end = max((start + duration for _, start, duration, _, _ in self.events), default=0)
+        events = [{'name': name, 'ph': 'X', 'ts': start * 1e-3, 'dur': duration * 1e-3, 'pid': pid, 'tid': thread,
+                   'args': args} for name, start, duration, thread, args in self.events]
+        events += [{'name': name, 'ph': 'C', 'ts': end * 1e-3, 'pid': pid, 'args': {name: value}}
+                   for name, value in self.counters.items()]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+profiler = Profiler()
+
+
+def span(name, **args):
+    """Span of the global profiler."""
+    if not profiler.enabled:
+        return NULL_SPAN
+    return Span(profiler, name, args)
+
+
+def count(name, value=1):
+    """Increments a counter of the global profiler."""
+    if profiler.enabled:
+        profiler.counters[name] += value
+
+
+def profiled(name):
+    """Decorator that records every call of a function as a span of the global profiler."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with Span(profiler, name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
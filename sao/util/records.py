@@ -1,34 +1,206 @@
-#
-class Records():
-#
-    def __init__(self,heads):
-        self.dim=len(heads)
-        self.heads=heads
-        self.data=[[None]*self.dim]
-#
-    def popcol(self,head,data):
-#
-        index=0
-        for h in self.heads:
-            if head == h:
-                if self.data[-1][index] == None:
-                    self.data[-1][index]=data
-                else:
-                    self.data.append([None]*self.dim)
-                    self.data[-1][index]=data
-            index=index+1
-#
-    def getcol(self,head):
-        col=[]
-        index=0
-        for h in self.heads:
-            if head == h:
-                col_ind=index
-            index=index+1
-#
-        for d in self.data:
-            col.append(d[col_ind])
-        return col
-#
-    def getrow(self,date):
-        return self.data[date]
+import os
+import zipfile
+
+import numpy as np
+
+
+class Records:
+    """
+    History of an optimization, stored in preallocated, typed columns.
+
+    Values are added per column with ``popcol``: a value fills the last row,
+    or starts a new row when the last row of that column is filled already.
+    The columns are NumPy arrays that grow by doubling; missing values are
+    NaN (for float columns). Optionally, vectors such as the design or the
+    multipliers are stored with ``snapshot`` every ``stride`` calls.
+
+    With a ``path`` the completed rows are appended to an ``.npz`` file in
+    chunks of ``chunk`` rows, and removed from memory, such that long runs
+    keep only the last chunk in memory. ``Records.load`` reads such a file
+    back, ``save`` exports the complete history to one.
+
+    :param heads: The column names, or a dict of names and dtypes
+    :param snapshots: The names of the snapshot vectors, or a dict of names and sizes
+    :param stride: Store one snapshot every ``stride`` calls of ``snapshot``
+    :param path: Stream the history to this ``.npz`` file
+    :param chunk: Number of rows per chunk of the file
+    """
+
+    def __init__(self, heads, snapshots=None, stride=1, path=None, chunk=1000, capacity=64):
+        if not isinstance(heads, dict):
+            heads = dict.fromkeys(heads, float)
+        self.heads = list(heads)
+        self.dim = len(self.heads)
+        self.dtypes = {head: np.dtype(dtype) for head, dtype in heads.items()}
+        self.columns = {head: self.empty(head, capacity) for head in self.heads}
+        self.last = dict.fromkeys(self.heads, -1)
+        self.rows, self.offset = 1, 0
+
+        snapshots = {} if snapshots is None else snapshots
+        self.sizes = dict(snapshots) if isinstance(snapshots, dict) else dict.fromkeys(snapshots)
+        self.snapshots = {name: None if size is None else np.full((capacity, size), np.nan)
+                          for name, size in self.sizes.items()}
+        self.snapshot_rows = np.empty(capacity, dtype=np.int64)
+        self.count, self.calls, self.stride = 0, 0, stride
+
+        self.path, self.chunk, self.chunks = path, chunk, 0
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def __len__(self):
+        return self.offset + self.rows
+
+    def empty(self, head, size):
+        dtype = self.dtypes[head]
+        fill = np.nan if np.issubdtype(dtype, np.inexact) else 0
+        return np.full(size, fill, dtype=dtype)
+
+    @staticmethod
+    def grow(array, size):
+        """Returns ``array`` with room for at least ``size`` entries along its first axis."""
+        if size <= len(array):
+            return array
+        new = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        new[:len(array)] = array
+        return new
+
+    def popcol(self, head, data):
+        row = self.rows - 1
+        if self.last[head] >= row:
+            self.add_row()
+            row = self.rows - 1
+        self.columns[head][row] = data
+        self.last[head] = row
+
+    def add_row(self):
+        for head in self.heads:
+            column = self.columns[head]
+            if self.rows == len(column):
+                self.columns[head] = self.grow(column, self.rows + 1)
+                self.columns[head][self.rows:] = self.empty(head, 1)[0]
+        self.rows += 1
+        if self.path is not None and self.rows - 1 >= self.chunk:
+            self.flush()
+
+    def snapshot(self, **vectors):
+        """Stores copies of the ``vectors`` with the current row, once every ``stride`` calls."""
+        unknown = set(vectors) - set(self.sizes)
+        if unknown:
+            raise KeyError(f"Unknown snapshots {sorted(unknown)}, expected one of {list(self.sizes)}")
+        self.calls += 1
+        if (self.calls - 1) % self.stride != 0:
+            return
+        for name, vector in vectors.items():
+            vector = np.asarray(vector)
+            if self.snapshots[name] is None:
+                self.snapshots[name] = np.full((len(self.snapshot_rows),) + vector.shape, np.nan)
+            self.snapshots[name] = self.grow(self.snapshots[name], self.count + 1)
+            self.snapshots[name][self.count] = vector
+        for name, stored in self.snapshots.items():
+            if stored is not None and name not in vectors:
+                stored[self.count] = np.nan
+        self.snapshot_rows = self.grow(self.snapshot_rows, self.count + 1)
+        self.snapshot_rows[self.count] = self.offset + self.rows - 1
+        self.count += 1
+
+    def getcol(self, head):
+        if self.path is None or self.chunks == 0:
+            return self.columns[head][:self.rows]
+        with np.load(self.path) as file:
+            stored = [file[f'{head}.{i:06d}'] for i in range(self.chunks)]
+        return np.concatenate(stored + [self.columns[head][:self.rows]])
+
+    def getrow(self, date):
+        date = date if date >= 0 else len(self) + date
+        if date >= self.offset:
+            return [self.columns[head][date - self.offset] for head in self.heads]
+        return [self.getcol(head)[date] for head in self.heads]
+
+    def getsnapshot(self, name):
+        """The stored snapshots of ``name`` and the rows they were taken at."""
+        vectors, rows = self.snapshots[name], self.snapshot_rows[:self.count]
+        vectors = None if vectors is None else vectors[:self.count]
+        if self.path is None or self.chunks == 0:
+            return vectors, rows
+        stored = self.load(self.path)
+        if stored.snapshots[name] is None or vectors is None:
+            vectors = stored.snapshots[name] if vectors is None else vectors
+        else:
+            vectors = np.concatenate((stored.snapshots[name], vectors))
+        return vectors, np.concatenate((stored.snapshot_rows, rows))
+
+    def arrays(self, rows=None):
+        """The columns and snapshots of the first ``rows`` rows in memory, keyed as in the ``.npz`` file."""
+        rows = self.rows if rows is None else rows
+        out = {head: self.columns[head][:rows] for head in self.heads}
+        keep = self.snapshot_rows[:self.count] < self.offset + rows
+        out['snapshot_rows'] = self.snapshot_rows[:self.count][keep]
+        for name, vectors in self.snapshots.items():
+            if vectors is not None:
+                out[f'snapshot.{name}'] = vectors[:self.count][keep]
+        return out
+
+    def flush(self, rows=None):
+        """Appends the completed rows (all but the last) to the file, and removes them from memory."""
+        rows = self.rows - 1 if rows is None else rows
+        if self.path is None or rows <= 0:
+            return
+        arrays = self.arrays(rows)
+        with zipfile.ZipFile(self.path, mode='a', compression=zipfile.ZIP_STORED, allowZip64=True) as file:
+            for key, value in arrays.items():
+                with file.open(f'{key}.{self.chunks:06d}.npy', mode='w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.ascontiguousarray(value), allow_pickle=False)
+        self.chunks += 1
+
+        # Shift the remaining rows and snapshots to the front
+        for head in self.heads:
+            column = self.columns[head]
+            column[:self.rows - rows] = column[rows:self.rows]
+            column[self.rows - rows:] = self.empty(head, 1)[0]
+            self.last[head] -= rows
+        stored = len(arrays['snapshot_rows'])
+        self.snapshot_rows[:self.count - stored] = self.snapshot_rows[stored:self.count]
+        for name, vectors in self.snapshots.items():
+            if vectors is not None:
+                vectors[:self.count - stored] = vectors[stored:self.count]
+        self.count -= stored
+        self.rows -= rows
+        self.offset += rows
+
+    def close(self):
+        """Appends all remaining rows to the file."""
+        self.flush(self.rows)
+
+    def save(self, path):
+        """Exports the complete history to an ``.npz`` file, which is read by ``Records.load``."""
+        out = {f'{head}.000000': self.getcol(head) for head in self.heads}
+        out['snapshot_rows.000000'] = self.snapshot_rows[:self.count]
+        for name in self.sizes:
+            vectors, rows = self.getsnapshot(name)
+            out['snapshot_rows.000000'] = rows
+            if vectors is not None:
+                out[f'snapshot.{name}.000000'] = vectors
+        np.savez(path, **out)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a history from an ``.npz`` file written by streaming or ``save``."""
+        with np.load(path) as file:
+            parts = {}
+            for key in file.files:
+                name, index = key.rsplit('.', 1)
+                parts.setdefault(name, []).append((int(index), file[key]))
+        data = {name: np.concatenate([value for _, value in sorted(chunks, key=lambda c: c[0])])
+                for name, chunks in parts.items()}
+
+        heads = [name for name in data if not name.startswith('snapshot')]
+        records = cls({head: data[head].dtype for head in heads},
+                      snapshots=[name[len('snapshot.'):] for name in data if name.startswith('snapshot.')])
+        records.rows = len(data[heads[0]]) if heads else 0
+        records.columns = {head: data[head] for head in heads}
+        records.last = dict.fromkeys(heads, records.rows - 1)
+        records.snapshot_rows = data.get('snapshot_rows', np.empty(0, dtype=np.int64))
+        records.count = len(records.snapshot_rows)
+        for name in records.sizes:
+            records.snapshots[name] = data[f'snapshot.{name}']
+        return records
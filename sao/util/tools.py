@@ -1,3 +1,6 @@
+from scipy.sparse import issparse
+
+
 def parse_to_list(*args):
     if len(args) == 0:
         return []
@@ -29,3 +32,40 @@ def fill_set_when_emtpy(s, n):
     if len(s) == 0:
         return set(range(n))
     return s
+
+
+def require_dense(dg, solver):
+    """Returns the sensitivities ``dg``, raises a ``TypeError`` if they are sparse, which ``solver`` does not support."""
+    if issparse(dg):
+        raise TypeError(f"{solver} needs dense sensitivities, use pdip to solve a subproblem with a sparse df")
+    return dg
+
+
+def lazy_attributes(package, attributes):
+    """
+    Returns the module ``__getattr__`` and ``__dir__`` of a package that imports its attributes on first access.
+
+    :param package: The name of the package
+    :param attributes: Dict of the public names and the modules that define them, a name
+        without module is a subpackage or submodule of the package. Other submodules
+        are imported on access as well.
+    """
+    import importlib
+
+    def __getattr__(name):
+        module = attributes.get(name)
+        if module is not None:
+            value = getattr(importlib.import_module(module), name)
+            setattr(importlib.import_module(package), name, value)
+            return value
+        try:
+            return importlib.import_module(f'{package}.{name}')
+        except ModuleNotFoundError as error:
+            if error.name != f'{package}.{name}':
+                raise
+        raise AttributeError(f"module '{package}' has no attribute '{name}'")
+
+    def __dir__():
+        return sorted(set(vars(importlib.import_module(package))) | set(attributes))
+
+    return __getattr__, __dir__
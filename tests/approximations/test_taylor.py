@@ -2,10 +2,12 @@ import logging
 
 import numpy as np
 import pytest
+import scipy.sparse
 
 from problems.n_dim.square import Square
 from sao.approximations.taylor import Taylor1, Taylor2, SphericalTaylor2, NonSphericalTaylor2
 from sao.intervening_variables import Linear, ConLin
+from sao.intervening_variables.mma import MMA02
 
 # Set options for logging data: https://www.youtube.com/watch?v=jxmzY9soFXg&ab_channel=CoreySchafer
 logger = logging.getLogger(__name__)
@@ -212,10 +214,29 @@ def test_NonSphericalTaylor2_intervening(n, h):
     assert nsph_taylor2.dg(problem.x0) == pytest.approx(dfold1, rel=1e-4)
 
 
+
+@pytest.mark.parametrize('intervening', [Linear, ConLin, MMA02])
+def test_taylor1_sparse(intervening):
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.2, 0.8, 8)
+    f = rng.normal(size=4)
+    df = rng.normal(size=(4, 8)) * (rng.random((4, 8)) < 0.4)
+    dense, sparse = Taylor1(intervening()), Taylor1(intervening())
+    dense.update(x, f, df)
+    sparse.update(x, f, scipy.sparse.csr_matrix(df))
+
+    # Same approximation, of which the derivatives keep the sparsity pattern
+    x1 = x + rng.uniform(-0.1, 0.1, 8)
+    assert sparse.g(x1) == pytest.approx(dense.g(x1), rel=1e-12)
+    for dg, dg_dense in [(sparse.dg(x1), dense.dg(x1)), (sparse.ddg(x1), dense.ddg(x1))]:
+        assert scipy.sparse.issparse(dg) and dg.nnz == np.count_nonzero(df)
+        assert dg.toarray() == pytest.approx(dg_dense, rel=1e-12)
+
 if __name__ == "__main__":
     test_taylor1(4, 0.1)
     test_taylor2(4, 0.1)
     test_taylor1_intervening(4, 0.1)
     test_taylor2_intervening(4, 0.1)
     test_SphericalTaylor2_intervening(4, 0.1)
-    test_NonSphericalTaylor2_intervening(4, 0.1)
\ No newline at end of file
+    test_NonSphericalTaylor2_intervening(4, 0.1)
+    test_taylor1_sparse(MMA02)
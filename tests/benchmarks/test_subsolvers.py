@@ -0,0 +1,35 @@
+import numpy as np
+
+from benchmarks.subsolvers import compare, measure, separable_case
+
+
+def test_separable_case():
+    subproblem = separable_case(20, 3, density=0.5)
+    g = subproblem.g(subproblem.x_k)
+    assert subproblem.n == 20 and subproblem.m == 3
+    assert np.allclose(g, [1, 0, 0, 0])
+
+
+def test_measure():
+    record = measure('pdip_x', 20, 3, 1.0, False, repeat=1)
+    assert record['status'] == 'ok'
+    assert record['time'] > 0 and record['peak_memory'] > 0 and record['iterations'] > 0
+    assert record['infeasibility'] < 1e-4
+
+    assert measure('pdip_x', 20, 3, 0.5, True, repeat=1)['status'] == 'ok'
+    assert measure('ipsolver', 20, 3, 0.5, True, repeat=1)['status'] == 'skipped'
+
+
+def test_compare():
+    baseline = [{'solver': 'a', 'n': 10, 'm': 1, 'density': 1.0, 'sparse': False, 'status': 'ok', 'time': 1.0},
+                {'solver': 'b', 'n': 10, 'm': 1, 'density': 1.0, 'sparse': False, 'status': 'ok', 'time': 1.0}]
+    records = [dict(baseline[0], time=1.2), dict(baseline[1], time=2.0)]
+    regressions = compare(records, baseline, tolerance=1.5)
+    assert [r[0]['solver'] for r in regressions] == ['b']
+    assert compare([dict(baseline[0], status='error')], baseline)[0][2] == np.inf
+
+
+if __name__ == "__main__":
+    test_separable_case()
+    test_measure()
+    test_compare()
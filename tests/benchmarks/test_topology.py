@@ -0,0 +1,27 @@
+import numpy as np
+
+from benchmarks.topology import PHASES, compare, run_case
+from sao.util.profiling import profiler
+
+
+def test_run_case(tmp_path):
+    record = run_case('compliance', 12, 4, iterations=2, trace=tmp_path)
+    assert not profiler.enabled and not profiler.events
+    assert record['n'] == 48 and record['calls']['problem.dg'] == 2
+
+    # The phases split the total time
+    assert set(record['phases']) == set(PHASES) | {'other'}
+    assert np.isclose(sum(record['phases'].values()), record['time'])
+    for phase in ['setup', 'assembly', 'linear solve', 'sensitivity', 'subproblem build', 'subsolve']:
+        assert record['phases'][phase] > 0
+    assert (tmp_path / 'compliance-12x4.json').exists()
+
+
+def test_compare():
+    baseline = [{'scenario': 'a', 'nelx': 60, 'nely': 20, 'iterations': 10, 'time': 1.0}]
+    assert not compare([dict(baseline[0], time=1.4)], baseline)
+    assert compare([dict(baseline[0], time=1.6)], baseline)[0][2] == 1.6
+
+
+if __name__ == "__main__":
+    test_compare()
@@ -0,0 +1,17 @@
+import numpy as np
+
+from benchmarks.vanderplaats import MAX_ENTRIES, run_case
+
+
+def test_run_case():
+    record = run_case(5, False, iterations=2)
+    assert record['status'] == 'ok' and record['n'] == 10
+    assert np.isclose(sum(record['phases'].values()), record['time'])
+    assert record['phases']['subsolve'] > 0
+
+    # Dense Jacobians of large cases are not formed
+    assert run_case(int(np.sqrt(MAX_ENTRIES)), False)['status'] == 'skipped'
+
+
+if __name__ == "__main__":
+    test_run_case()
@@ -279,6 +279,22 @@ def test_add_per_variable_and_response_multiple_overlap(n):
         mix.ddyddx(prob.x0)[1, 2:], rel=1e-4)
 
 
+@pytest.mark.parametrize('low, upp', [(-3.0, -1.0), (-1.0, 2.0), (2.0, 6.0)])
+def test_mma_clip(low, upp):
+    mma = MMA(factor=0.1)
+    mma.low, mma.upp = np.full(3, low), np.full(3, upp)
+    distance = 0.1 * (upp - low)
+    x = np.array([low - 1.0, 0.5 * (low + upp), upp + 1.0])
+    assert mma.clip(x) is x
+    assert x == pytest.approx([low + distance, 0.5 * (low + upp), upp - distance])
+
+    # The safety distance keeps the clipped designs strictly between the asymptotes
+    x = np.array([low, upp])
+    mma.low, mma.upp = np.full(2, low), np.full(2, upp)
+    mma.clip(x)
+    assert np.all(mma.low < x) and np.all(x < mma.upp)
+
+
 if __name__ == "__main__":
     test_conlin(4)
     test_uniform(4)
@@ -289,3 +305,4 @@ if __name__ == "__main__":
     test_different_per_variable_and_response(4)
     test_add_per_variable_and_response(4)
     test_add_per_variable_and_response_multiple_overlap(4)
+    test_mma_clip(-3.0, -1.0)
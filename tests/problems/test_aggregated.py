@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import scipy.sparse
+
+from problems.n_dim.vdp_beam import VanderplaatsBeam
+from problems.util.fd import check_gradient
+from sao.problems import AggregatedProblem, Problem
+
+
+class Quadratic(Problem):
+    """Constraints ``g_j = sum(a_j x^2) - 1`` with second derivatives."""
+
+    def __init__(self, n=4, m=6):
+        super().__init__()
+        self.n, self.m = n, m
+        self.a = np.random.default_rng(0).uniform(0.1, 1, (m + 1, n))
+        self.x0, self.x_min, self.x_max = np.full(n, 0.5), np.zeros(n), np.ones(n)
+
+    def g(self, x):
+        return self.a @ x ** 2 - np.concatenate(([0], np.ones(self.m)))
+
+    def dg(self, x):
+        return 2 * self.a * x
+
+    def ddg(self, x):
+        return 2 * self.a + 0 * x
+
+
+def beam_groups(N):
+    """The stress constraints of a beam in one group, the geometric constraints in two."""
+    return [np.arange(1, N + 1), np.arange(N + 1, N + 1 + N // 2), np.arange(N + 1 + N // 2, 2 * N + 1)]
+
+
+@pytest.mark.parametrize('method', ['ks', 'pnorm'])
+def test_aggregated(method):
+    beam = VanderplaatsBeam(10)
+    problem = AggregatedProblem(beam, beam_groups(10), method=method, alpha=0)
+    assert problem.m == 4 and problem.n == 20
+    x = np.random.default_rng(1).uniform(2, 50, problem.n)
+
+    # Conservative estimates of the maxima of the groups, the tip displacement is passed on
+    g, g_beam = problem.g(x), beam.g(x)
+    assert g[0] == g_beam[0] and g[-1] == g_beam[-1]
+    assert np.all(g[1:4] >= [g_beam[group].max() for group in problem.groups])
+    assert g[1] == pytest.approx(g_beam[1:11].max(), rel=0.1)
+
+    assert check_gradient(problem, x, processes=1).passed
+
+    # Sparse sensitivities stay sparse
+    sparse = AggregatedProblem(VanderplaatsBeam(10, sparse=True), beam_groups(10), method=method, alpha=0)
+    dg = sparse.dg(x)
+    assert scipy.sparse.issparse(dg)
+    assert dg.toarray() == pytest.approx(problem.dg(x), rel=1e-12)
+
+
+@pytest.mark.parametrize('method', ['ks', 'pnorm'])
+def test_aggregated_ddg(method):
+    problem = AggregatedProblem(Quadratic(), groups=2, method=method, rho=5, p=4, alpha=0)
+    x, h = np.array([0.3, 0.6, 0.8, 0.5]), 1e-5
+    ddg = np.empty((problem.m + 1, problem.n))
+    for i in range(problem.n):
+        dx = np.zeros(problem.n)
+        dx[i] = h
+        ddg[:, i] = (problem.dg(x + dx)[:, i] - problem.dg(x - dx)[:, i]) / (2 * h)
+    assert problem.ddg(x) == pytest.approx(ddg, rel=1e-6)
+
+
+@pytest.mark.parametrize('method', ['ks', 'pnorm'])
+def test_adaptive_normalization(method):
+    beam = VanderplaatsBeam(10)
+    problem = AggregatedProblem(beam, groups=[np.arange(1, 11)], method=method, alpha=1)
+    x = beam.x0
+
+    # Constant until the next sensitivities, then exact at the last design
+    g = problem.g(x)
+    assert np.array_equal(problem.evaluate(x)[0], g)
+    assert g[1] > beam.g(x)[1:11].max()
+    assert problem.g(x)[1] == pytest.approx(beam.g(x)[1:11].max(), rel=1e-12)
+
+
+if __name__ == "__main__":
+    test_aggregated('ks')
+    test_aggregated_ddg('pnorm')
+    test_adaptive_normalization('ks')
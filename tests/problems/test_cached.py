@@ -0,0 +1,77 @@
+import numpy as np
+
+from problems.n_dim.square import Square
+from sao.problems import CachedProblem
+from sao.solvers.optimality_criteria import oc
+
+
+class CountingSquare(Square):
+    def __init__(self, n):
+        super().__init__(n)
+        self.analyses = 0
+        self.designs = []
+
+    def g(self, x):
+        self.analyses += 1
+        self.designs.append(x.copy())
+        return super().g(x)
+
+
+def test_cached_problem():
+    prob = CountingSquare(4)
+    cached = CachedProblem(prob, maxsize=2)
+    assert cached.n == prob.n and cached.m == prob.m
+
+    x0, x1, x2 = prob.x0.copy(), prob.x0 + 0.1, prob.x0 + 0.2
+    g, dg = cached.evaluate(x0)
+    assert np.allclose(g, prob.g(x0)) and np.allclose(dg, prob.dg(x0))
+    prob.analyses = 0
+
+    # Repeated calls at the same design are served from the cache
+    cached.g(x0)
+    cached.dg(x0.copy())
+    assert prob.analyses == 0
+    assert cached.hits == 2 and cached.misses == 1
+
+    # Sensitivities at the last analysed design do not repeat the analysis
+    cached.g(x1)
+    cached.dg(x1)
+    assert prob.analyses == 1
+
+    # Least recently used designs are evicted
+    cached.g(x2)
+    cached.g(x0)
+    assert prob.analyses == 3
+
+    # Returned arrays can be modified without changing the cache
+    g = cached.g(x0)
+    g[:] = 0
+    assert np.allclose(cached.g(x0), prob.g(x0))
+
+
+class AnalysedSquare(CountingSquare):
+    """Analyses in ``g`` and ``dg`` alike, unless both follow from ``evaluate``."""
+
+    def dg(self, x):
+        self.analyses += 1
+        self.designs.append(x.copy())
+        return super().dg(x)
+
+    def evaluate(self, x, order=1):
+        self.analyses += 1
+        self.designs.append(x.copy())
+        return Square.g(self, x), Square.dg(self, x)
+
+
+def test_oc_analyses():
+    prob = AnalysedSquare(4)
+    oc(prob, x0=prob.x0.copy(), stop_tol=1e-4)
+
+    # Every design is analysed once, the final one included
+    assert prob.analyses > 2
+    assert len(np.unique(np.array(prob.designs), axis=0)) == prob.analyses
+
+
+if __name__ == "__main__":
+    test_cached_problem()
+    test_oc_analyses()
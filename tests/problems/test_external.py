@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from problems.n_dim.square import Square
+from sao.problems import ExternalProblem
+from sao.problems import external as external_module
+from sao.problems.external import connect, serve
+
+
+class FailingSquare(Square):
+    def dg(self, x):
+        raise ValueError('no sensitivities')
+
+
+class SlowSquare(Square):
+    def g(self, x):
+        time.sleep(1.0 if x[0] > 1 else 0.0)
+        return super().g(x)
+
+
+class SparseSquare(Square):
+    def dg(self, x):
+        return csr_matrix(super().dg(x))
+
+
+def test_external_problem():
+    prob = Square(5)
+    with ExternalProblem.local(prob, timeout=10) as external:
+        assert external.n == prob.n and external.m == prob.m
+        assert np.array_equal(external.x0, prob.x0)
+
+        for x in [prob.x0, prob.x0 + 0.1]:
+            g, dg = external.evaluate(x)
+            assert np.allclose(g, prob.g(x)) and np.allclose(dg, prob.dg(x))
+            assert np.allclose(external.g(x), g) and np.allclose(external.dg(x), dg)
+
+        # The returned arrays do not change with later evaluations
+        g[:] = 0.0
+        external.g(prob.x0)
+        assert np.allclose(external.g(prob.x0 + 0.1), prob.g(prob.x0 + 0.1))
+        assert np.all(g == 0.0)
+    assert not external.process.is_alive()
+
+
+def test_external_problem_views():
+    prob = Square(3)
+    external = ExternalProblem.local(prob, copy=False)
+    g0, dg0 = external.evaluate(prob.x0)
+    assert np.shares_memory(dg0, external.buffers.dg)
+    external.evaluate(prob.x0 + 0.1)
+    assert np.allclose(dg0, prob.dg(prob.x0 + 0.1))
+    external.close()
+
+
+def test_external_problem_files(tmp_path):
+    prob = Square(6)
+    with ExternalProblem.local(prob, directory=tmp_path, timeout=10) as external:
+        g, dg = external.evaluate(prob.x0)
+        assert np.allclose(g, prob.g(prob.x0)) and np.allclose(dg, prob.dg(prob.x0))
+        assert isinstance(external.buffers.dg, np.memmap)
+        assert np.allclose(np.load(tmp_path / 'sao_dg.npy'), dg)
+    assert not any(tmp_path.iterdir())
+
+
+def test_external_problem_error():
+    prob = FailingSquare(3)
+    with ExternalProblem.local(prob, timeout=10) as external:
+        assert np.allclose(external.g(prob.x0), prob.g(prob.x0))
+        with pytest.raises(RuntimeError, match='no sensitivities'):
+            external.dg(prob.x0)
+
+
+def test_external_problem_timeout():
+    prob = SlowSquare(3)
+    external = ExternalProblem.local(prob, timeout=0.2)
+    assert np.allclose(external.g(prob.x0), prob.g(prob.x0))
+    with pytest.raises(TimeoutError):
+        external.g(prob.x0 + 1)
+
+    # The late reply is not taken for that of a later evaluation
+    with pytest.raises(RuntimeError, match='closed'):
+        external.g(prob.x0)
+    assert external.connection is None and not external.process.is_alive()
+
+
+def test_external_problem_sparse():
+    prob = SparseSquare(4)
+    with ExternalProblem.local(prob, timeout=10) as external:
+        g, dg = external.evaluate(prob.x0)
+        assert np.allclose(dg, prob.dg(prob.x0).toarray())
+
+
+def test_external_problem_socket(tmp_path):
+    address = os.fspath(tmp_path / 'analysis.sock')
+    prob = Square(4)
+
+    def analysis():
+        # Wait for the socket of the optimizer
+        while not os.path.exists(address):
+            threading.Event().wait(0.01)
+        serve(prob, connect(address))
+
+    thread = threading.Thread(target=analysis, daemon=True)
+    thread.start()
+    with ExternalProblem(prob.n, prob.m, address=address, timeout=10) as external:
+        g, dg = external.evaluate(prob.x0)
+        assert np.allclose(g, prob.g(prob.x0)) and np.allclose(dg, prob.dg(prob.x0))
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_tracker(monkeypatch):
+    assert external_module.tracker() == external_module.tracker()
+
+    # Without the private process id of the resource tracker, it is unknown
+    monkeypatch.setattr(external_module.resource_tracker, '_resource_tracker', object())
+    monkeypatch.setattr(external_module.resource_tracker, 'ensure_running', lambda: None)
+    assert external_module.tracker() is None
+
+
+if __name__ == "__main__":
+    test_external_problem()
+    test_external_problem_views()
+    test_external_problem_error()
+    test_external_problem_timeout()
+    test_external_problem_sparse()
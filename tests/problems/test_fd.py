@@ -0,0 +1,76 @@
+from multiprocessing import get_context
+
+import numpy as np
+import pytest
+
+from problems.n_dim.square import Square
+from problems.topology_optimization.compliance import ComplianceMBB
+from problems.util.fd import check_gradient, derivative, finite_difference_use
+
+
+class WrongSquare(Square):
+    def dg(self, x):
+        dg = super().dg(x)
+        dg[0, 2] *= 1.01
+        return dg
+
+
+@pytest.mark.parametrize('method', ['forward', 'central', 'complex'])
+def test_check_gradient(method):
+    problem = Square(6)
+    x = problem.x0.copy()
+    check = check_gradient(problem, x, method=method, processes=1)
+    assert check.passed and check.analytic.shape == check.approximate.shape == (2, 6)
+    assert np.array_equal(x, problem.x0)
+    assert np.allclose(check.approximate, finite_difference_use(problem, x.copy(), 1e-7), rtol=1e-5)
+    assert 'PASSED' in check.report()
+
+
+def test_check_gradient_wrong():
+    check = check_gradient(WrongSquare(6), np.linspace(0.8, 0.9, 6), processes=1)
+    assert not check.passed
+    assert check.error[0].argmax() == 2 and np.sum(check.error > check.rtol) == 1
+    assert 'FAILED' in str(check)
+
+    # Random directions detect the error at the cost of a few evaluations
+    assert not check_gradient(WrongSquare(6), np.linspace(0.8, 0.9, 6), directions=3, processes=1).passed
+
+
+def test_check_gradient_parallel():
+    problem = ComplianceMBB(8, 4)
+    x = np.random.default_rng(0).uniform(0.2, 0.8, problem.n)
+    serial = check_gradient(problem, x, processes=1)
+    parallel = check_gradient(problem, x, processes=2)
+    assert serial.passed and parallel.passed and parallel.processes == 2
+    assert np.allclose(serial.approximate, parallel.approximate)
+
+    directional = check_gradient(problem, x, directions=4, processes=2)
+    assert directional.passed and directional.analytic.shape == (2, 4)
+    assert directional.evaluations == 9
+
+
+def test_check_gradient_spawn():
+    # The problem holds a cholmod factorization, which is rebuilt in the spawned workers
+    problem = ComplianceMBB(6, 3)
+    x = np.random.default_rng(1).uniform(0.2, 0.8, problem.n)
+    check = check_gradient(problem, x, directions=2, processes=2, mp_context=get_context('spawn'))
+    assert check.passed and check.processes == 2
+    assert np.allclose(check.approximate, check_gradient(problem, x, directions=2, processes=1).approximate)
+
+
+def test_derivative():
+    problem = Square(3)
+    x = problem.x0
+    direction = np.array([1.0, -1.0, 0.5])
+    assert np.allclose(derivative(problem, x, direction, 1e-20, 'complex'), problem.dg(x) @ direction)
+    assert np.allclose(derivative(problem, x, 1, 1e-20, 'complex'), problem.dg(x)[:, 1])
+    with pytest.raises(ValueError):
+        derivative(problem, x, 1, 1e-6, 'backward')
+
+
+if __name__ == "__main__":
+    test_check_gradient('central')
+    test_check_gradient_wrong()
+    test_check_gradient_parallel()
+    test_check_gradient_spawn()
+    test_derivative()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from problems.n_dim.square import Square
+
+
+@pytest.mark.parametrize('n', [10])
+def test_evaluate(n):
+    prob = Square(n)
+    x = prob.x0 + 0.1 * np.random.rand(n)
+
+    g, = prob.evaluate(x, order=0)
+    assert np.allclose(g, prob.g(x))
+
+    g, dg = prob.evaluate(x)
+    assert np.allclose(g, prob.g(x))
+    assert np.allclose(dg, prob.dg(x))
+
+    g, dg, ddg = prob.evaluate(x, order=2)
+    assert np.allclose(ddg, prob.ddg(x))
+
+
+if __name__ == "__main__":
+    test_evaluate(10)
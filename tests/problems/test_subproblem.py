@@ -2,12 +2,16 @@ import logging
 
 import numpy as np
 import pytest
+import scipy.sparse
 
 from problems.n_dim.square import Square
 from sao.approximations.taylor import Taylor1, Taylor2
-from sao.intervening_variables import ConLin, Reciprocal
+from sao.intervening_variables import ConLin, Linear, MixedIntervening, Reciprocal
 from sao.intervening_variables.mma import MMA02 as MMA
+from sao.move_limits import Bounds, MoveLimit
+from sao.problems import ActiveSetScreening
 from sao.problems.subproblem import Subproblem
+from sao.solvers.primal_dual_interior_point import pdip
 
 # Set options for logging data: https://www.youtube.com/watch?v=jxmzY9soFXg&ab_channel=CoreySchafer
 logger = logging.getLogger(__name__)
@@ -226,6 +230,100 @@ def test_mma_taylor2(n, h):
                                                      rel=1e-4)
 
 
+
+def screening_case(n=20, m=60, seed=0):
+    """Design, responses and sensitivities of which most constraints are far from active."""
+    rng = np.random.default_rng(seed)
+    x = np.full(n, 0.5)
+    df = np.vstack((-rng.uniform(0.1, 1, n), rng.uniform(0, 1, (m, n)) * (rng.random((m, n)) < 0.3)))
+    f = np.concatenate(([1.], -rng.uniform(0, 3, m)))
+    f[1:4] = 0
+    return x, f, df
+
+
+@pytest.mark.parametrize('intervening', [ConLin, MMA])
+def test_bound(intervening):
+    x, f, df = screening_case()
+    subprob = Subproblem(Taylor1(intervening()), limits=[Bounds(0, 1), MoveLimit(0.2)])
+    subprob.build(x, f, df)
+    bound = subprob.approx.bound(subprob.x_min, subprob.x_max)
+    samples = np.random.default_rng(1).uniform(subprob.x_min, subprob.x_max, (50, len(x)))
+    assert np.all(bound >= np.max([subprob.g(xs) for xs in samples], axis=0))
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_screening(sparse):
+    x, f, df = screening_case()
+    if sparse:
+        df = scipy.sparse.csr_matrix(df)
+    full = Subproblem(Taylor1(MMA()), limits=[Bounds(0, 1), MoveLimit(0.2)])
+    screened = Subproblem(Taylor1(MMA()), limits=[Bounds(0, 1), MoveLimit(0.2)], screening=ActiveSetScreening())
+    full.build(x, f, df)
+    screened.build(x, f, df)
+
+    # The dropped constraints cannot become active, the solutions are the same
+    assert screened.dropped > 0 and screened.m + screened.dropped == full.m
+    assert np.all(np.isin([1, 2, 3], screened.active))
+    assert np.all(full.approx.bound(full.x_min, full.x_max)[np.setdiff1d(np.arange(1, 61), screened.active)] <= 0)
+    assert len(screened.g(x)) == screened.m + 1 and screened.dg(x).shape == (screened.m + 1, len(x))
+    assert pdip(screened)[0] == pytest.approx(pdip(full)[0], abs=1e-6)
+
+    lam = np.arange(1., screened.m + 1)
+    assert np.array_equal(screened.multipliers(lam)[screened.active[1:] - 1], lam)
+    assert np.count_nonzero(screened.multipliers(lam)) == screened.m
+
+    # Constraints are added again when they approach activity
+    f[4:] = -1e-3
+    screened.build(x, f, df)
+    assert screened.dropped == 0
+
+
+def test_bound_concave():
+    # The concave constraint peaks inside the bounds, at its current value
+    x, f = np.array([0.5]), np.array([0., 0.1])
+    df, ddf = np.array([[1.], [0.]]), np.array([[0.], [-2.]])
+    screened = Subproblem(Taylor2(Linear()), limits=[Bounds(0, 1)], screening=ActiveSetScreening())
+    screened.build(x, f, df, ddf)
+    assert screened.approx.bound(screened.x_min, screened.x_max)[1] == pytest.approx(0.1)
+    assert screened.dropped == 0
+
+    # Random second order information
+    x, f, df = screening_case()
+    ddf = np.random.default_rng(2).uniform(-1, 1, df.shape)
+    subprob = Subproblem(Taylor2(Linear()), limits=[Bounds(0, 1), MoveLimit(0.2)])
+    subprob.build(x, f, df, ddf)
+    samples = np.random.default_rng(1).uniform(subprob.x_min, subprob.x_max, (50, len(x)))
+    bound = subprob.approx.bound(subprob.x_min, subprob.x_max)
+    assert np.all(bound >= np.max([subprob.g(xs) for xs in samples], axis=0) - 1e-12)
+
+
+@pytest.mark.parametrize('approximation', ['conlin', 'mma', 'sparse', 'taylor2', 'mixed'])
+def test_restrict(approximation):
+    x, f, df = screening_case()
+    ddf = None
+    if approximation == 'conlin':
+        approx = Taylor1(ConLin())
+    elif approximation == 'mma':
+        approx = Taylor1(MMA())
+    elif approximation == 'sparse':
+        approx, df = Taylor1(MMA()), scipy.sparse.csr_matrix(df)
+    elif approximation == 'taylor2':
+        approx, ddf = Taylor2(ConLin()), np.random.default_rng(2).uniform(-1, 1, df.shape)
+    else:
+        approx = Taylor1(MixedIntervening(len(x), len(f)).set_intervening(ConLin(), resp=[0, 2, 5]))
+    approx.update(x, f, df, ddf)
+
+    # The restricted approximation evaluates the selected responses only
+    rows = np.array([0, 2, 5, 7])
+    reduced = approx.restrict(rows)
+    xs = x + 0.1
+    for name in ['g', 'dg', 'ddg']:
+        full, part = getattr(approx, name)(xs), getattr(reduced, name)(xs)
+        if scipy.sparse.issparse(full):
+            full, part = full.toarray(), part.toarray()
+        assert part.shape[0] == len(rows) and np.allclose(part, full[rows])
+
+
 if __name__ == "__main__":
     test_lin_taylor1(4, 0.1)
     test_lin_taylor2(4, 0.1)
@@ -235,3 +333,7 @@ if __name__ == "__main__":
     test_conlin_taylor2(4, 0.1)
     test_mma_taylor1(4, 0.1)
     test_mma_taylor2(4, 0.1)
+    test_bound(MMA)
+    test_screening(True)
+    test_bound_concave()
+    test_restrict('mma')
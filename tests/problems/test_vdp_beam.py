@@ -0,0 +1,48 @@
+import numpy as np
+import scipy.sparse
+
+from problems.n_dim.vdp_beam import VanderplaatsBeam
+from problems.util.fd import check_gradient
+
+
+def displacement(problem, x):
+    """Tip displacement by the recursion over the segments."""
+    y, ya = 0., 0.
+    for i in range(problem.N):
+        I = x[i] * x[problem.N + i] ** 3 / 12
+        y += problem.P * problem.S ** 2 / (2 * problem.E * I) * (
+                problem.L - (i + 1) * problem.S + 2 * problem.S / 3) + ya * problem.S
+        ya += problem.P * problem.S / (problem.E * I) * (problem.L - (i + 1) * problem.S + problem.S / 2)
+    return y
+
+
+def test_responses():
+    problem = VanderplaatsBeam(7)
+    x = np.random.default_rng(0).uniform(1, 50, problem.n)
+    g = problem.g(x)
+    assert g.shape == (problem.m + 1,)
+    assert np.isclose(g[0], problem.S * problem.scale * np.sum(x[:7] * x[7:]))
+    assert np.allclose(g[8:15], x[7:] - 20 * x[:7])
+    assert np.isclose(g[-1], displacement(problem, x) / problem.y_max - 1, rtol=1e-12)
+
+
+def test_sensitivities():
+    problem = VanderplaatsBeam(5)
+    x = np.random.default_rng(1).uniform(1, 50, problem.n)
+    check = check_gradient(problem, x, processes=1)
+    assert check.passed, check.report()
+
+
+def test_sparse():
+    dense, sparse = VanderplaatsBeam(20), VanderplaatsBeam(20, sparse=True)
+    x = np.random.default_rng(2).uniform(1, 50, dense.n)
+    dg = sparse.dg(x)
+    assert scipy.sparse.issparse(dg) and dg.nnz == 8 * 20
+    assert np.array_equal(dg.toarray(), dense.dg(x))
+    assert np.array_equal(sparse.g(x), dense.g(x))
+
+
+if __name__ == "__main__":
+    test_responses()
+    test_sensitivities()
+    test_sparse()
@@ -0,0 +1,80 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from problems.n_dim.square import Square
+from problems.two_dim.townsend import Townsend
+from sao.solvers.optimality_criteria import oc
+from sao.solvers.wrappers import mma, multistart
+
+
+class CountingSquare(Square):
+    def __init__(self, n):
+        super().__init__(n)
+        self.analyses = 0
+
+    def g(self, x):
+        self.analyses += 1
+        return super().g(x)
+
+
+def test_mma_callback():
+    problem = Square(3)
+    calls = []
+
+    def callback(iteration, x, f):
+        calls.append((iteration, f[0]))
+        return iteration == 3
+
+    x, f = mma(problem, x0=problem.x0.copy(), callback=callback, verbose=False)
+    assert [c[0] for c in calls] == [1, 2, 3]
+    assert np.isclose(f, calls[-1][1])
+
+    calls.clear()
+    x, g = oc(problem, x0=problem.x0.copy(), callback=callback, verbose=False, responses=True)
+    assert [c[0] for c in calls] == [1, 2, 3]
+    assert np.allclose(g, problem.g(x))
+
+
+def test_multistart():
+    starts = np.random.default_rng(0).uniform(0.1, 0.9, (4, 3))
+    serial = multistart(partial(Square, 3), starts, processes=1, patience=None, stop_tol=1e-4)
+    parallel = multistart(Square(3), starts, processes=2, patience=None, stop_tol=1e-4)
+    assert parallel.processes == 2 and len(parallel.runs) == 4
+
+    for result in [serial, parallel]:
+        assert len(result.feasible) == 4 and not any(run.cancelled for run in result.runs)
+        assert np.allclose(result.best.x, 1 / 3, atol=1e-3)
+        assert len(result.optima(1e-3)) == 1 and result.optima(1e-3)[0][1] == 4
+    assert sorted(run.index for run in parallel.runs) == [0, 1, 2, 3]
+    assert np.allclose(sorted(r.objective for r in serial.runs), sorted(r.objective for r in parallel.runs))
+
+
+def test_multistart_analyses():
+    # A run reuses the responses of the final design of the optimizer
+    problem = CountingSquare(3)
+    mma(problem, x0=problem.x0.copy(), stop_tol=1e-4, verbose=False)
+    analyses, problem.analyses = problem.analyses, 0
+    multistart(problem, problem.x0[np.newaxis], processes=1, patience=None, stop_tol=1e-4)
+    assert problem.analyses == analyses
+
+
+@pytest.mark.filterwarnings('error::RuntimeWarning')
+def test_multistart_cancel():
+    problem = Townsend()
+    result = multistart(Townsend, 8, processes=1, patience=5, tolerance=0.1, max_iter=50,
+                        xmin=problem.x_min, xmax=problem.x_max, stop_tol=1e-4)
+    best = result.best
+    assert best.feasible and not best.cancelled and best.objective < -2.0
+    for run in result.runs:
+        assert run.iterations <= 51
+        if run.cancelled:
+            assert run.iterations == 6
+
+
+if __name__ == "__main__":
+    test_mma_callback()
+    test_multistart()
+    test_multistart_analyses()
+    test_multistart_cancel()
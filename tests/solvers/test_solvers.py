@@ -2,12 +2,22 @@ import logging
 
 import numpy as np
 import pytest
+import scipy.sparse
 
 from problems.n_dim.square import Square
+from problems.n_dim.vdp_beam import VanderplaatsBeam
+from sao.approximations import Taylor1
+from sao.intervening_variables import ConLin
+from sao.intervening_variables.mma import MMA02
+from sao.move_limits import Bounds, MoveLimitFraction
+from sao.problems import Subproblem
+from sao.scaling_strategies import InitialResponseScaling
 from sao.solvers.pdip_svanberg import ipsolver
 from sao.solvers.wrappers.cvxopt import cvxopt_solver
 from sao.solvers.primal_dual_interior_point import pdip, Pdipx, Pdipxy, Pdipxyz
 from sao.solvers.wrappers.scipy import scipy_solver
+from sao.solvers.dual.conlin import sub_con
+from sao.solvers.dual.mma import sub_mma
 
 # Set options for logging data: https://www.youtube.com/watch?v=jxmzY9soFXg&ab_channel=CoreySchafer
 logger = logging.getLogger(__name__)
@@ -63,5 +73,41 @@ def test_square(n):
     assert np.linalg.norm(x_opt_scipy - x_opt_cvxopt) == pytest.approx(0, abs=1e-4)
 
 
+@pytest.mark.parametrize('variables', [Pdipx, Pdipxy, Pdipxyz])
+def test_pdip_sparse(variables):
+    x_opt = []
+    for sparse in [False, True]:
+        problem = VanderplaatsBeam(10, sparse=sparse)
+        subproblem = Subproblem(Taylor1(MMA02(x_min=problem.x_min, x_max=problem.x_max)),
+                                limits=[Bounds(problem.x_min, problem.x_max), MoveLimitFraction(2)])
+        scaling = InitialResponseScaling(problem.m + 1)
+        x = problem.x0.copy()
+        for _ in range(3):
+            f, df = scaling.scale(problem.g(x), problem.dg(x))
+            assert scipy.sparse.issparse(df) == sparse
+            subproblem.build(x, f, df)
+            x = pdip(subproblem, variables=variables)[0]
+        x_opt.append(x)
+    assert x_opt[1] == pytest.approx(x_opt[0], rel=1e-8)
+
+
+@pytest.mark.parametrize('solver, conlin', [
+    (ipsolver, False), (cvxopt_solver, False), (scipy_solver, False),
+    (lambda subproblem: sub_mma(subproblem, subproblem.x, np.ones(subproblem.m)), False),
+    (lambda subproblem: sub_con(subproblem, subproblem.x, np.ones(subproblem.m)), True),
+])
+def test_dense_solvers_sparse(solver, conlin):
+    problem = VanderplaatsBeam(10, sparse=True)
+    intervening = ConLin() if conlin else MMA02(x_min=problem.x_min, x_max=problem.x_max)
+    subproblem = Subproblem(Taylor1(intervening),
+                            limits=[Bounds(problem.x_min, problem.x_max), MoveLimitFraction(2)])
+    subproblem.x = problem.x0.copy()
+    subproblem.build(subproblem.x, problem.g(subproblem.x), problem.dg(subproblem.x))
+    with pytest.raises(TypeError, match='pdip'):
+        solver(subproblem)
+
+
 if __name__ == "__main__":
     test_square(10)
+    test_pdip_sparse(Pdipxyz)
+    test_dense_solvers_sparse(ipsolver, False)
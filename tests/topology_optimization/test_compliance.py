@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from problems.topology_optimization.compliance import ComplianceMBB, Compliance3D, MultiLoadCompliance
+
+
+def test_sensitivities_follow_design():
+    problem = ComplianceMBB(8, 4)
+    x0, x1 = problem.x0.copy(), problem.x0 + 0.1 * np.random.rand(problem.n)
+    g1, dg1 = problem.evaluate(x1)
+
+    # The sensitivities are consistent with the design they are requested at
+    problem.g(x0)
+    assert np.allclose(problem.dg(x1), dg1)
+    assert np.allclose(problem.g(x1), g1)
+
+
+def test_multi_load_compliance():
+    problem = MultiLoadCompliance(8, 4, weights=[1.0, 2.0])
+    x = problem.x0 + 0.1 * np.random.rand(problem.n)
+    g, dg = problem.evaluate(x)
+
+    # Equal to the weighted sum of the single load cases
+    for i, w in enumerate([1.0, 2.0]):
+        single = MultiLoadCompliance(8, 4, loads=problem.f[:, i])
+        gi, dgi = single.evaluate(x)
+        g[0] -= w * gi[0]
+        dg[0] -= w * dgi[0]
+    assert abs(g[0]) < 1e-8 * problem.g(x)[0]
+    assert np.allclose(dg[0], 0, atol=1e-8 * np.abs(problem.dg(x)[0]).max())
+
+    # Finite difference check of the objective
+    dx = 1e-6 * np.random.rand(problem.n)
+    g0, dg0 = problem.evaluate(x)
+    assert problem.g(x + dx)[0] - g0[0] == pytest.approx(np.dot(dg0[0], dx), rel=1e-4)
+
+
+def test_compliance_3d():
+    problem = Compliance3D(8, 4, 4)
+    x = problem.x0 + 0.1 * np.random.rand(problem.n)
+    g0, dg0 = problem.evaluate(x)
+    assert np.sum(problem.f) == pytest.approx(-1.0)
+
+    # Same response as with a direct solver
+    direct = Compliance3D(8, 4, 4, solver='cholmod')
+    g1, dg1 = direct.evaluate(x)
+    assert np.allclose(g0, g1, rtol=1e-6)
+    assert np.allclose(dg0, dg1, rtol=1e-5, atol=1e-6 * np.abs(dg1).max())
+
+    # Finite difference check of the objective
+    dx = 1e-6 * np.random.rand(problem.n)
+    assert direct.g(x + dx)[0] - g1[0] == pytest.approx(np.dot(dg1[0], dx), rel=1e-4)
+
+
+if __name__ == "__main__":
+    test_sensitivities_follow_design()
+    test_multi_load_compliance()
+    test_compliance_3d()
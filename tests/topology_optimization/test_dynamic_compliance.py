@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from problems.topology_optimization.dynamic_compliance import DynamicComplianceMBB
+
+
+@pytest.mark.parametrize('n_modes', [None, 30])
+def test_dynamic_compliance_sensitivities(n_modes):
+    problem = DynamicComplianceMBB(12, 4, rho=1e-6, omega=[5.0, 20.0, 60.0], n_modes=n_modes)
+    x = problem.x0 + 0.3 * np.random.default_rng(0).random(problem.n) - 0.15
+    g, dg = problem.evaluate(x)
+
+    dx = 1e-6 * np.random.default_rng(1).random(problem.n)
+    assert problem.g(x + dx) - g == pytest.approx(dg @ dx, rel=1e-3)
+
+
+def test_modal_basis():
+    omega = np.array([5.0, 20.0, 60.0])
+    direct = DynamicComplianceMBB(12, 4, rho=1e-6, omega=omega)
+    modal = DynamicComplianceMBB(12, 4, rho=1e-6, omega=omega, n_modes=30)
+    assert np.allclose(modal.g(modal.x0), direct.g(direct.x0), rtol=1e-6)
+    assert np.allclose(modal.f_compl, direct.f_compl, rtol=1e-5)
+
+    # The response function follows from the basis of the last analysis
+    assert np.allclose(modal.frf(omega), modal.f_compl)
+    assert np.allclose(direct.frf(omega), direct.f_compl, rtol=1e-3)
+    assert np.all(np.diff(direct.eigenfrequencies) >= 0)
+
+
+if __name__ == "__main__":
+    test_dynamic_compliance_sensitivities(30)
+    test_modal_basis()
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from problems.topology_optimization.eigenfrequency import EigenfrequencyClampedBeam
+
+
+def test_eigenfrequency_sensitivities():
+    problem = EigenfrequencyClampedBeam(12, 4, n_eigenvalues=4)
+    x = problem.x0 + 0.3 * np.random.default_rng(0).random(problem.n)
+    g, dg = problem.evaluate(x)
+
+    dx = 1e-6 * np.random.default_rng(1).random(problem.n)
+    assert problem.g(x + dx) - g == pytest.approx(dg @ dx, rel=1e-4)
+
+
+@pytest.mark.parametrize('solver', ['cholmod', 'multigrid'])
+def test_lobpcg(solver):
+    eigsh = EigenfrequencyClampedBeam(32, 8, n_eigenvalues=4)
+    lobpcg = EigenfrequencyClampedBeam(32, 8, n_eigenvalues=4, eigen_solver='lobpcg', solver=solver)
+    x = eigsh.x0.copy()
+    for i in range(3):
+        assert lobpcg.g(x) == pytest.approx(eigsh.g(x), rel=1e-5)
+        assert np.allclose(lobpcg.eigvals, eigsh.eigvals, rtol=1e-5)
+        x = x + 0.05 * np.random.default_rng(i).random(eigsh.n)
+    assert np.all(lobpcg.multiplicity == 1)
+
+
+if __name__ == "__main__":
+    test_eigenfrequency_sensitivities()
+    test_lobpcg('cholmod')
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from problems.topology_optimization.stress import StressCantilever
+from problems.util.fd import check_gradient
+
+
+@pytest.mark.parametrize('n_clusters', [1, 3, 32])
+def test_stress_sensitivities(n_clusters):
+    problem = StressCantilever(8, 4, n_clusters=n_clusters)
+    x = problem.x0 - 0.5 * np.random.default_rng(0).random(problem.n)
+    g, dg = problem.evaluate(x)
+    assert g.shape == (n_clusters + 1,) and dg.shape == (n_clusters + 1, problem.n)
+
+    # Each element is in exactly one, fixed, cluster of contiguous elements
+    assert np.array_equal(problem.cluster_size, [len(c) for c in np.array_split(x, n_clusters)])
+    assert np.all(np.diff(problem.clusters) >= 0)
+
+    # Directional finite difference check
+    dx = 1e-7 * np.random.default_rng(1).random(problem.n)
+    gp = problem.g(x + dx)
+    assert np.allclose(gp - g, dg @ dx, rtol=1e-4, atol=1e-12)
+
+
+@pytest.mark.parametrize('n_clusters', [3, 32])
+def test_stress_sensitivities_reordered(n_clusters):
+    problem = StressCantilever(8, 4, n_clusters=n_clusters)
+    x = problem.x0 - 0.5 * np.random.default_rng(0).random(problem.n)
+    direction = np.random.default_rng(1).standard_normal(problem.n)
+    direction /= np.linalg.norm(direction)
+
+    # The steps change the order of the element stresses, the clusters stay the same
+    clusters = problem.clusters.copy()
+    problem.g(x + 1e-2 * direction)
+    order = np.argsort(-problem.giplus)
+    problem.g(x - 1e-2 * direction)
+    assert not np.array_equal(order, np.argsort(-problem.giplus))
+    assert np.array_equal(problem.clusters, clusters)
+
+    check = check_gradient(problem, x, dx=1e-2, directions=direction[np.newaxis], processes=1)
+    assert check.passed
+
+
+if __name__ == "__main__":
+    test_stress_sensitivities(3)
+    test_stress_sensitivities_reordered(3)
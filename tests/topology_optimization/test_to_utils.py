@@ -0,0 +1,258 @@
+import tracemalloc
+import warnings
+
+import numpy as np
+import pytest
+from scipy.sparse import coo_matrix
+
+from problems.topology_optimization.util import to_utils as utils
+
+
+def reference_edofmat(nelx, nely):
+    edofMat = np.zeros((nelx * nely, 8), dtype=int)
+    for elx in range(nelx):
+        for ely in range(nely):
+            el = ely + elx * nely
+            n1 = (nely + 1) * elx + ely
+            n2 = (nely + 1) * (elx + 1) + ely
+            edofMat[el, :] = np.array(
+                [2 * n1 + 2, 2 * n1 + 3, 2 * n2 + 2, 2 * n2 + 3, 2 * n2, 2 * n2 + 1, 2 * n1, 2 * n1 + 1])
+    return edofMat
+
+
+@pytest.mark.parametrize('nelx, nely', [(1, 1), (4, 3), (7, 5)])
+def test_mesh(nelx, nely):
+    mesh = utils.Mesh(nelx, nely)
+    edofMat = reference_edofmat(nelx, nely)
+    assert mesh.edofMat.dtype == np.int32
+    assert np.array_equal(mesh.edofMat, edofMat)
+    assert np.array_equal(mesh.iK, np.kron(edofMat, np.ones((8, 1), dtype=int)).flatten())
+    assert np.array_equal(mesh.jK, np.kron(edofMat, np.ones((1, 8), dtype=int)).flatten())
+    assert mesh.elgrid.shape == (nely, nelx)
+
+
+def reference_filter(nelx, nely, rmin):
+    iH, jH, sH = [], [], []
+    for i in range(nelx):
+        for j in range(nely):
+            for k in range(int(max(i - (np.ceil(rmin) - 1), 0)), int(min(i + np.ceil(rmin), nelx))):
+                for l in range(int(max(j - (np.ceil(rmin) - 1), 0)), int(min(j + np.ceil(rmin), nely))):
+                    iH.append(i * nely + j)
+                    jH.append(k * nely + l)
+                    sH.append(max(0.0, rmin - np.sqrt((i - k) ** 2 + (j - l) ** 2)))
+    return coo_matrix((sH, (iH, jH)), shape=(nelx * nely, nelx * nely)).tocsc()
+
+
+@pytest.mark.parametrize('rmin', [1.0, 1.5, 2.0, 3.2])
+def test_filter(rmin):
+    mesh = utils.Mesh(7, 5)
+    H = reference_filter(mesh.nelx, mesh.nely, rmin)
+    assert np.allclose(utils.filter_matrix(mesh.nelx, mesh.nely, rmin).toarray(), H.toarray())
+
+    x = np.random.rand(mesh.n)
+    matrix_filter = utils.Filter(mesh, rmin)
+    convolution_filter = utils.ConvolutionFilter(mesh, rmin)
+    assert np.allclose(matrix_filter.Hs, np.asarray(H.sum(1)).ravel())
+    assert np.allclose(convolution_filter.Hs, matrix_filter.Hs)
+    assert np.allclose(matrix_filter.forward(x), convolution_filter.forward(x))
+    assert np.allclose(matrix_filter.backward(x), convolution_filter.backward(x))
+
+    # Columns are filtered at once
+    X = np.random.rand(mesh.n, 3)
+    for f in (matrix_filter, convolution_filter):
+        assert np.allclose(f.forward(X), np.column_stack([f.forward(X[:, i]) for i in range(3)]))
+        assert np.allclose(f.backward(X), np.column_stack([matrix_filter.backward(X[:, i]) for i in range(3)]))
+
+
+@pytest.mark.parametrize('solver', [utils.CholmodSolver, utils.SuperLUSolver, utils.CGSolver, utils.MultigridSolver])
+def test_linear_solver(solver):
+    mesh = utils.Mesh(8, 4)
+    fixed = np.arange(2 * (mesh.nely + 1))
+    free = np.setdiff1d(np.arange(mesh.ndof), fixed)
+    f = np.random.rand(len(free), 2)
+    linear_solver = solver().setup(mesh, free)
+
+    # Refactorizations of the same pattern must use the new values
+    for scale in [1.0, 0.1]:
+        x = scale * (0.1 + np.random.rand(mesh.n))
+        K = utils.assemble_K(x, mesh, fixed)
+        u = linear_solver.update(K).solve(f)
+        assert u.shape == f.shape
+        assert np.allclose(K @ u, f, rtol=1e-6, atol=1e-6 * np.abs(f).max())
+        assert np.allclose(linear_solver.solve(f[:, 0], transpose=True), u[:, 0], rtol=1e-5)
+
+
+def test_cg_maxiter():
+    mesh = utils.Mesh(8, 4)
+    fixed = np.arange(2 * (mesh.nely + 1))
+    free = np.setdiff1d(np.arange(mesh.ndof), fixed)
+    K = utils.assemble_K(0.1 + np.random.rand(mesh.n), mesh, fixed)
+    f = np.random.rand(len(free))
+
+    for maxiter in [0, 5]:
+        solver = utils.CGSolver(maxiter=maxiter).setup(mesh, free).update(K)
+        with pytest.warns(RuntimeWarning, match='did not converge'):
+            solver.solve(f)
+        assert solver.iterations == maxiter
+
+    solver = utils.CGSolver().setup(mesh, free).update(K)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        u = solver.solve(f)
+    assert 0 < solver.iterations < solver.maxiter
+    assert np.linalg.norm(K @ u - f) <= solver.tol * np.linalg.norm(f)
+
+
+def test_multigrid():
+    # Linear displacement fields are interpolated exactly
+    mesh = utils.Mesh(8, 4)
+    P = utils.prolongation(mesh.shape, mesh.dofs_per_node)
+    coarse, fine = utils.Mesh(4, 2), mesh
+    xc = np.repeat(np.arange(coarse.nelx + 1), coarse.nely + 1) * 2.0
+    yc = np.tile(np.arange(coarse.nely + 1), coarse.nelx + 1) * 2.0
+    xf = np.repeat(np.arange(fine.nelx + 1), fine.nely + 1) * 1.0
+    yf = np.tile(np.arange(fine.nely + 1), fine.nelx + 1) * 1.0
+    uc = np.stack((xc + 2 * yc, 3 * xc - yc), axis=1).ravel()
+    uf = np.stack((xf + 2 * yf, 3 * xf - yf), axis=1).ravel()
+    assert np.allclose(P @ uc, uf)
+
+    mesh = utils.Mesh(64, 32)
+    fixed = np.union1d(np.arange(mesh.ndofy, step=2), [mesh.ndof - 1])
+    free = np.setdiff1d(np.arange(mesh.ndof), fixed)
+    K = utils.assemble_K(0.01 + np.random.rand(mesh.n), mesh, fixed)
+    f = np.random.rand(len(free))
+    mg = utils.linear_solver('multigrid', mesh, free)
+    cg = utils.linear_solver('cg', mesh, free)
+    assert len(mg.P) == 3
+    u = mg.update(K).solve(f)
+    cg.update(K).solve(f)
+    assert np.linalg.norm(K @ u - f) <= 1e-8 * np.linalg.norm(f)
+    assert mg.iterations < cg.iterations / 10
+
+    # Coarsening stops when the element grid cannot be halved
+    assert len(utils.MultigridSolver().setup(utils.Mesh(12, 5), free=np.arange(10, 2 * 13 * 6)).P) == 0
+
+
+def test_mesh_3d():
+    mesh = utils.Mesh3D(3, 2, 4)
+    assert mesh.edofMat.shape == (mesh.n, 24) and mesh.edofMat.dtype == np.int32
+    assert np.array_equal(np.unique(mesh.edofMat), np.arange(mesh.ndof))
+
+    # Nodal coordinates of the element nodes, following the local node order
+    iz, ix, iy = np.unravel_index(np.arange(mesh.nnod), mesh.nodgrid.shape)
+    coords = np.stack((ix, iy, iz), axis=1)
+    el = (2 * mesh.nelx + 1) * mesh.nely + 1
+    nodes = mesh.edofMat[el, ::3] // 3
+    assert np.array_equal(coords[nodes] - coords[nodes[0]], utils.hex8_nodes())
+    assert np.array_equal(coords[nodes[0]], [1, 1, 2])
+    assert np.array_equal(mesh.edofMat[:, 1::3], mesh.edofMat[:, ::3] + 1)
+    assert not hasattr(mesh, 'iK')
+    iK, jK = utils.coo_indices(mesh.edofMat)
+    assert iK.shape == jK.shape == (576 * mesh.n,) and iK.dtype == np.int32
+
+
+def test_element_matrix_stiffness_3d():
+    ke = utils.element_matrix_stiffness_3d()
+    assert np.allclose(ke, ke.T)
+    assert np.linalg.matrix_rank(ke) == 18
+
+    # Rigid body translations and rotations are in the null space
+    nodes = np.array(utils.hex8_nodes(), dtype=float)
+    for axis in np.eye(3):
+        assert np.allclose(ke @ np.tile(axis, 8), 0)
+        assert np.allclose(ke @ np.cross(axis, nodes).ravel(), 0)
+
+    # Uniaxial strain energy of the unit cube
+    u = np.zeros((8, 3))
+    u[:, 0] = nodes[:, 0]
+    nu = 0.3
+    assert u.ravel() @ ke @ u.ravel() == pytest.approx((1 - nu) / ((1 + nu) * (1 - 2 * nu)))
+
+
+def reference_filter_3d(nelx, nely, nelz, rmin):
+    centers = np.stack(np.meshgrid(np.arange(nelz), np.arange(nelx), np.arange(nely), indexing='ij'), -1)
+    centers = centers.reshape(-1, 3)
+    dist = np.linalg.norm(centers[:, np.newaxis] - centers[np.newaxis], axis=2)
+    return np.maximum(0.0, rmin - dist)
+
+
+@pytest.mark.parametrize('rmin', [1.0, 1.5, 2.3])
+def test_filter_3d(rmin):
+    mesh = utils.Mesh3D(5, 4, 3)
+    H = reference_filter_3d(mesh.nelx, mesh.nely, mesh.nelz, rmin)
+    assert np.allclose(utils.filter_matrix(mesh.nelx, mesh.nely, rmin, nelz=mesh.nelz).toarray(), H)
+
+    x = np.random.rand(mesh.n)
+    matrix_filter = utils.Filter(mesh, rmin)
+    convolution_filter = utils.ConvolutionFilter(mesh, rmin)
+    assert np.allclose(convolution_filter.Hs, matrix_filter.Hs)
+    assert np.allclose(matrix_filter.forward(x), convolution_filter.forward(x))
+    assert np.allclose(matrix_filter.backward(x), convolution_filter.backward(x))
+
+
+def test_multigrid_3d():
+    mesh = utils.Mesh3D(16, 8, 8)
+    dofs = np.arange(mesh.ndof)
+    fixed = (3 * mesh.nodgrid[:, 0, :].ravel()[:, np.newaxis] + np.arange(3)).ravel()
+    free = np.setdiff1d(dofs, fixed)
+    K = utils.Assembly(mesh, free, ke=utils.element_matrix_stiffness_3d()).assemble(0.01 + np.random.rand(mesh.n))
+    f = np.random.rand(len(free))
+    mg = utils.linear_solver('multigrid', mesh, free)
+    assert len(mg.P) == 2
+    u = mg.update(K).solve(f)
+    assert np.linalg.norm(K @ u - f) <= 1e-8 * np.linalg.norm(f)
+    assert mg.iterations < 50
+
+
+def test_assembly():
+    mesh = utils.Mesh(6, 4)
+    dofs = np.arange(mesh.ndof)
+    fixed = np.union1d(dofs[0:mesh.ndofy], [mesh.ndof - 1])
+    free = np.setdiff1d(dofs, fixed)
+    x = np.random.rand(mesh.n)
+
+    sK = (utils.element_matrix_stiffness().flatten()[np.newaxis].T * x).flatten(order='F')
+    K = coo_matrix((sK, (mesh.iK, mesh.jK)), shape=(mesh.ndof, mesh.ndof)).tocsc()
+
+    assembly = utils.Assembly(mesh, free)
+    assert assembly.position.dtype == np.int32 and assembly.position.shape == (64, mesh.n)
+    assert np.allclose(assembly.assemble(x).toarray(), utils.assemble_K(x, mesh, fixed).toarray())
+    assert np.allclose(utils.Assembly(mesh, free, cols=fixed).assemble(x).toarray(), K[free, :][:, fixed].toarray())
+
+    # The pattern is fixed, such that solvers can reuse their symbolic analysis
+    assert np.array_equal(assembly.assemble(2 * x).indices, assembly.assemble(x).indices)
+
+    assembly.add_constant([free[0], free[3]], [free[0], free[3]], [10.0, 20.0])
+    Kc = assembly.assemble(x).toarray() - utils.assemble_K(x, mesh, fixed).toarray()
+    assert Kc[0, 0] == pytest.approx(10.0) and Kc[3, 3] == pytest.approx(20.0)
+    assert np.count_nonzero(np.abs(Kc) > 1e-12) == 2
+    with pytest.raises(ValueError):
+        assembly.add_constant(fixed[0], fixed[0], 1.0)
+
+
+def test_assembly_memory():
+    # Only the scatter positions and the pattern are kept, an int32 per element matrix entry
+    mesh = utils.Mesh3D(24, 12, 12)
+    free = np.arange(3 * (mesh.nely + 1), mesh.ndof)
+    tracemalloc.start()
+    assembly = utils.Assembly(mesh, free, ke=utils.element_matrix_stiffness_3d())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    K = assembly.assemble(np.ones(mesh.n))
+    assert assembly.nbytes <= 576 * 4 * mesh.n + 4 * K.nnz + 4 * (mesh.ndof + 1)
+    assert assembly.nbytes < 4e3 * mesh.n
+    assert peak < 5e4 * mesh.n
+
+
+if __name__ == "__main__":
+    test_mesh(4, 3)
+    test_filter(2.0)
+    test_linear_solver(utils.CholmodSolver)
+    test_cg_maxiter()
+    test_multigrid()
+    test_mesh_3d()
+    test_element_matrix_stiffness_3d()
+    test_filter_3d(1.5)
+    test_multigrid_3d()
+    test_assembly()
+    test_assembly_memory()
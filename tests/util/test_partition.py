@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from sao.util.partition import Partition
+
+
+def test_partition():
+    partition = Partition.even(10, 3)
+    assert np.array_equal(partition.ranges, [0, 4, 7, 10])
+    assert partition.n == 10 and partition.size == 3
+    assert partition.slice(1) == slice(4, 7)
+    assert np.array_equal(partition.owner([0, 3, 4, 9]), [0, 0, 1, 2])
+    with pytest.raises(ValueError):
+        Partition([1, 4])
+
+
+if __name__ == "__main__":
+    test_partition()
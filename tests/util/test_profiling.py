@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+from problems.n_dim.square import Square
+from sao.approximations import Taylor1
+from sao.intervening_variables.mma import MMA02 as MMA
+from sao.move_limits import Bounds, MoveLimit
+from sao.problems import ProfiledProblem, Subproblem
+from sao.solvers.primal_dual_interior_point import pdip
+from sao.util import profiling
+from sao.util.profiling import Profiler, profiler
+
+
+def optimize(problem, iterations=3):
+    sub_problem = Subproblem(Taylor1(MMA()), limits=[Bounds(problem.x_min, problem.x_max), MoveLimit(0.2)])
+    x = problem.x0.copy()
+    for _ in range(iterations):
+        f, df = problem.evaluate(x)
+        sub_problem.build(x, f, df)
+        x[:] = pdip(sub_problem)[0]
+    return x
+
+
+def test_profiler_disabled():
+    local = Profiler()
+    assert local.span('a') is profiling.NULL_SPAN
+    local.count('a')
+    assert not local.events and not local.counters
+
+    assert not profiler.enabled
+    optimize(ProfiledProblem(Square(4)), iterations=1)
+    assert not profiler.events
+
+
+def test_profiler(tmp_path):
+    with profiler.reset():
+        optimize(ProfiledProblem(Square(4)))
+    assert not profiler.enabled
+
+    summary = profiler.summary()
+    for name in ['problem.evaluate', 'subproblem.build', 'approximation.update', 'intervening.update',
+                 'move_limit.update', 'solver.pdip']:
+        assert summary[name][0] >= 3
+    assert summary['move_limit.update'][0] == 6
+    assert profiler.counters['problem.evaluate'] == 3
+
+    # Nested spans lie within their parent
+    events = {name: (start, duration) for name, start, duration, _, _ in profiler.events}
+    build, update = events['subproblem.build'], events['approximation.update']
+    assert build[0] <= update[0] and update[0] + update[1] <= build[0] + build[1]
+
+    # Exclusive times exclude the nested spans, and add up to the outermost spans
+    exclusive = profiler.summary(exclusive=True)
+    assert exclusive['subproblem.build'][1] < summary['subproblem.build'][1]
+    assert np.isclose(exclusive['solver.pdip'][1], summary['solver.pdip'][1])
+    outer = summary['problem.evaluate'][1] + summary['subproblem.build'][1] + summary['solver.pdip'][1]
+    assert np.isclose(sum(total for _, total in exclusive.values()), outer)
+
+    profiler.export_chrome(tmp_path / 'trace.json')
+    trace = json.load(open(tmp_path / 'trace.json'))['traceEvents']
+    assert {'X', 'C'} == {event['ph'] for event in trace}
+    assert len([event for event in trace if event['ph'] == 'X']) == len(profiler.events)
+
+    profiler.export_jsonl(tmp_path / 'trace.jsonl')
+    lines = [json.loads(line) for line in open(tmp_path / 'trace.jsonl')]
+    assert lines[0]['name'] in summary and lines[-1]['counter'] == 'problem.evaluate'
+    assert np.isclose(sum(line.get('duration', 0) for line in lines if line.get('name') == 'solver.pdip'),
+                      summary['solver.pdip'][1])
+    profiler.reset()
+
+
+if __name__ == "__main__":
+    test_profiler_disabled()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from sao.util.records import Records
+
+
+def fill(history, rows, n=3):
+    for i in range(rows):
+        history.popcol('f0', float(i))
+        history.popcol('iter', i)
+        history.snapshot(x=i * np.ones(n))
+
+
+def test_records():
+    history = Records(['f0', 'inf'], capacity=2)
+    for i in range(5):
+        history.popcol('f0', i)
+        history.popcol('inf', 10 * i)
+    history.popcol('f0', 5)
+
+    assert len(history) == 6
+    assert np.array_equal(history.getcol('f0'), np.arange(6))
+    assert np.array_equal(history.getcol('inf')[:5], 10 * np.arange(5))
+    assert np.isnan(history.getcol('inf')[-1])
+    assert history.getrow(2) == [2, 20]
+    with pytest.raises(KeyError):
+        history.popcol('f1', 0.0)
+
+
+def test_records_snapshots():
+    history = Records({'f0': float, 'iter': int}, snapshots={'x': 3}, stride=2)
+    fill(history, 5)
+    assert history.getcol('iter').dtype == int
+
+    x, rows = history.getsnapshot('x')
+    assert np.array_equal(rows, [0, 2, 4])
+    assert np.array_equal(x, rows[:, np.newaxis] * np.ones(3))
+    with pytest.raises(KeyError):
+        history.snapshot(y=np.zeros(2))
+
+
+def test_records_stream(tmp_path):
+    path = tmp_path / 'history.npz'
+    history = Records({'f0': float, 'iter': int}, snapshots=['x'], stride=3, path=path, chunk=4)
+    fill(history, 11)
+
+    # Only the rows of the current chunk are kept in memory
+    assert history.rows <= 4 and len(history) == 11
+    assert np.array_equal(history.getcol('f0'), np.arange(11))
+    assert history.getrow(1) == [1.0, 1]
+    x, rows = history.getsnapshot('x')
+    assert np.array_equal(rows, [0, 3, 6, 9])
+    assert np.array_equal(x[:, 0], rows)
+
+    history.close()
+    stored = Records.load(path)
+    assert np.array_equal(stored.getcol('f0'), np.arange(11))
+    assert np.array_equal(stored.getcol('iter'), np.arange(11))
+    assert np.array_equal(stored.getsnapshot('x')[0][:, 0], rows)
+
+    history.save(tmp_path / 'copy.npz')
+    assert np.array_equal(Records.load(tmp_path / 'copy.npz').getcol('f0'), np.arange(11))
+
+
+if __name__ == "__main__":
+    test_records()
+    test_records_snapshots()
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+import sao
+import sao.solvers
+
+
+def test_lazy_import():
+    # A fresh interpreter, as other tests import the solvers already
+    code = ("import sys, sao; "
+            "assert not any(m in sys.modules for m in ['sao.solvers', 'scipy.optimize', 'cvxopt', 'numba']); "
+            "sao.solvers; assert 'scipy.optimize' not in sys.modules; "
+            "sao.solvers.pdip; assert 'sao.solvers.primal_dual_interior_point' in sys.modules")
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_lazy_attributes():
+    from sao.solvers.primal_dual_interior_point import pdip
+    assert sao.solvers.pdip is pdip
+    assert sao.solvers.primal_dual_interior_point.pdip is pdip
+    assert sao.solvers.wrappers.multistart.__name__ == 'multistart'
+    assert set(sao.solvers.__all__) <= set(dir(sao.solvers)) and 'solvers' in dir(sao)
+
+    with pytest.raises(AttributeError):
+        sao.solvers.unknown
+    with pytest.raises(ImportError):
+        from sao.solvers import unknown
+
+
+def test_lazy_attributes_submodules():
+    # The wrapper functions are not shadowed by their submodules of the same name
+    import sao.solvers.wrappers.multistart
+    from problems.n_dim.square import Square
+    from sao.solvers import wrappers
+
+    problem = Square(3)
+    x, f = wrappers.mma(problem, x0=problem.x0.copy(), stop_tol=1e-3, verbose=False)
+    assert callable(wrappers.multistart) and sao.solvers.mma is wrappers.mma
+    assert f == pytest.approx(1 / 3, rel=1e-2)
+
+
+if __name__ == "__main__":
+    test_lazy_import()
+    test_lazy_attributes()
+    test_lazy_attributes_submodules()